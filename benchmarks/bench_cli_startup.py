@@ -0,0 +1,44 @@
+import subprocess
+import sys
+import time
+
+from utils_base import Log
+
+log = Log("bench_cli_startup")
+
+N_REPEATS = 5
+# Startup (best of N_REPEATS) above this many seconds fails the run.
+BUDGET_S = 1.0
+COMMANDS = [
+    ("python", ["-c", "pass"]),
+    ("import writing_utils", ["-c", "import writing_utils"]),
+    ("writing-utils --help", ["-m", "writing_utils", "--help"]),
+    ("import utils (whole suite)", ["-c", "import utils"]),
+]
+
+
+def time_command(args: list[str]) -> float:
+    best = None
+    for _ in range(N_REPEATS):
+        t_start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args], check=True, capture_output=True
+        )
+        dt = time.perf_counter() - t_start
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def main():
+    dts = {}
+    for label, args in COMMANDS:
+        dts[label] = time_command(args)
+        log.info(f"{label:<28} {dts[label] * 1000:8.1f}ms")
+
+    if dts["writing-utils --help"] > BUDGET_S:
+        log.error(f"CLI startup is over budget ({BUDGET_S}s)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import random
+import re
+import sys
+import time
+
+from utils import Log
+
+from writing_utils import BookDirDocXMixin
+
+log = Log("bench_docx_inline_formatter")
+
+N_REPEATS = 5
+PARAGRAPH_SIZES = [10_000, 40_000, 160_000]
+
+
+class RunRecorder:
+    """Stand-in for a python-docx Paragraph that only records runs."""
+
+    class Run:
+        def __init__(self, text):
+            self.text = text
+            self.bold = None
+            self.italic = None
+
+    def __init__(self):
+        self.runs = []
+
+    def add_run(self, text):
+        run = RunRecorder.Run(text)
+        self.runs.append(run)
+        return run
+
+    def to_tuples(self):
+        return [(run.text, run.bold, run.italic) for run in self.runs]
+
+
+def add_formatted_text_legacy(para, text: str) -> None:
+    # The previous implementation: three searches on text[pos:] per run.
+    pos = 0
+    while pos < len(text):
+        bold_match = re.search(r"\*\*(.+?)\*\*", text[pos:])
+        italic_match = re.search(r"\*(.+?)\*", text[pos:])
+        say_match = re.search(r"\\say\{(.+?)\}", text[pos:])
+
+        matches = []
+        if bold_match:
+            matches.append(
+                ("bold", bold_match.start(), bold_match.end(), bold_match[1])
+            )
+        if italic_match and not (
+            bold_match
+            and italic_match.start() >= bold_match.start()
+            and italic_match.start() < bold_match.end()
+        ):
+            matches.append(
+                (
+                    "italic",
+                    italic_match.start(),
+                    italic_match.end(),
+                    italic_match[1],
+                )
+            )
+        if say_match:
+            matches.append(
+                ("say", say_match.start(), say_match.end(), say_match[1])
+            )
+
+        if not matches:
+            para.add_run(text[pos:])
+            break
+
+        matches.sort(key=lambda x: x[1])
+        match_type, start, end, content = matches[0]
+        if start > 0:
+            para.add_run(text[pos : pos + start])
+        run = para.add_run(content)
+        if match_type == "bold":
+            run.bold = True
+        else:
+            run.italic = True
+        pos = pos + end
+
+
+def gen_paragraph(n_chars: int, rng: random.Random) -> str:
+    pieces = []
+    length = 0
+    while length < n_chars:
+        words = " ".join(
+            rng.choice(["the", "rain", "Neth", "said", "again", "slowly"])
+            for _ in range(rng.randint(3, 8))
+        )
+        piece = rng.choice(
+            [
+                words,
+                f"*{words}*",
+                f"**{words}**",
+                f"\\say{{{words}}}",
+                f'"{words}," he said,',
+            ]
+        )
+        pieces.append(piece)
+        length += len(piece) + 1
+    return " ".join(pieces)
+
+
+def time_formatter(func, text: str) -> float:
+    best = None
+    for _ in range(N_REPEATS):
+        para = RunRecorder()
+        t_start = time.perf_counter()
+        func(para, text)
+        dt = time.perf_counter() - t_start
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def main():
+    rng = random.Random(0)
+    mixin = BookDirDocXMixin()
+
+    def add_formatted_text(para, text):
+        mixin.__add_formatted_text_to_docx_paragraph__(para, text)
+
+    for n_chars in PARAGRAPH_SIZES:
+        text = gen_paragraph(n_chars, rng)
+
+        para_legacy, para_new = RunRecorder(), RunRecorder()
+        add_formatted_text_legacy(para_legacy, text)
+        add_formatted_text(para_new, text)
+        if para_legacy.to_tuples() != para_new.to_tuples():
+            log.error(f"Output mismatch for {n_chars:,}-char paragraph")
+            sys.exit(1)
+
+        dt_legacy = time_formatter(add_formatted_text_legacy, text)
+        dt_new = time_formatter(add_formatted_text, text)
+        log.info(
+            f"{len(text):>9,} chars, {len(para_new.runs):>6,} runs: "
+            + f"legacy {dt_legacy * 1000:8.2f}ms, "
+            + f"single-pass {dt_new * 1000:8.2f}ms "
+            + f"({dt_legacy / dt_new:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
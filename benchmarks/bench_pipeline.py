@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from synthetic_book import write_synthetic_book
+from utils import JSONFile, Log, Time, TimeFormat
+
+from writing_utils import BookDir, Instrumentation
+
+log = Log("bench_pipeline")
+
+# name -> (n_chapters, n_words)
+SIZES = dict(
+    tiny=(10, 20_000),
+    small=(100, 200_000),
+    medium=(500, 1_000_000),
+    large=(2000, 5_000_000),
+)
+DIR_RESULTS = os.path.join(os.path.dirname(__file__), "results")
+# A stage this much slower than in the baseline counts as a regression.
+REGRESSION_RATIO = 1.25
+
+
+def get_git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(stage: str, func, trace_memory: bool) -> tuple[dict, object]:
+    # Tracing may already be on, if WRITING_UTILS_INSTRUMENT is set.
+    is_tracing_owner = trace_memory and not tracemalloc.is_tracing()
+    if is_tracing_owner:
+        tracemalloc.start()
+    if trace_memory:
+        Instrumentation.reset_peak()
+    t_start = time.perf_counter()
+    result = func()
+    dt = time.perf_counter() - t_start
+    peak_bytes = None
+    if trace_memory:
+        peak_bytes = Instrumentation.get_peak_bytes()
+    if is_tracing_owner:
+        tracemalloc.stop()
+    log.info(
+        f"{stage:<24} {dt:9.3f}s"
+        + (f" {peak_bytes / 1e6:9.1f}MB" if peak_bytes is not None else "")
+    )
+    return dict(stage=stage, seconds=dt, peak_bytes=peak_bytes), result
+
+
+def run_stages(dir_book: str, workers: int | None, trace_memory: bool):
+    stages = []
+
+    def run(stage, func):
+        stage_result, result = measure(stage, func, trace_memory)
+        stages.append(stage_result)
+        return result
+
+    book_dir = BookDir(dir_book)
+    run("clean_and_write_all", book_dir.clean_and_write_all)
+    run(
+        "rename_files",
+        lambda: book_dir.rename_files(
+            name_map=book_dir.get_name_map_from_titles()
+        ),
+    )
+    for suffix in ["", " (warm)"]:
+        md_path = run("build_md" + suffix, lambda: book_dir.build_md(workers))
+    run(
+        "from_md",
+        lambda: BookDir.from_md(md_path, output_dir=md_path + ".dir_from_md"),
+    )
+    for suffix in ["", " (warm)"]:
+        docx_path = run(
+            "build_docx" + suffix,
+            lambda: book_dir.build_docx(workers=workers),
+        )
+    shutil.rmtree(docx_path)
+    run(
+        "build_docx (streaming)",
+        lambda: book_dir.build_docx(workers=workers, streaming=True),
+    )
+    run(
+        "from_docx",
+        lambda: BookDir.from_docx(docx_path, streaming=True, workers=workers),
+    )
+    for suffix in ["", " (warm)"]:
+        run(
+            "build_latex_tex" + suffix,
+            lambda: book_dir.build_latex("Maroon", workers, pdf=False),
+        )
+    run("find", lambda: list(book_dir.find("said Neth")))
+    for suffix in ["", " (warm)"]:
+        run("search" + suffix, lambda: list(book_dir.search("said Neth")))
+    run(
+        "search (new BookDir)",
+        lambda: list(BookDir(book_dir.path).search("said Neth")),
+    )
+    run("replace", lambda: book_dir.replace_many({"rain": "drizzle"}))
+    return stages
+
+
+def compare(results: dict, baseline: dict) -> list[str]:
+    baseline_seconds = {
+        stage["stage"]: stage["seconds"] for stage in baseline["stages"]
+    }
+    regressions = []
+    for stage in results["stages"]:
+        seconds_before = baseline_seconds.get(stage["stage"])
+        if not seconds_before:
+            continue
+        ratio = stage["seconds"] / seconds_before
+        log.info(f"{stage['stage']:<24} {ratio:6.2f}x baseline")
+        if ratio > REGRESSION_RATIO:
+            regressions.append(stage["stage"])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time each pipeline stage on a synthetic book."
+    )
+    parser.add_argument("--size", choices=SIZES.keys(), default="tiny")
+    parser.add_argument("--chapters", type=int, help="overrides --size")
+    parser.add_argument("--words", type=int, help="overrides --size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="skip tracemalloc, which slows stages down",
+    )
+    parser.add_argument("--output", help="JSON path for the results")
+    parser.add_argument(
+        "--compare", help="earlier results JSON; exit 1 on regressions"
+    )
+    args = parser.parse_args()
+
+    n_chapters, n_words = SIZES[args.size]
+    n_chapters = args.chapters or n_chapters
+    n_words = args.words or n_words
+
+    with tempfile.TemporaryDirectory() as dir_temp:
+        dir_book = os.path.join(dir_temp, "book")
+        log.info(f"Generating {n_chapters:,} chapters, {n_words:,} words")
+        write_synthetic_book(dir_book, n_chapters, n_words, args.seed)
+        stages = run_stages(dir_book, args.workers, not args.no_memory)
+
+    results = dict(
+        created=TimeFormat.TIME.format(Time.now()),
+        git_commit=get_git_commit(),
+        python=sys.version.split()[0],
+        platform=platform.platform(),
+        n_chapters=n_chapters,
+        n_words=n_words,
+        seed=args.seed,
+        workers=args.workers,
+        trace_memory=not args.no_memory,
+        stages=stages,
+    )
+    output_path = args.output or os.path.join(
+        DIR_RESULTS,
+        f"pipeline-{n_chapters}x{n_words}"
+        + f"-{TimeFormat.TIME_ID.format(Time.now())}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    JSONFile(output_path).write(results)
+    log.info(f"Wrote {output_path}")
+
+    if args.compare:
+        regressions = compare(results, JSONFile(args.compare).read())
+        if regressions:
+            log.error(f"Regressions: {json.dumps(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+import random
+import shutil
+
+from utils import File
+
+NAMES = ["Neth", "Ama", "Ruwan", "Kasun", "Dilini", "Mala"]
+WORDS = [
+    "the", "rain", "said", "again", "slowly", "river", "house", "light",
+    "before", "never", "window", "mother", "letter", "road", "quiet",
+    "morning", "across", "station", "colombo", "train", "paper", "heavy",
+    "cold", "tea", "remember", "nothing", "small", "hands",
+]  # fmt: skip
+TITLE_WORDS = ["Rain", "Letters", "Station", "Morning", "River", "House"]
+
+
+def gen_words(rng: random.Random, n_words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+
+def gen_paragraph(rng: random.Random, n_words: int) -> str:
+    """A paragraph of about n_words words, mixing the markup we support.
+
+    Sentences are plain, emphasised, bold or dialogue; some paragraphs
+    carry an Obsidian note ([[...]]), which the LaTeX build strips.
+    """
+    sentences = []
+    n_remaining = n_words
+    while n_remaining > 0:
+        n = min(n_remaining, rng.randint(4, 14))
+        n_remaining -= n
+        words = gen_words(rng, n)
+        kind = rng.random()
+        if kind < 0.15:
+            sentences.append(
+                f'"{words.capitalize()}," said {rng.choice(NAMES)}.'
+            )
+        elif kind < 0.25:
+            sentences.append(f"*{words.capitalize()}.*")
+        elif kind < 0.30:
+            sentences.append(f"**{words.capitalize()}.**")
+        else:
+            sentences.append(f"{words.capitalize()}.")
+    if rng.random() < 0.05:
+        sentences.append(f"[[{rng.choice(TITLE_WORDS)} note]]")
+    return " ".join(sentences)
+
+
+def gen_chapter(
+    rng: random.Random, i_chapter: int, n_words: int
+) -> tuple[str, str]:
+    title = " ".join(rng.sample(TITLE_WORDS, 2))
+    paragraphs = [f"# {i_chapter}. {title}"]
+    n_remaining = n_words
+    while n_remaining > 0:
+        n = min(n_remaining, rng.randint(20, 120))
+        n_remaining -= n
+        paragraphs.append(gen_paragraph(rng, n))
+        if n_remaining > 0 and rng.random() < 0.05:
+            paragraphs.append("---")
+    return title, "\n\n".join(paragraphs)
+
+
+def write_synthetic_book(
+    dir_book: str, n_chapters: int, n_words: int, seed: int = 0
+) -> str:
+    """Write a deterministic book of n_chapters chapters, ~n_words words.
+
+    Files are already in cleaned form, as clean_and_write_all leaves
+    them. The same arguments always give the same book.
+    """
+    assert 1 <= n_chapters <= n_words, f"{n_chapters=}, {n_words=}"
+    shutil.rmtree(dir_book, ignore_errors=True)
+    os.makedirs(dir_book, exist_ok=True)
+    rng = random.Random(seed)
+    width = max(2, len(str(n_chapters)))
+    for i_chapter in range(1, n_chapters + 1):
+        n_chapter_words = n_words // n_chapters + (
+            1 if i_chapter <= n_words % n_chapters else 0
+        )
+        title, content = gen_chapter(rng, i_chapter, n_chapter_words)
+        file_name = f"{i_chapter:0{width}d}-{title.replace(' ', '_')}.md"
+        File(os.path.join(dir_book, file_name)).write(content)
+    return dir_book
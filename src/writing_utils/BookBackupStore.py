@@ -0,0 +1,190 @@
+import hashlib
+import os
+import time
+import zlib
+
+from utils_base import JSONFile, Log, Time, TimeFormat
+
+log = Log("BookBackupStore")
+
+
+class BookBackupStore:
+    """Deduplicated backups of a book, kept in <book>.backups/.
+
+    Each distinct file content is stored once, zlib-compressed, as
+    blobs/<sha256>. A snapshot is a small JSON file in snapshots/
+    mapping each relative path in the book to its blob.
+    """
+
+    VERSION = 1
+    COMPRESSION_LEVEL = 9
+
+    def __init__(self, dir_book: str):
+        self.dir_book = dir_book
+        self.dir_store = dir_book + ".backups"
+        self.dir_blobs = os.path.join(self.dir_store, "blobs")
+        self.dir_snapshots = os.path.join(self.dir_store, "snapshots")
+
+    # Snapshots
+    def get_snapshot_path(self, snapshot_name: str) -> str:
+        return os.path.join(self.dir_snapshots, snapshot_name + ".json")
+
+    def read_snapshot(self, snapshot_name: str) -> dict:
+        return JSONFile(self.get_snapshot_path(snapshot_name)).read()
+
+    def list_snapshots(self) -> list[str]:
+        """Snapshot names, oldest first."""
+        if not os.path.exists(self.dir_snapshots):
+            return []
+        return sorted(
+            (
+                file_name[: -len(".json")]
+                for file_name in os.listdir(self.dir_snapshots)
+                if file_name.endswith(".json")
+            ),
+            key=self.__get_snapshot_sort_key__,
+        )
+
+    @staticmethod
+    def __get_snapshot_sort_key__(snapshot_name: str) -> tuple[str, int]:
+        # <book>.backup.<time id>[.<n>], where n counts from 2 the
+        # snapshots taken within the same second.
+        time_id_and_n = snapshot_name.rpartition(".backup.")[2]
+        date, _, time_and_n = time_id_and_n.partition(".")
+        time_id, _, n = time_and_n.partition(".")
+        return f"{date}.{time_id}", int(n) if n.isdigit() else 1
+
+    def gen_book_files(self):
+        for dir_path, dir_names, file_names in os.walk(self.dir_book):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                path = os.path.join(dir_path, file_name)
+                rel_path = os.path.relpath(path, self.dir_book)
+                yield rel_path.replace(os.sep, "/"), path
+
+    def backup(self, known_hashes: dict[str, str] | None = None) -> str:
+        """Snapshot the book, storing only blobs not already present.
+
+        known_hashes maps relative paths to sha256 content hashes that
+        are already known (e.g. from the manifest), so those files are
+        only read when their blob is missing. Returns the snapshot name;
+        if nothing changed since the latest snapshot, that name is
+        returned and no new snapshot is written.
+        """
+        known_hashes = known_hashes or {}
+        os.makedirs(self.dir_blobs, exist_ok=True)
+        os.makedirs(self.dir_snapshots, exist_ok=True)
+
+        files = {}
+        n_new_blobs = 0
+        for rel_path, path in self.gen_book_files():
+            content_hash = known_hashes.get(rel_path)
+            if content_hash is None or not os.path.exists(
+                self.__get_blob_path__(content_hash)
+            ):
+                with open(path, "rb") as fin:
+                    raw = fin.read()
+                content_hash = hashlib.sha256(raw).hexdigest()
+                if self.__write_blob__(content_hash, raw):
+                    n_new_blobs += 1
+            files[rel_path] = content_hash
+
+        snapshot_names = self.list_snapshots()
+        if snapshot_names:
+            latest_name = snapshot_names[-1]
+            if self.read_snapshot(latest_name)["files"] == files:
+                log.info(f"No changes since {latest_name}")
+                return latest_name
+
+        ts = TimeFormat.TIME_ID.format(Time.now())
+        name_only = os.path.basename(self.dir_book)
+        snapshot_name = f"{name_only}.backup.{ts}"
+        i_suffix = 1
+        while os.path.exists(self.get_snapshot_path(snapshot_name)):
+            i_suffix += 1
+            snapshot_name = f"{name_only}.backup.{ts}.{i_suffix}"
+        JSONFile(self.get_snapshot_path(snapshot_name)).write(
+            dict(
+                version=self.VERSION,
+                created_ns=time.time_ns(),
+                files=files,
+            )
+        )
+        log.info(
+            f"Wrote {snapshot_name} ({len(files)} files,"
+            + f" {n_new_blobs} new blobs)"
+        )
+        return snapshot_name
+
+    def restore(self, dir_target: str, snapshot_name: str | None = None):
+        """Write the files of a snapshot (default: latest) to dir_target.
+
+        dir_target must not exist or be empty.
+        """
+        if snapshot_name is None:
+            snapshot_names = self.list_snapshots()
+            if not snapshot_names:
+                raise ValueError(f"No snapshots in {self.dir_snapshots}")
+            snapshot_name = snapshot_names[-1]
+        if os.path.exists(dir_target) and os.listdir(dir_target):
+            raise ValueError(f"Restore target is not empty: {dir_target}")
+
+        files = self.read_snapshot(snapshot_name)["files"]
+        for rel_path, content_hash in files.items():
+            raw = self.__read_blob__(content_hash)
+            path = os.path.join(dir_target, *rel_path.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as fout:
+                fout.write(raw)
+        log.info(f"Restored {snapshot_name} to {dir_target}")
+
+    def prune(self, keep_last: int) -> int:
+        """Delete all but the newest keep_last snapshots.
+
+        Blobs no longer used by any remaining snapshot are deleted too.
+        Returns the number of snapshots deleted.
+        """
+        assert keep_last >= 1, f"keep_last must be at least 1: {keep_last}"
+        snapshot_names = self.list_snapshots()
+        stale_names = snapshot_names[:-keep_last]
+        for snapshot_name in stale_names:
+            os.remove(self.get_snapshot_path(snapshot_name))
+
+        used_hashes = set()
+        for snapshot_name in snapshot_names[-keep_last:]:
+            used_hashes.update(
+                self.read_snapshot(snapshot_name)["files"].values()
+            )
+        n_removed_blobs = 0
+        if os.path.exists(self.dir_blobs):
+            for file_name in os.listdir(self.dir_blobs):
+                if file_name not in used_hashes:
+                    os.remove(os.path.join(self.dir_blobs, file_name))
+                    n_removed_blobs += 1
+
+        log.info(
+            f"Pruned {len(stale_names)} snapshots"
+            + f" and {n_removed_blobs} blobs"
+        )
+        return len(stale_names)
+
+    # Blobs
+    def __get_blob_path__(self, content_hash: str) -> str:
+        return os.path.join(self.dir_blobs, content_hash)
+
+    def __write_blob__(self, content_hash: str, raw: bytes) -> bool:
+        blob_path = self.__get_blob_path__(content_hash)
+        if os.path.exists(blob_path):
+            return False
+        tmp_path = blob_path + ".tmp"
+        with open(tmp_path, "wb") as fout:
+            fout.write(zlib.compress(raw, self.COMPRESSION_LEVEL))
+        os.replace(tmp_path, blob_path)
+        return True
+
+    def __read_blob__(self, content_hash: str) -> bytes:
+        with open(self.__get_blob_path__(content_hash), "rb") as fin:
+            raw = zlib.decompress(fin.read())
+        if hashlib.sha256(raw).hexdigest() != content_hash:
+            raise ValueError(f"Corrupt backup blob: {content_hash}")
+        return raw
@@ -1,18 +1,23 @@
 import os
-import shutil
 import sys
 from functools import cached_property
 from typing import Generator
 
-from utils import FileOrDirectory, Log, Time, TimeFormat
+from utils_base import FileOrDirectory, Log
 
 from private.data import DIR_WRITING_DEFAULT_PROJECT_DIR
+from writing_utils.BookBackupStore import BookBackupStore
 from writing_utils.BookDirDocXMixin import BookDirDocXMixin
 from writing_utils.BookDirLaTeXMixin import BookDirLaTeXMixin
 from writing_utils.BookDirMarkdownMixin import BookDirMarkdownMixin
 from writing_utils.BookDirReverseDocXMixin import BookDirReverseDocXMixin
 from writing_utils.BookDirUtilsMixin import BookDirUtilsMixin
+from writing_utils.BookDirWatchMixin import BookDirWatchMixin
+from writing_utils.BookIndex import BookIndex
+from writing_utils.BookManifest import BookManifest
 from writing_utils.ChapterFile import ChapterFile
+from writing_utils.ChapterIR import ChapterIR
+from writing_utils.Instrumentation import instrumented
 
 log = Log("BookDir")
 
@@ -24,6 +29,7 @@ class BookDir(
     BookDirDocXMixin,
     BookDirMarkdownMixin,
     BookDirReverseDocXMixin,
+    BookDirWatchMixin,
 ):
     # Construction
     @classmethod
@@ -37,11 +43,56 @@ class BookDir(
         )
 
     # Data Access
+    @cached_property
+    def manifest(self) -> BookManifest:
+        return BookManifest(self.path)
+
     def gen_chapter_docs(self) -> Generator[ChapterFile, None, None]:
-        file_names = sorted(os.listdir(self.path))
+        file_names = [
+            file_name
+            for file_name in sorted(os.listdir(self.path))
+            if file_name.endswith(".md")
+        ]
+        self.manifest.retain(file_names)
         for file_name in file_names:
-            if file_name.endswith(".md"):
-                yield ChapterFile(os.path.join(self.path, file_name))
+            yield self.manifest.get_chapter_doc(
+                os.path.join(self.path, file_name)
+            )
+        self.manifest.save()
+
+    @cached_property
+    def chapter_ir_cache(self) -> dict[str, ChapterIR]:
+        return {}
+
+    def get_chapter_ir(self, chapter_doc: ChapterFile) -> ChapterIR:
+        content_hash = chapter_doc.content_hash
+        if content_hash not in self.chapter_ir_cache:
+            self.chapter_ir_cache[content_hash] = ChapterIR.from_lines(
+                chapter_doc.lines
+            )
+        return self.chapter_ir_cache[content_hash]
+
+    def gen_chapter_irs(
+        self, chapter_docs: list[ChapterFile], workers: int | None = None
+    ) -> Generator[ChapterIR, None, None]:
+        chapter_docs = list(chapter_docs)
+        missing_chapter_docs = [
+            chapter_doc
+            for chapter_doc in chapter_docs
+            if chapter_doc.content_hash not in self.chapter_ir_cache
+        ]
+        for chapter_doc, chapter_ir in zip(
+            missing_chapter_docs,
+            self.__gen_in_pool__(
+                ChapterIR.from_path,
+                [(chapter_doc.path,) for chapter_doc in missing_chapter_docs],
+                workers,
+            ),
+        ):
+            self.chapter_ir_cache[chapter_doc.content_hash] = chapter_ir
+
+        for chapter_doc in chapter_docs:
+            yield self.chapter_ir_cache[chapter_doc.content_hash]
 
     def get_name_map_from_titles(self) -> dict[str, str]:
         name_map = {}
@@ -66,11 +117,43 @@ class BookDir(
             [chapter_doc.n_words for chapter_doc in self.gen_chapter_docs()]
         )
 
+    @cached_property
+    def n_paragraphs(self) -> int:
+        return sum(
+            [
+                chapter_doc.n_paragraphs
+                for chapter_doc in self.gen_chapter_docs()
+            ]
+        )
+
+    @cached_property
+    def n_sentences(self) -> int:
+        return sum(
+            [
+                chapter_doc.n_sentences
+                for chapter_doc in self.gen_chapter_docs()
+            ]
+        )
+
     def find(self, search_key: str):
         for chapter_doc in self.gen_chapter_docs():
             for find_info in chapter_doc.find(search_key):
                 yield find_info
 
+    @cached_property
+    def index(self) -> BookIndex:
+        return BookIndex(self.path)
+
+    def search(self, query: str):
+        """Find query as whole words, through the inverted index.
+
+        Unlike find, which matches any substring, query only matches
+        whole \\w+ tokens in order: "rain" does not find "raining".
+        Only chapters changed since the last search are re-indexed.
+        """
+        self.index.update(self.gen_chapter_docs())
+        yield from self.index.find(query)
+
     def replace(self, find_text: str, replace_text: str):
         n_replace_files = 0
         for chapter_doc in self.gen_chapter_docs():
@@ -83,23 +166,101 @@ class BookDir(
         )
         return n_replace_files > 0
 
-    def backup(self):
-        ts = TimeFormat.TIME_ID.format(Time.now())
-        dir_backups_all = f"{self.path}.backups"
-        log.debug(f"{dir_backups_all=}")
-        os.makedirs(dir_backups_all, exist_ok=True)
+    @instrumented()
+    def replace_many(
+        self, replace_map: dict[str, str], dry_run: bool = False
+    ) -> dict[str, int]:
+        """Apply every find/replace pair in one scan per chapter.
+
+        Replaced text is not rescanned, so pairs do not chain. Returns
+        the number of hits per chapter file, for chapters with any.
+        """
+        if not replace_map:
+            return {}
+        replace_pattern = ChapterFile.get_replace_pattern(replace_map)
+        n_hits_by_chapter = {}
+        for chapter_doc in self.gen_chapter_docs():
+            n_hits = chapter_doc.replace_many(
+                replace_pattern, replace_map, dry_run
+            )
+            if n_hits:
+                n_hits_by_chapter[os.path.basename(chapter_doc.path)] = n_hits
+
+        log.info(
+            ("Would replace" if dry_run else "Replaced")
+            + f" {sum(n_hits_by_chapter.values())} matches"
+            + f" of {len(replace_map)} patterns"
+            + f" in {len(n_hits_by_chapter)} chapters."
+        )
+        return n_hits_by_chapter
 
-        name_only = os.path.basename(self.path)
-        dir_backup = os.path.join(dir_backups_all, f"{name_only}.backup.{ts}")
-        log.debug(f"{dir_backup=}")
+    @cached_property
+    def backup_store(self) -> BookBackupStore:
+        return BookBackupStore(self.path)
 
-        shutil.copytree(self.path, dir_backup)
-        log.info(f"Wrote {dir_backup}")
+    @instrumented()
+    def backup(self) -> str:
+        # Chapter hashes come from the manifest, so unchanged chapters
+        # are neither read nor written.
+        known_hashes = {
+            os.path.basename(chapter_doc.path): chapter_doc.content_hash
+            for chapter_doc in self.gen_chapter_docs()
+        }
+        return self.backup_store.backup(known_hashes)
+
+    @instrumented()
+    def diff(self, other: "BookDir") -> list[dict]:
+        """Chapters that differ from other, paired in file name order.
+
+        Each entry names the chapter files on both sides (None where one
+        book has fewer chapters) and, for chapters on both sides, the
+        changed line ranges from ChapterFile.diff. An empty list means
+        the books are equal.
+        """
+        self_chapters = list(self.gen_chapter_docs())
+        other_chapters = list(other.gen_chapter_docs())
+        report = []
+        for i_chapter in range(max(len(self_chapters), len(other_chapters))):
+            self_chapter = (
+                self_chapters[i_chapter]
+                if i_chapter < len(self_chapters)
+                else None
+            )
+            other_chapter = (
+                other_chapters[i_chapter]
+                if i_chapter < len(other_chapters)
+                else None
+            )
+            if self_chapter is None or other_chapter is None:
+                changes = None
+            else:
+                changes = self_chapter.diff(other_chapter)
+                if not changes:
+                    continue
+
+            report.append(
+                dict(
+                    chapter=(
+                        os.path.basename(self_chapter.path)
+                        if self_chapter
+                        else None
+                    ),
+                    other_chapter=(
+                        os.path.basename(other_chapter.path)
+                        if other_chapter
+                        else None
+                    ),
+                    changes=changes,
+                )
+            )
+        return report
 
     def __eq__(self, other):
         if not isinstance(other, BookDir):
             return False
 
+        # Digests come from the manifests, so unchanged chapters are not
+        # re-read.
         self_chapters = list(self.gen_chapter_docs())
         other_chapters = list(other.gen_chapter_docs())
 
@@ -1,89 +1,210 @@
+import glob
+import hashlib
 import os
-import re
-import shutil
+from typing import TYPE_CHECKING, Generator
 
-from docx import Document
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.shared import Inches, Pt
-from utils import File, Log
+from utils_base import File, JSONFile, Log
 
 from private import data
+from writing_utils.ChapterFile import ChapterFile
+from writing_utils.ChapterIR import ChapterIR
+from writing_utils.DocXStreamWriter import DocXRun, DocXStreamWriter
+from writing_utils.Instrumentation import instrumented
+
+if TYPE_CHECKING:
+    from docx.document import Document
 
 log = Log("BookDirDocXMixin")
 
 
 class BookDirDocXMixin:
-
-    def build_docx(self, max_words_per_docx: int = 50000) -> list[Document]:
-        return self.__create_docx_documents_and_save__(max_words_per_docx)
+    # Bump whenever the DOCX rendering changes, so cached parts are rebuilt.
+    DOCX_CONVERTER_VERSION = 2
+    DOCX_TEMPLATE_NAME = "template.docx"
+    # (bold, italic) by span style; their formats add up when nested.
+    DOCX_SPAN_FORMATS = {
+        "bold": (True, False),
+        "loose_bold": (True, False),
+        "italic": (False, True),
+        "loose_italic": (False, True),
+        "bold_italic": (True, True),
+        "say": (False, True),
+    }
+
+    @instrumented()
+    def build_docx(
+        self,
+        max_words_per_docx: int = 50000,
+        workers: int | None = None,
+        streaming: bool = False,
+    ) -> list["Document"]:
+        """Build the book as DOCX parts of up to max_words_per_docx words.
+
+        With streaming=True, each part's word/document.xml is written
+        directly with DocXStreamWriter instead of through python-docx.
+        The parts are the same, but memory stays flat however large a
+        part is, so max_words_per_docx can be the whole book.
+        """
+        return self.__create_docx_documents_and_save__(
+            max_words_per_docx, workers, streaming
+        )
 
     def __create_docx_documents_and_save__(
-        self, max_words_per_docx: int = 50000
-    ) -> list[Document]:
+        self,
+        max_words_per_docx: int = 50000,
+        workers: int | None = None,
+        streaming: bool = False,
+    ) -> list["Document"]:
         compiled_dir = self.path + ".compiled"
         docx_dir = os.path.join(compiled_dir, "docx")
-        shutil.rmtree(docx_dir, ignore_errors=True)
         os.makedirs(docx_dir, exist_ok=True)
 
-        self.__create_and_save_docx_files__(docx_dir, max_words_per_docx)
+        self.__create_and_save_docx_files__(
+            docx_dir, max_words_per_docx, workers, streaming
+        )
         return docx_dir
 
+    def __get_docx_part_signature__(self, part_chapters: list) -> str:
+        key = "\n".join(
+            [
+                str(self.DOCX_CONVERTER_VERSION),
+                data.TITLE,
+                data.SUBTITLE,
+                data.AUTHOR,
+            ]
+            + [chapter_doc.content_hash for chapter_doc in part_chapters]
+        )
+        return hashlib.sha256(key.encode()).hexdigest()
+
     def __create_and_save_docx_files__(
-        self, docx_dir: str, max_words_per_docx: int = 50000
+        self,
+        docx_dir: str,
+        max_words_per_docx: int = 50000,
+        workers: int | None = None,
+        streaming: bool = False,
     ) -> list[str]:
         chapters = sorted(self.gen_chapter_docs(), key=lambda ch: ch.number)
+        parts = self.__partition_chapters__(chapters, max_words_per_docx)
+
+        index_path = os.path.join(docx_dir, "parts.json")
+        old_index = (
+            JSONFile(index_path).read() if os.path.exists(index_path) else {}
+        )
+        new_index = {}
         docx_paths = []
-        current_doc = None
-        current_docx_index = 0
-        current_word_count = 0
+        pending_args_list = []
 
-        for chapter_doc in chapters:
-            chapter_word_count = chapter_doc.n_words
+        for i_part, part_chapters in enumerate(parts):
+            docx_name = f"part_{i_part:02d}.docx"
+            docx_path = os.path.join(docx_dir, docx_name)
+            signature = self.__get_docx_part_signature__(part_chapters)
+            new_index[docx_name] = signature
+            docx_paths.append(docx_path)
 
-            if (
-                current_doc is not None
-                and current_word_count + chapter_word_count
-                > max_words_per_docx
+            if old_index.get(docx_name) == signature and os.path.exists(
+                docx_path
             ):
-                docx_path = os.path.join(
-                    docx_dir, f"part_{current_docx_index:02d}.docx"
-                )
-                current_doc.save(docx_path)
-                docx_paths.append(docx_path)
-                log.info(
-                    f"📄 Wrote {File(docx_path)} ({current_word_count} words)"
+                continue
+            pending_args_list.append(
+                (
+                    self.path,
+                    docx_path,
+                    [chapter_doc.path for chapter_doc in part_chapters],
                 )
+            )
+
+        build_docx_part = self.__build_docx_part__
+        if streaming and pending_args_list:
+            template_path = self.__create_docx_template__(docx_dir)
+            build_docx_part = self.__stream_docx_part__
+            pending_args_list = [
+                args + (template_path,) for args in pending_args_list
+            ]
+
+        # Parts are independent files, so each is built whole in a worker;
+        # a python-docx Document cannot be shared across processes.
+        for (_, docx_path, *_), part_word_count in zip(
+            pending_args_list,
+            self.__gen_in_pool__(build_docx_part, pending_args_list, workers),
+        ):
+            log.info(f"📄 Wrote {File(docx_path)} ({part_word_count} words)")
+
+        self.__remove_stale_docx_parts__(docx_dir, new_index)
+        JSONFile(index_path).write(new_index)
+
+        log.info(
+            f"📚 Wrote {len(pending_args_list)}/{len(docx_paths)}"
+            + f" parts to {docx_dir}"
+        )
+        return docx_paths
 
-                current_doc = None
-                current_docx_index += 1
-                current_word_count = 0
+    @classmethod
+    def __build_docx_part__(
+        cls, dir_book: str, docx_path: str, chapter_paths: list[str]
+    ) -> int:
+        book_dir = cls(dir_book)
+        chapter_docs = [ChapterFile(path) for path in chapter_paths]
+        doc = book_dir.__create_docx_document__()
+        for chapter_doc in chapter_docs:
+            book_dir.__add_docx_chapter_section__(doc, chapter_doc)
+        doc.save(docx_path)
+        return sum(chapter_doc.n_words for chapter_doc in chapter_docs)
+
+    @classmethod
+    def __stream_docx_part__(
+        cls,
+        dir_book: str,
+        docx_path: str,
+        chapter_paths: list[str],
+        template_path: str,
+    ) -> int:
+        # Each chapter is read, written and dropped in turn, and its IR
+        # is not cached, so only one chapter is in memory at a time.
+        book_dir = cls(dir_book)
+        n_words = 0
+        with DocXStreamWriter(template_path, docx_path) as writer:
+            book_dir.__write_docx_title_page__(writer)
+            for chapter_path in chapter_paths:
+                chapter_doc = ChapterFile(chapter_path)
+                writer.write_heading(
+                    f"{chapter_doc.number}. {chapter_doc.title}", level=1
+                )
+                book_dir.__write_docx_blocks__(
+                    ChapterIR.from_lines(chapter_doc.lines).blocks, writer
+                )
+                n_words += chapter_doc.n_words
+        return n_words
 
-            if current_doc is None:
-                current_doc = self.__create_docx_document__()
+    def __create_docx_template__(self, docx_dir: str) -> str:
+        # The package DocXStreamWriter copies: python-docx's default
+        # template, with the page layout and Normal style applied.
+        from docx import Document
 
-            self.__add_docx_chapter_section__(current_doc, chapter_doc)
-            current_word_count += chapter_word_count
+        template_path = os.path.join(docx_dir, self.DOCX_TEMPLATE_NAME)
+        doc = Document()
+        self.__configure_docx_page_layout__(doc)
+        doc.save(template_path)
+        return template_path
 
-        if current_doc is not None:
-            docx_path = os.path.join(
-                docx_dir, f"part_{current_docx_index:02d}.docx"
-            )
-            current_doc.save(docx_path)
-            docx_paths.append(docx_path)
-            log.debug(
-                f"📄 Wrote {File(docx_path)} ({current_word_count} words)"
-            )
+    @staticmethod
+    def __remove_stale_docx_parts__(docx_dir: str, index: dict):
+        for docx_path in glob.glob(os.path.join(docx_dir, "part_*.docx")):
+            if os.path.basename(docx_path) not in index:
+                os.remove(docx_path)
 
-        log.info(f"📚 Wrote {len(docx_paths)} parts to {docx_dir}")
-        return docx_paths
+    def __create_docx_document__(self) -> "Document":
+        # python-docx is imported on first use, so BookDir stays cheap to
+        # import for tools that never build a DOCX.
+        from docx import Document
 
-    def __create_docx_document__(self) -> Document:
         doc = Document()
         self.__configure_docx_page_layout__(doc)
         self.__add_docx_title_page__(doc)
         return doc
 
-    def __configure_docx_page_layout__(self, doc: Document):
+    def __configure_docx_page_layout__(self, doc: "Document"):
+        from docx.shared import Inches, Pt
+
         sections = doc.sections
         for section in sections:
             section.top_margin = Inches(1)
@@ -95,137 +216,137 @@ class BookDirDocXMixin:
         style.font.name = "Calibri"
         style.font.size = Pt(12)
 
-    def __add_docx_title_page__(self, doc: Document):
-        title_para = doc.add_paragraph()
-        title_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        title_run = title_para.add_run(data.TITLE)
-        title_run.font.size = Pt(28)
-        title_run.font.bold = True
-
-        subtitle_para = doc.add_paragraph()
-        subtitle_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        subtitle_run = subtitle_para.add_run(data.SUBTITLE)
-        subtitle_run.font.size = Pt(18)
-
-        doc.add_paragraph()
-        doc.add_paragraph()
-
-        author_para = doc.add_paragraph()
-        author_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        author_run = author_para.add_run(f"By {data.AUTHOR}")
-        author_run.font.size = Pt(14)
-
+    @staticmethod
+    def __gen_docx_title_runs__() -> Generator[DocXRun | None, None, None]:
+        # One centered paragraph per run; None is an empty paragraph.
+        yield DocXRun(data.TITLE, bold=True, font_size=28)
+        yield DocXRun(data.SUBTITLE, font_size=18)
+        for _ in range(2):
+            yield None
+        yield DocXRun(f"By {data.AUTHOR}", font_size=14)
         for _ in range(5):
-            doc.add_paragraph()
+            yield None
+        yield DocXRun(f"Copyright © 2025 by {data.AUTHOR}", font_size=10)
+        yield DocXRun("All rights reserved.", font_size=10)
 
-        copyright_para = doc.add_paragraph()
-        copyright_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        copyright_run = copyright_para.add_run(
-            f"Copyright © 2025 by {data.AUTHOR}"
-        )
-        copyright_run.font.size = Pt(10)
+    def __add_docx_title_page__(self, doc: "Document"):
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+        from docx.shared import Pt
 
-        copyright_notice = doc.add_paragraph()
-        copyright_notice.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        copyright_notice_run = copyright_notice.add_run(
-            "All rights reserved."
-        )
-        copyright_notice_run.font.size = Pt(10)
+        for title_run in self.__gen_docx_title_runs__():
+            para = doc.add_paragraph()
+            if title_run is None:
+                continue
+            para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            run = para.add_run(title_run.text)
+            run.font.size = Pt(title_run.font_size)
+            if title_run.bold:
+                run.font.bold = True
 
         doc.add_page_break()
 
-    def __add_docx_chapter_section__(self, doc: Document, chapter_doc):
+    def __write_docx_title_page__(self, writer: DocXStreamWriter):
+        for title_run in self.__gen_docx_title_runs__():
+            if title_run is None:
+                writer.write_paragraph()
+                continue
+            writer.write_paragraph([title_run], alignment="center")
+        writer.write_page_break()
+
+    @instrumented()
+    def __add_docx_chapter_section__(self, doc: "Document", chapter_doc):
         chapter_heading = f"{chapter_doc.number}. {chapter_doc.title}"
         doc.add_heading(chapter_heading, level=1)
-        lines = chapter_doc.lines[1:]
-        content = "\n".join(lines).strip()
-        self.__convert_markdown_to_docx__(content, doc)
+        chapter_ir = self.get_chapter_ir(chapter_doc)
+        self.__render_docx_blocks__(chapter_ir.blocks, doc)
 
     def __convert_markdown_to_docx__(
-        self, content: str, doc: Document
+        self, content: str, doc: "Document"
     ) -> None:
-        paragraphs = content.split("\n")
+        self.__render_docx_blocks__(
+            ChapterIR.parse_blocks(content.split("\n")), doc
+        )
 
-        for para_text in paragraphs:
-            para_text = para_text.strip()
-            if not para_text:
+    def __render_docx_blocks__(self, blocks: list, doc: "Document") -> None:
+        for block in blocks:
+            if block.kind == ChapterIR.BLANK:
                 continue
 
-            if re.match(r"^-{3,}$", para_text):
+            if block.kind == ChapterIR.SECTION_BREAK:
                 doc.add_paragraph("---")
                 continue
 
-            header_match = re.match(r"^(#{1,3})\s+(.+)$", para_text)
-            if header_match:
-                level = len(header_match.group(1))
-                title = header_match.group(2)
-                doc.add_heading(title, level=level)
+            if block.kind == ChapterIR.HEADING:
+                doc.add_heading(block.text, level=block.level)
                 continue
 
             para = doc.add_paragraph()
-            self.__add_formatted_text_to_docx_paragraph__(para, para_text)
+            self.__add_docx_runs__(para, block.spans)
 
-    def __add_formatted_text_to_docx_paragraph__(
-        self, para, text: str
+    def __write_docx_blocks__(
+        self, blocks: list, writer: DocXStreamWriter
     ) -> None:
-        pos = 0
-
-        while pos < len(text):
-            bold_match = re.search(r"\*\*(.+?)\*\*", text[pos:])
-            italic_match = re.search(r"\*(.+?)\*", text[pos:])
-            say_match = re.search(r"\\say\{(.+?)\}", text[pos:])
-
-            matches = []
-            if bold_match:
-                matches.append(
-                    (
-                        "bold",
-                        bold_match.start(),
-                        bold_match.end(),
-                        bold_match.group(1),
-                    )
-                )
-            if italic_match and not (
-                bold_match
-                and italic_match.start() >= bold_match.start()
-                and italic_match.start() < bold_match.end()
-            ):
-                matches.append(
-                    (
-                        "italic",
-                        italic_match.start(),
-                        italic_match.end(),
-                        italic_match.group(1),
-                    )
-                )
-            if say_match:
-                matches.append(
-                    (
-                        "say",
-                        say_match.start(),
-                        say_match.end(),
-                        say_match.group(1),
-                    )
-                )
+        for block in blocks:
+            if block.kind == ChapterIR.BLANK:
+                continue
 
-            if not matches:
-                para.add_run(text[pos:])
-                break
+            if block.kind == ChapterIR.SECTION_BREAK:
+                writer.write_paragraph([DocXRun("---")])
+                continue
+
+            if block.kind == ChapterIR.HEADING:
+                writer.write_heading(block.text, level=block.level)
+                continue
 
-            matches.sort(key=lambda x: x[1])
-            match_type, start, end, content = matches[0]
-            abs_start = pos + start
-            abs_end = pos + end
+            writer.write_paragraph(self.__get_docx_runs__(block.spans))
 
-            if start > 0:
-                para.add_run(text[pos:abs_start])
+    def __add_formatted_text_to_docx_paragraph__(
+        self, para, text: str
+    ) -> None:
+        self.__add_docx_runs__(para, ChapterIR.parse_spans(text))
 
-            run = para.add_run(content)
-            if match_type == "bold":
+    @classmethod
+    def __add_docx_runs__(cls, para, spans) -> None:
+        for docx_run in cls.__get_docx_runs__(spans):
+            run = para.add_run(docx_run.text)
+            if docx_run.bold:
                 run.bold = True
-            elif match_type == "italic":
-                run.italic = True
-            elif match_type == "say":
+            if docx_run.italic:
                 run.italic = True
 
-            pos = abs_end
+    @classmethod
+    def __get_docx_runs__(cls, spans) -> list[DocXRun]:
+        # Adjacent pieces formatted alike make up one run.
+        runs = []
+        for text, bold, italic in cls.__gen_docx_run_pieces__(
+            spans, False, False
+        ):
+            if runs and (runs[-1].bold, runs[-1].italic) == (bold, italic):
+                runs[-1] = runs[-1]._replace(text=runs[-1].text + text)
+            else:
+                runs.append(DocXRun(text, bold=bold, italic=italic))
+        return runs
+
+    @classmethod
+    def __gen_docx_run_pieces__(
+        cls, spans, bold: bool, italic: bool
+    ) -> Generator[tuple[str, bool, bool], None, None]:
+        for span in spans:
+            if span.style is None:
+                yield span.text, bold, italic
+            elif span.style in cls.DOCX_SPAN_FORMATS:
+                span_bold, span_italic = cls.DOCX_SPAN_FORMATS[span.style]
+                yield from cls.__gen_docx_run_pieces__(
+                    span.children, bold or span_bold, italic or span_italic
+                )
+            elif span.children:
+                # Quotes keep their marks, around formatted text.
+                opening, closing = ChapterIR.SPAN_DELIMITERS[span.style]
+                yield opening, bold, italic
+                yield from cls.__gen_docx_run_pieces__(
+                    span.children, bold, italic
+                )
+                yield closing, bold, italic
+            else:
+                # Notes are kept as they were written.
+                yield ChapterIR.to_markdown((span,)), bold, italic
@@ -1,38 +1,443 @@
+import glob
+import hashlib
 import os
 import re
+import shutil
+import subprocess
+from typing import Generator, Iterable
 
-from pylatex import Chapter, Command, Document
-from pylatex.utils import NoEscape
-from utils import Log
+from utils_base import File, JSONFile, Log
 
 from private import data
+from writing_utils.ChapterIR import Block, ChapterIR
+from writing_utils.Instrumentation import instrumented
+from writing_utils.LaTeXRuleEngine import LaTeXRule, LaTeXRuleEngine
 
 log = Log("BookDirLaTeXMixin")
 
 
 class BookDirLaTeXMixin:
+    # Bump whenever __convert_markdown_to_latex__ changes its output, so
+    # cached chapter fragments are regenerated.
+    LATEX_CONVERTER_VERSION = 2
+
+    LATEX_ABBREVIATIONS = r"\b(?:Mr|Mrs|Ms|Dr|Prof|Sr|Jr|vs|etc)\."
+    LATEX_ABBREVIATION_PATTERN = LATEX_ABBREVIATIONS + r"(?:(?! - )\s)+"
+
+    # Markdown is converted in a single scan (see LaTeXRuleEngine),
+    # earlier rules winning at the same position. The markup rules share
+    # ChapterIR's patterns, so chapters are rendered from their IR
+    # instead (see __render_latex_blocks__). More rules can be added with
+    # LATEX_RULE_ENGINE.add_rule; in the IR, they apply within the text
+    # of spans.
+    LATEX_RULE_ENGINE = LaTeXRuleEngine(
+        [
+            # An abbreviation's whitespace may join the next line on, so
+            # headings take abbreviations in whole. "## - " starts a
+            # dash, not a heading.
+            LaTeXRule(
+                "heading3",
+                r"^### (?!- )(?P<heading3>"
+                + rf"(?:{LATEX_ABBREVIATION_PATTERN}|.)+)$",
+                lambda s: r"\subsubsection{" + s + "}",
+                at_line_start=True,
+                first_chars="#",
+            ),
+            LaTeXRule(
+                "heading2",
+                r"^## (?!- )(?P<heading2>"
+                + rf"(?:{LATEX_ABBREVIATION_PATTERN}|.)+)$",
+                lambda s: r"\subsection{" + s + "}",
+                at_line_start=True,
+                first_chars="#",
+            ),
+            LaTeXRule(
+                "section_break",
+                r"^(?:---+| - )$",
+                lambda s: r"\sectionbreak{}",
+                at_line_start=True,
+                first_chars="- ",
+            ),
+            LaTeXRule("dash", r" - ", lambda s: "---", first_chars=" "),
+            LaTeXRule(
+                "escape",
+                r"(?<!\\)[&%$]",
+                lambda s: "\\" + s,
+                first_chars="&%$",
+            ),
+            LaTeXRule(
+                "abbreviation",
+                LATEX_ABBREVIATION_PATTERN,
+                lambda s: s.rstrip() + "\\ ",
+                first_chars="MDPSJve",
+            ),
+            LaTeXRule(
+                "quote",
+                ChapterIR.SPAN_PATTERNS["quote"],
+                lambda s: r"\say{" + s + "}",
+                first_chars='"',
+            ),
+            LaTeXRule(
+                "bold_italic",
+                ChapterIR.SPAN_PATTERNS["bold_italic"],
+                lambda s: r"\textbf{\textit{" + s + "}}",
+                first_chars="*",
+            ),
+            LaTeXRule(
+                "italic",
+                ChapterIR.SPAN_PATTERNS["italic"],
+                lambda s: r"\textit{" + s + "}",
+                first_chars="*",
+            ),
+            LaTeXRule(
+                "bold",
+                ChapterIR.SPAN_PATTERNS["bold"],
+                lambda s: r"\textbf{" + s + "}",
+                first_chars="*",
+            ),
+            LaTeXRule(
+                "loose_bold",
+                ChapterIR.SPAN_PATTERNS["loose_bold"],
+                lambda s: r"\textbf{" + s + "}",
+                first_chars="*",
+            ),
+            LaTeXRule(
+                "loose_italic",
+                ChapterIR.SPAN_PATTERNS["loose_italic"],
+                lambda s: r"\textit{" + s + "}",
+                first_chars="*",
+            ),
+        ],
+        str.maketrans(
+            {"\u2019": "'", "\u2018": "'", "\u2014": "-", "\u2013": "-"}
+        ),
+        # Obsidian notes, [[xxx]]
+        strip_pattern=ChapterIR.NOTE_PATTERN.pattern,
+        span_rules=[
+            "quote",
+            "bold_italic",
+            "italic",
+            "bold",
+            "loose_bold",
+            "loose_italic",
+        ],
+    )
+    # An abbreviation ending a line, whose whitespace runs on into the
+    # next.
+    LATEX_LINE_END_ABBREVIATION_REGEX = re.compile(
+        LATEX_ABBREVIATIONS + r"\s*$"
+    )
+
+    # The document is written line by line, each line ended with "%",
+    # exactly as pylatex's Document(documentclass="book",
+    # document_options=["a4paper", "12pt"]) would serialize it.
+    LATEX_DOCUMENT_CLASS = r"\documentclass[a4paper,12pt]{book}"
+    LATEX_DEFAULT_PACKAGES = [
+        r"\usepackage[T1]{fontenc}",
+        r"\usepackage[utf8]{inputenc}",
+        r"\usepackage{lmodern}",
+        r"\usepackage{textcomp}",
+        r"\usepackage{lastpage}",
+    ]
+    LATEX_SPECIAL_CHARS = {
+        "&": r"\&",
+        "%": r"\%",
+        "$": r"\$",
+        "#": r"\#",
+        "_": r"\_",
+        "{": r"\{",
+        "}": r"\}",
+        "~": r"\textasciitilde{}",
+        "^": r"\^{}",
+        "\\": r"\textbackslash{}",
+        "\n": "\\newline%\n",
+        "-": r"{-}",
+        "\xa0": "~",
+        "[": r"{[}",
+        "]": r"{]}",
+    }
+    # pdflatex is rerun until the files it reads back on the next pass
+    # stop changing. These are kept between builds, so an edit that
+    # moves no page or heading needs a single pass.
+    LATEX_PASS_STATE_EXTENSIONS = ["aux", "toc", "out"]
+    LATEX_MAX_PASSES = 5
+    LATEX_INCLUDED_TEX_PATTERN = "private/*.tex"
+    LATEX_TOC_ENTRY_PREFIX = r"\@writefile{toc}{"
+    # The preamble up to hyperref (which cannot be preloaded) is dumped
+    # into a pdflatex format with mylatexformat. A document compiled
+    # with -fmt skips its preamble up to this marker, which is a no-op
+    # without the format.
+    LATEX_FORMAT_DUMP_MARKER = r"\csname endofdump\endcsname"
+    LATEX_FORMAT_PREFIX = "preamble_"
+    LATEX_LATE_PREAMBLE = [r"\usepackage[hidelinks]{hyperref}"]
+
     def open_latex(self):
         latex_dir = self.__create_latex_directory__()
         pdf_path = os.path.join(latex_dir, "book.pdf")
         os.system(f'open "{pdf_path}"')
 
-    def build_latex(self, say_color) -> str:
+    @instrumented()
+    def build_latex(
+        self,
+        say_color,
+        workers: int | None = None,
+        pdf: bool = True,
+        max_words_per_pdf: int | None = None,
+        preamble_format: bool = True,
+    ) -> str:
+        """Write book.tex and, if pdf, compile it to book.pdf.
+
+        With max_words_per_pdf, the PDF is compiled as parts of about
+        that many words, in up to workers engine processes at once,
+        and the parts are merged into book.pdf.
+
+        With preamble_format, the preamble is precompiled once into a
+        format file that every later engine pass loads instead of
+        parsing it; if that is not possible the plain preamble is used.
+        """
         latex_dir = self.__create_latex_directory__()
         output_path = os.path.join(latex_dir, "book")
+        tex_path = output_path + ".tex"
 
         chapters = sorted(self.gen_chapter_docs(), key=lambda ch: ch.number)
 
-        # Calculate word count from chapters
-        word_count = sum(
-            len(" ".join(ch.lines[1:]).split()) for ch in chapters
+        word_count = sum(ch.n_words for ch in chapters)
+
+        fragment_names = self.__write_latex_chapter_fragments__(
+            chapters, latex_dir, say_color, workers
+        )
+        format_name = (
+            self.__get_latex_format__(latex_dir, say_color)
+            if pdf and preamble_format
+            else None
+        )
+        self.__write_latex_document__(
+            tex_path,
+            word_count,
+            say_color,
+            self.__gen_latex_book_body__(fragment_names),
+            format_name,
+        )
+
+        if not pdf:
+            log.info(f"📄 Wrote {tex_path}")
+            return tex_path
+
+        parts = (
+            self.__partition_chapters__(chapters, max_words_per_pdf)
+            if max_words_per_pdf
+            else [chapters]
+        )
+        if len(parts) == 1:
+            self.__compile_latex__(output_path, format_name)
+            return tex_path
+
+        part_fragment_names = []
+        i_start = 0
+        for part_chapters in parts:
+            i_end = i_start + len(part_chapters)
+            part_fragment_names.append(fragment_names[i_start:i_end])
+            i_start = i_end
+        self.__compile_latex_parts__(
+            output_path,
+            word_count,
+            say_color,
+            part_fragment_names,
+            format_name,
+            workers,
+        )
+        return tex_path
+
+    @staticmethod
+    def __read_latex_build_cache__(output_path: str) -> dict:
+        build_cache_path = output_path + ".build.json"
+        if not os.path.exists(build_cache_path):
+            return {}
+        return JSONFile(build_cache_path).read()
+
+    def __compile_latex__(
+        self, output_path: str, format_name: str | None = None
+    ):
+        pdf_path = output_path + ".pdf"
+        build_cache_path = output_path + ".build.json"
+        build_digest = self.__get_latex_build_digest__(output_path + ".tex")
+        build_cache = self.__read_latex_build_cache__(output_path)
+        if (
+            os.path.exists(pdf_path)
+            and build_cache.get("digest") == build_digest
+            and build_cache.get("part_sizes") is None
+        ):
+            log.info(f"📄 {pdf_path} is up to date")
+            return
+
+        format_name = self.__dump_latex_format__(
+            os.path.dirname(output_path), format_name
+        )
+        n_passes = self.__run_latex_engine__(output_path, format_name)
+        JSONFile(build_cache_path).write(
+            dict(digest=build_digest, n_passes=n_passes)
         )
+        passes_str = f" ({n_passes} passes)" if n_passes else ""
+        log.info(f"📄 Wrote {pdf_path}{passes_str}")
+
+    def __compile_latex_parts__(
+        self,
+        output_path: str,
+        word_count: int,
+        say_color: str,
+        part_fragment_names: list[list[str]],
+        format_name: str | None = None,
+        workers: int | None = None,
+    ):
+        # Each part is a document of its own, with the chapter and page
+        # counters set to where the previous part left off. The parts
+        # are compiled concurrently; page offsets and the table of
+        # contents (gathered from every part's .aux) are then updated,
+        # and the parts they change are recompiled, until they settle.
+        pdf_path = output_path + ".pdf"
+        build_cache_path = output_path + ".build.json"
+        build_digest = self.__get_latex_build_digest__(output_path + ".tex")
+        part_sizes = [len(names) for names in part_fragment_names]
+        build_cache = self.__read_latex_build_cache__(output_path)
+        if build_cache.get("part_sizes") != part_sizes:
+            build_cache = {}
+        is_up_to_date = build_cache.get("digest") == build_digest
+        if is_up_to_date and os.path.exists(pdf_path):
+            log.info(f"📄 {pdf_path} is up to date")
+            return
+
+        format_name = self.__dump_latex_format__(
+            os.path.dirname(output_path), format_name
+        )
+        n_parts = len(part_sizes)
+        part_paths = [f"{output_path}_part_{i:02d}" for i in range(n_parts)]
+        contents_path = output_path + "_contents.toc"
+        first_chapters = [sum(part_sizes[:i]) for i in range(n_parts)]
+        first_pages = build_cache.get("first_pages", [1] * n_parts)
+        part_digests = build_cache.get("part_digests", {})
+        if not os.path.exists(contents_path):
+            File(contents_path).write("")
+
+        for i_round in range(1, self.LATEX_MAX_PASSES + 1):
+            pending_paths = []
+            for i_part, part_path in enumerate(part_paths):
+                self.__write_latex_document__(
+                    part_path + ".tex",
+                    word_count,
+                    say_color,
+                    self.__gen_latex_part_body__(
+                        i_part,
+                        first_pages[i_part],
+                        first_chapters[i_part],
+                        part_fragment_names[i_part],
+                        os.path.basename(contents_path),
+                    ),
+                    format_name,
+                )
+                # Only the first part reads the table of contents.
+                digest = self.__get_latex_build_digest__(
+                    part_path + ".tex", [contents_path] if i_part == 0 else []
+                )
+                part_name = os.path.basename(part_path)
+                is_stale = part_digests.get(part_name) != digest
+                if is_stale or not os.path.exists(part_path + ".pdf"):
+                    pending_paths.append(part_path)
+                    part_digests[part_name] = digest
+
+            for _ in self.__gen_in_pool__(
+                self.__run_latex_engine__,
+                [(part_path, format_name) for part_path in pending_paths],
+                workers,
+            ):
+                pass
+            log.debug(
+                f"Round {i_round}: compiled {len(pending_paths)}"
+                + f"/{n_parts} parts"
+            )
+
+            new_first_pages = [1]
+            for part_path in part_paths[:-1]:
+                new_first_pages.append(
+                    new_first_pages[-1]
+                    + self.__get_pdf_n_pages__(part_path + ".pdf")
+                )
+            contents = "".join(
+                line + "\n"
+                for part_path in part_paths
+                for line in self.__read_latex_toc_entries__(part_path + ".aux")
+            )
+            is_contents_changed = File(contents_path).read() != contents
+            if new_first_pages == first_pages and not is_contents_changed:
+                break
+            first_pages = new_first_pages
+            File(contents_path).write(contents)
+        else:
+            # The merged PDF may have stale page numbers or contents, so
+            # no digest is kept and the next build carries on from here.
+            log.warning(
+                f"Page numbers of {pdf_path} did not settle"
+                + f" in {self.LATEX_MAX_PASSES} rounds"
+            )
+            build_digest = None
+
+        self.__merge_pdfs__(
+            [part_path + ".pdf" for part_path in part_paths], pdf_path
+        )
+        JSONFile(build_cache_path).write(
+            dict(
+                digest=build_digest,
+                part_sizes=part_sizes,
+                first_pages=first_pages,
+                part_digests=part_digests,
+            )
+        )
+        log.info(f"📄 Wrote {pdf_path} ({n_parts} parts, {i_round} rounds)")
+
+    @classmethod
+    def __read_latex_toc_entries__(cls, aux_path: str) -> list[str]:
+        # \addcontentsline writes each entry to the .aux on one line, as
+        # \@writefile{toc}{<entry>}.
+        if not os.path.exists(aux_path):
+            return []
+        with open(aux_path, "r", encoding="utf-8") as fin:
+            return [
+                line.rstrip("\n")[len(cls.LATEX_TOC_ENTRY_PREFIX) : -1]
+                for line in fin
+                if line.startswith(cls.LATEX_TOC_ENTRY_PREFIX)
+            ]
 
-        doc = self.__create_latex_document__(word_count, say_color)
-        self.__add_chapters_to_latex_document__(doc)
+    @staticmethod
+    def __get_pdf_n_pages__(pdf_path: str) -> int:
+        from pypdf import PdfReader
 
-        doc.generate_pdf(output_path, clean_tex=False)
-        log.info(f"📄 Wrote {output_path}.pdf")
-        return output_path + ".tex"
+        return len(PdfReader(pdf_path).pages)
+
+    @staticmethod
+    def __merge_pdfs__(pdf_paths: list[str], output_pdf_path: str):
+        from pypdf import PdfWriter
+
+        writer = PdfWriter()
+        for pdf_path in pdf_paths:
+            writer.append(pdf_path)
+        with open(output_pdf_path + ".tmp", "wb") as fout:
+            writer.write(fout)
+        os.replace(output_pdf_path + ".tmp", output_pdf_path)
+
+    @classmethod
+    def __get_latex_build_digest__(
+        cls, tex_path: str, other_paths: list[str] | None = None
+    ) -> str:
+        # Chapter fragments are named by their content, so book.tex
+        # changes whenever one does.
+        h = hashlib.sha256()
+        for path in (
+            [tex_path]
+            + sorted(glob.glob(cls.LATEX_INCLUDED_TEX_PATTERN))
+            + (other_paths or [])
+        ):
+            with open(path, "rb") as fin:
+                h.update(path.encode() + b"\0" + fin.read() + b"\0")
+        return h.hexdigest()
 
     def __create_latex_directory__(self) -> str:
         compiled_dir = self.path + ".compiled"
@@ -40,118 +445,337 @@ class BookDirLaTeXMixin:
         os.makedirs(latex_dir, exist_ok=True)
         return latex_dir
 
-    def __create_latex_document__(
-        self, word_count: int, say_color: str
-    ) -> Document:
-        doc = Document(
-            documentclass="book", document_options=["a4paper", "12pt"]
+    def __write_latex_document__(
+        self,
+        tex_path: str,
+        word_count: int,
+        say_color: str,
+        body_lines: Iterable[str],
+        format_name: str | None = None,
+    ):
+        with open(tex_path, "w", encoding="utf-8") as fout:
+            for line in self.__gen_latex_preloadable_lines__(say_color):
+                fout.write(line + "%\n")
+            if format_name is not None:
+                # The name makes a new format (after an engine upgrade,
+                # say) a change to the document and its build digest.
+                fout.write(self.LATEX_FORMAT_DUMP_MARKER + "%")
+                fout.write(format_name + "\n")
+            for line in self.LATEX_LATE_PREAMBLE:
+                fout.write(line + "%\n")
+            for line in self.__gen_latex_title_commands__(word_count):
+                fout.write(line + "%\n")
+            fout.write("%\n")
+
+            fout.write(r"\begin{document}%" + "\n")
+            fout.write(r"\normalsize%" + "\n")
+            for line in body_lines:
+                fout.write(line + "%\n")
+            fout.write(r"\end{document}")
+
+    def __gen_latex_preloadable_lines__(
+        self, say_color: str
+    ) -> Generator[str, None, None]:
+        yield self.LATEX_DOCUMENT_CLASS
+        yield from self.LATEX_DEFAULT_PACKAGES
+        # pylatex's (empty) variables section.
+        yield ""
+        yield from self.__gen_latex_preamble__(say_color)
+
+    def __get_latex_format__(
+        self, latex_dir: str, say_color: str
+    ) -> str | None:
+        """Return the name of the format for the preloadable preamble
+        and the installed pdflatex, or None without pdflatex.
+
+        Only the preamble's .tex is written here; the format is dumped
+        by __dump_latex_format__, when a PDF is actually compiled.
+        """
+        engine_path = shutil.which("pdflatex")
+        if engine_path is None:
+            return None
+        # The engine is identified by its file rather than by running
+        # pdflatex --version, which would cost every build a process.
+        engine_path = os.path.realpath(engine_path)
+        engine_stat = os.stat(engine_path)
+        engine_id = (
+            f"{engine_path}:{engine_stat.st_size}:{engine_stat.st_mtime_ns}"
         )
 
-        self.__configure_latex_page_layout__(doc, say_color)
-        self.__add_latex_title_page__(doc, word_count)
-
-        return doc
-
-    def __configure_latex_page_layout__(self, doc: Document, say_color: str):
-        doc.preamble.append(NoEscape(r"\usepackage[margin=1in]{geometry}"))
-        doc.preamble.append(NoEscape(r"\usepackage{mathpazo}"))
-        doc.preamble.append(NoEscape(r"\usepackage{setspace}"))
-        doc.preamble.append(NoEscape(r"\doublespacing"))
-        doc.preamble.append(NoEscape(r"\usepackage{csquotes}"))
-        doc.preamble.append(NoEscape(r"\usepackage{fancyhdr}"))
-        doc.preamble.append(NoEscape(r"\pagestyle{fancy}"))
-        doc.preamble.append(NoEscape(r"\fancyhf{}"))
-
-        doc.preamble.append(
-            NoEscape(r"\fancyhf[EHC]{\textit{" + data.TITLE + r"}}")
-        )
-        doc.preamble.append(
-            NoEscape(r"\fancyhf[OHC]{\textit{\nouppercase{\leftmark}}}")
+        preamble = "".join(
+            line + "%\n"
+            for line in self.__gen_latex_preloadable_lines__(say_color)
         )
+        key = hashlib.sha256(
+            (engine_id + "\0" + preamble).encode("utf-8")
+        ).hexdigest()[:16]
+        format_name = self.LATEX_FORMAT_PREFIX + key
+        format_tex_path = os.path.join(latex_dir, format_name + ".tex")
+        if not os.path.exists(format_tex_path):
+            File(format_tex_path).write(
+                preamble + r"\begin{document}%" + "\n" + r"\end{document}"
+            )
+        return format_name
+
+    @classmethod
+    def __dump_latex_format__(
+        cls, latex_dir: str, format_name: str | None
+    ) -> str | None:
+        """Return format_name once its .fmt exists, dumping it first if
+        needed, or None if it cannot be dumped.
+
+        Without mylatexformat nothing is recorded, so installing it
+        takes effect on the next build. A dump that fails anyway leaves
+        a .failed file, which holds for this engine and preamble only.
+        Formats for other engines or preambles are removed.
+        """
+        if format_name is None:
+            return None
+        format_path = os.path.join(latex_dir, format_name)
+        if os.path.exists(format_path + ".fmt"):
+            return format_name
+        if os.path.exists(format_path + ".failed"):
+            return None
+        if not cls.__has_latex_file__("mylatexformat.ltx"):
+            log.warning(
+                "mylatexformat is not installed; using the plain preamble"
+            )
+            return None
+
+        cls.__remove_latex_formats__(latex_dir, format_name)
+        try:
+            cls.__run_latex_command__(
+                [
+                    "pdflatex",
+                    "-ini",
+                    "--interaction=nonstopmode",
+                    "-jobname=" + format_name,
+                    "&pdflatex",
+                    "mylatexformat.ltx",
+                    format_name + ".tex",
+                ],
+                latex_dir,
+            )
+        except subprocess.CalledProcessError:
+            pass
+        if not os.path.exists(format_path + ".fmt"):
+            File(format_path + ".failed").write("")
+            log.warning(
+                f"Could not dump {format_path}.fmt; using the plain preamble"
+            )
+            return None
+        log.info(f"🧱 Wrote {format_path}.fmt")
+        return format_name
 
-        doc.preamble.append(NoEscape(r"\fancyhf[EHL]{\thepage}"))
-        doc.preamble.append(NoEscape(r"\fancyhf[OHR]{\thepage}"))
+    @staticmethod
+    def __has_latex_file__(file_name: str) -> bool:
+        try:
+            subprocess.check_output(
+                ["kpsewhich", file_name], stderr=subprocess.STDOUT
+            )
+        except (OSError, subprocess.CalledProcessError):
+            return False
+        return True
+
+    @classmethod
+    def __remove_latex_formats__(cls, latex_dir: str, keep_format_name: str):
+        for file_path in glob.glob(
+            os.path.join(latex_dir, cls.LATEX_FORMAT_PREFIX + "*.*")
+        ):
+            file_name = os.path.basename(file_path)
+            if file_name.split(".")[0] != keep_format_name:
+                os.remove(file_path)
+
+    def __gen_latex_book_body__(
+        self, fragment_names: list[str]
+    ) -> Generator[str, None, None]:
+        yield from self.__gen_latex_front_matter__()
+        for fragment_name in fragment_names:
+            yield r"\input{chapters/" + fragment_name + "}"
+
+    def __gen_latex_part_body__(
+        self,
+        i_part: int,
+        first_page: int,
+        first_chapter: int,
+        fragment_names: list[str],
+        contents_file_name: str,
+    ) -> Generator[str, None, None]:
+        if i_part == 0:
+            yield from self.__gen_latex_front_matter__(contents_file_name)
+        else:
+            yield r"\setcounter{page}{" + str(first_page) + "}"
+            yield r"\setcounter{chapter}{" + str(first_chapter) + "}"
+        for fragment_name in fragment_names:
+            yield r"\input{chapters/" + fragment_name + "}"
 
-        doc.preamble.append(NoEscape(r"\renewcommand{\headrulewidth}{0pt}"))
-        doc.preamble.append(
-            NoEscape(r"\renewcommand{\chaptermark}[1]{\markboth{#1}{#1}}")
-        )
-        doc.preamble.append(NoEscape(r"\usepackage{titlesec}"))
-        chapter_format = (
+    @staticmethod
+    def __gen_latex_preamble__(say_color: str) -> Generator[str, None, None]:
+        yield r"\usepackage[margin=1in]{geometry}"
+        yield r"\usepackage{mathpazo}"
+        yield r"\usepackage{setspace}"
+        yield r"\doublespacing"
+        yield r"\usepackage{csquotes}"
+        yield r"\usepackage{fancyhdr}"
+        yield r"\pagestyle{fancy}"
+        yield r"\fancyhf{}"
+
+        yield r"\fancyhf[EHC]{\textit{" + data.TITLE + r"}}"
+        yield r"\fancyhf[OHC]{\textit{\nouppercase{\leftmark}}}"
+
+        yield r"\fancyhf[EHL]{\thepage}"
+        yield r"\fancyhf[OHR]{\thepage}"
+
+        yield r"\renewcommand{\headrulewidth}{0pt}"
+        yield r"\renewcommand{\chaptermark}[1]{\markboth{#1}{#1}}"
+        yield r"\usepackage{titlesec}"
+        yield (
             r"\titleformat{\chapter}[hang]"
             r"{\normalfont\huge\bfseries}{\thechapter.}{1em}{}"
         )
-        doc.preamble.append(NoEscape(chapter_format))
-        doc.preamble.append(NoEscape(r"\usepackage[dvipsnames]{xcolor}"))
+        yield r"\usepackage[dvipsnames]{xcolor}"
 
-        sectionbreak_command = (
+        yield (
             r"\newcommand{\sectionbreak}{%" + "\n"
             r"  \par\bigskip%" + "\n"
             r"  \centerline{\large\ldots}%" + "\n"
             r"  \bigskip\par%" + "\n"
             r"}"
         )
-        doc.preamble.append(NoEscape(sectionbreak_command))
 
-        say_command = (
-            r"\newcommand{\say}[1]{{\color{" + say_color + r"}\enquote{#1}}}"
-        )
-        doc.preamble.append(NoEscape(say_command))
-        doc.preamble.append(NoEscape(r"\let\cleardoublepage\clearpage"))
-        doc.preamble.append(NoEscape(r"\usepackage[hidelinks]{hyperref}"))
-
-    def __add_latex_title_page__(self, doc: Document, word_count: int):
+        yield r"\newcommand{\say}[1]{{\color{" + say_color + r"}\enquote{#1}}}"
+        yield r"\let\cleardoublepage\clearpage"
 
+    @classmethod
+    def __gen_latex_title_commands__(
+        cls, word_count: int
+    ) -> Generator[str, None, None]:
         title_with_subtitle = data.TITLE + r"\\" + r"\large " + data.SUBTITLE
-        doc.preamble.append(Command("title", NoEscape(title_with_subtitle)))
+        yield r"\title{" + title_with_subtitle + "}"
 
-        doc.preamble.append(Command("author", "By " + data.AUTHOR))
+        yield r"\author{" + cls.__escape_latex__("By " + data.AUTHOR) + "}"
 
-        date_and_wordcount = NoEscape(
+        date_and_wordcount = (
             rf"\small{{{data.DATE}}}"
             + r"\\"
             + r"\vspace{1em}"
             + rf"\small{{{word_count:,} words}}"
         )
-        doc.preamble.append(Command("date", date_and_wordcount))
-
-        doc.append(NoEscape(r"\maketitle"))
-        doc.append(NoEscape(r"\newpage"))
-
-        self.__add_latex_copyright_page__(doc)
+        yield r"\date{" + date_and_wordcount + "}"
+
+    def __gen_latex_front_matter__(
+        self, contents_file_name: str | None = None
+    ) -> Generator[str, None, None]:
+        yield r"\maketitle"
+        yield r"\newpage"
+
+        yield from self.__gen_latex_copyright_page__()
+
+        yield self.__load_tex_file__("private/about_the_author.tex")
+        yield self.__load_tex_file__("private/about_the_book.tex")
+
+        yield r"\newpage"
+        if contents_file_name is None:
+            yield r"\tableofcontents"
+        else:
+            # \tableofcontents, but reading the entries of every part.
+            yield r"\makeatletter"
+            yield (
+                r"\chapter*{\contentsname\@mkboth"
+                + r"{\MakeUppercase\contentsname}"
+                + r"{\MakeUppercase\contentsname}}"
+            )
+            yield r"\@input{" + contents_file_name + "}"
+            yield r"\makeatother"
+        yield r"\newpage"
 
-        self.__add_author_bio_page__(doc)
-        self.__add_book_description_page__(doc)
-
-        doc.append(NoEscape(r"\newpage"))
-        doc.append(NoEscape(r"\tableofcontents"))
-        doc.append(NoEscape(r"\newpage"))
-
-    def __add_latex_copyright_page__(self, doc: Document):
-        doc.append(NoEscape(r"\thispagestyle{empty}"))
-        doc.append(NoEscape(r"\vspace*{\fill}"))
-        doc.append(NoEscape(r"\begin{center}"))
-        copyright_line = (
+    @staticmethod
+    def __gen_latex_copyright_page__() -> Generator[str, None, None]:
+        yield r"\thispagestyle{empty}"
+        yield r"\vspace*{\fill}"
+        yield r"\begin{center}"
+        yield (
             r"Copyright \textcopyright\ "
             + data.YEAR
             + r" by "
             + data.AUTHOR
             + r"\\"
         )
-        doc.append(NoEscape(copyright_line))
-        doc.append(NoEscape(r"\vspace{1em}"))
-        doc.append(NoEscape(r"All rights reserved.\\"))
-        doc.append(NoEscape(r"\end{center}"))
-        doc.append(NoEscape(r"\vspace*{\fill}"))
-        doc.append(NoEscape(r"\newpage"))
+        yield r"\vspace{1em}"
+        yield r"All rights reserved.\\"
+        yield r"\end{center}"
+        yield r"\vspace*{\fill}"
+        yield r"\newpage"
+
+    @classmethod
+    def __escape_latex__(cls, text: str) -> str:
+        # Same escaping as pylatex.utils.escape_latex.
+        return "".join(cls.LATEX_SPECIAL_CHARS.get(c, c) for c in text)
 
-    def __add_book_description_page__(self, doc: Document):
-        description = self.__load_tex_file__("private/about_the_book.tex")
-        doc.append(NoEscape(description))
+    @staticmethod
+    def __run_latex_command__(command: list[str], latex_dir: str):
+        try:
+            subprocess.check_output(
+                command, stderr=subprocess.STDOUT, cwd=latex_dir
+            )
+        except subprocess.CalledProcessError as e:
+            log.error(
+                f"{command[0]} failed:\n"
+                + e.output.decode("utf-8", errors="replace")
+            )
+            raise
+
+    @classmethod
+    def __get_latex_pass_state__(cls, output_path: str) -> dict[str, str]:
+        state = {}
+        for ext in cls.LATEX_PASS_STATE_EXTENSIONS:
+            path = output_path + "." + ext
+            if os.path.exists(path):
+                with open(path, "rb") as fin:
+                    state[ext] = hashlib.sha256(fin.read()).hexdigest()
+        return state
+
+    @classmethod
+    def __run_latex_engine__(
+        cls, output_path: str, format_name: str | None = None
+    ) -> int | None:
+        """Compile output_path.tex and return the number of passes run.
+
+        pdflatex is run again only while a pass changes the .aux, .toc
+        or .out files, loading format_name (in the same directory) if
+        given. Without pdflatex on the PATH, latexmk is used and does
+        its own pass control (None is returned).
+        """
+        output_path = os.path.abspath(output_path)
+        latex_dir = os.path.dirname(output_path)
+        tex_path = output_path + ".tex"
+        format_args = [] if format_name is None else ["-fmt=" + format_name]
+        try:
+            for i_pass in range(1, cls.LATEX_MAX_PASSES + 1):
+                state = cls.__get_latex_pass_state__(output_path)
+                cls.__run_latex_command__(
+                    ["pdflatex"]
+                    + format_args
+                    + ["--interaction=nonstopmode", tex_path],
+                    latex_dir,
+                )
+                if cls.__get_latex_pass_state__(output_path) == state:
+                    break
+            return i_pass
+        except FileNotFoundError:
+            pass
 
-    def __add_author_bio_page__(self, doc: Document):
-        bio = self.__load_tex_file__("private/about_the_author.tex")
-        doc.append(NoEscape(bio))
+        try:
+            cls.__run_latex_command__(
+                ["latexmk", "--pdf", "--interaction=nonstopmode", tex_path],
+                latex_dir,
+            )
+        except FileNotFoundError:
+            raise RuntimeError(
+                "No LaTeX compiler was found;"
+                + " install pdflatex or latexmk."
+            )
+        return None
 
     @staticmethod
     def __load_tex_file__(file_path: str) -> str:
@@ -164,103 +788,176 @@ class BookDirLaTeXMixin:
             log.warning(f"File not found: {file_path}")
             return ""
 
-    def __add_chapters_to_latex_document__(self, doc: Document):
-        chapters = sorted(self.gen_chapter_docs(), key=lambda ch: ch.number)
-
+    def __write_latex_chapter_fragments__(
+        self,
+        chapters: list,
+        latex_dir: str,
+        say_color: str,
+        workers: int | None = None,
+    ) -> list[str]:
+        fragments_dir = os.path.join(latex_dir, "chapters")
+        os.makedirs(fragments_dir, exist_ok=True)
+
+        fragment_names = []
+        pending_paths = []
+        pending_args_list = []
         for chapter_doc in chapters:
-            self.__add_latex_chapter_section__(doc, chapter_doc)
-
-    def __add_latex_chapter_section__(self, doc: Document, chapter_doc):
-        with doc.create(Chapter(chapter_doc.title, numbering=True)):
-            lines = chapter_doc.lines[1:]
-            content = "\n".join(lines).strip()
-            content = self.__convert_markdown_to_latex__(content)
-            doc.append(NoEscape(content))
-
-    @staticmethod
-    def __convert_markdown_to_latex__(content: str) -> str:
-        content = BookDirLaTeXMixin.__remove_obsidian_notes__(content)
-        content = BookDirLaTeXMixin.__normalize_punctuation__(content)
-        content = BookDirLaTeXMixin.__escape_special_chars__(content)
-        content = BookDirLaTeXMixin.__fix_spacing__(content)
-        content = BookDirLaTeXMixin.__convert_quotes__(content)
-        content = BookDirLaTeXMixin.__convert_text_formatting__(content)
-        content = BookDirLaTeXMixin.__convert_headers__(content)
-        content = BookDirLaTeXMixin.__convert_rules_and_paragraphs__(content)
-        return content
-
-    @staticmethod
-    def __remove_obsidian_notes__(content: str) -> str:
-        # Remove all Obsidian note references of the form [[xxx]]
-        content = re.sub(r"\[\[.+?\]\]", "", content)
-        return content
+            fragment_name = self.__get_latex_fragment_name__(
+                chapter_doc, say_color
+            )
+            fragment_path = os.path.join(fragments_dir, fragment_name + ".tex")
+            if not os.path.exists(fragment_path):
+                pending_paths.append(fragment_path)
+                pending_args_list.append(
+                    (
+                        chapter_doc.title,
+                        self.get_chapter_ir(chapter_doc).body_blocks,
+                    )
+                )
+            fragment_names.append(fragment_name)
+
+        for fragment_path, fragment in zip(
+            pending_paths,
+            self.__gen_in_pool__(
+                self.__build_latex_chapter_fragment__,
+                pending_args_list,
+                workers,
+            ),
+        ):
+            # Write then rename, so an interrupted build never leaves
+            # a partial fragment behind under a valid name.
+            File(fragment_path + ".tmp").write(fragment)
+            os.replace(fragment_path + ".tmp", fragment_path)
+
+        self.__remove_stale_latex_fragments__(fragments_dir, fragment_names)
+        log.info(
+            f"🧩 Converted {len(pending_paths)}/{len(chapters)}"
+            + " chapters to LaTeX"
+        )
+        return fragment_names
+
+    def __get_latex_fragment_name__(self, chapter_doc, say_color: str) -> str:
+        key = ":".join(
+            [
+                str(self.LATEX_CONVERTER_VERSION),
+                self.LATEX_RULE_ENGINE.signature,
+                say_color,
+                chapter_doc.content_hash,
+            ]
+        )
+        return hashlib.sha256(key.encode()).hexdigest()[:16]
 
     @staticmethod
-    def __fix_spacing__(content: str) -> str:
-        # Fix abbreviations: add \  after common abbreviations
-        for abbrev in [
-            "Mr",
-            "Mrs",
-            "Ms",
-            "Dr",
-            "Prof",
-            "Sr",
-            "Jr",
-            "vs",
-            "etc",
-        ]:
-            content = re.sub(rf"\b{abbrev}\.\s+", rf"{abbrev}.\\ ", content)
-
-        return content
+    def __remove_stale_latex_fragments__(
+        fragments_dir: str, fragment_names: list[str]
+    ):
+        fragment_file_names = {name + ".tex" for name in fragment_names}
+        for file_name in os.listdir(fragments_dir):
+            if file_name not in fragment_file_names:
+                os.remove(os.path.join(fragments_dir, file_name))
 
     @staticmethod
-    def __normalize_punctuation__(content: str) -> str:
-        # Convert curly apostrophes to straight apostrophes
-        content = content.replace("\u2019", "'")
-        content = content.replace("\u2018", "'")
-
-        # Convert em-dash and en-dash
-        content = content.replace(" - ", "---")
-        content = content.replace(" \u2014 ", "---")
-        content = content.replace(" \u2013 ", "---")
-        content = content.replace("\u2014", "-")
-        content = content.replace("\u2013", "-")
-
-        return content
+    @instrumented()
+    def __build_latex_chapter_fragment__(
+        title: str, blocks: list[Block]
+    ) -> str:
+        from pylatex import Chapter
+        from pylatex.utils import NoEscape
+
+        chapter = Chapter(title, numbering=True)
+        content = BookDirLaTeXMixin.__render_latex_blocks__(blocks)
+        chapter.append(NoEscape(content))
+        # The trailing "%" is the separator pylatex would have written
+        # after the chapter, had it been inlined in the main document.
+        return chapter.dumps_as_content() + "%"
 
     @staticmethod
-    def __convert_quotes__(content: str) -> str:
-        content = re.sub(
-            r'"([^"]*?)"', r"\\say{\1}", content, flags=re.DOTALL
+    def __convert_markdown_to_latex__(content: str) -> str:
+        return BookDirLaTeXMixin.__render_latex_blocks__(
+            ChapterIR.parse_blocks(content.split("\n"))
         )
-        return content
 
-    @staticmethod
-    def __convert_text_formatting__(content: str) -> str:
-        content = re.sub(r"\*\*(.+?)\*\*", r"\\textbf{\1}", content)
-        content = re.sub(r"\*(.+?)\*", r"\\textit{\1}", content)
-        return content
-
-    @staticmethod
-    def __convert_headers__(content: str) -> str:
-        content = re.sub(
-            r"^### (.+)$", r"\\subsubsection{\1}", content, flags=re.MULTILINE
+    @classmethod
+    def __render_latex_blocks__(cls, blocks: list[Block]) -> str:
+        """Render blocks as LATEX_RULE_ENGINE would convert their source.
+
+        From a line with an unpaired quote or an abbreviation at its end,
+        the rest is converted from source: the quote or the
+        abbreviation's whitespace runs on into the next lines, which a
+        block cannot.
+        """
+        lines = []
+        for i_block, block in enumerate(blocks):
+            prepared_source = cls.LATEX_RULE_ENGINE.prepare(block.source)
+            if cls.__is_latex_line_open__(block, prepared_source):
+                lines.append(
+                    cls.LATEX_RULE_ENGINE.convert(
+                        "\n".join(
+                            later_block.source
+                            for later_block in blocks[i_block:]
+                        )
+                    )
+                )
+                break
+            lines.append(cls.__render_latex_block__(block, prepared_source))
+        return "\n".join(lines)
+
+    @classmethod
+    def __is_latex_line_open__(cls, block: Block, prepared_source: str):
+        return cls.__has_latex_unpaired_quote__(block.spans) or bool(
+            cls.LATEX_LINE_END_ABBREVIATION_REGEX.search(prepared_source)
         )
-        content = re.sub(
-            r"^## (.+)$", r"\\subsection{\1}", content, flags=re.MULTILINE
-        )
-        return content
 
-    @staticmethod
-    def __escape_special_chars__(content: str) -> str:
-        content = re.sub(r"(?<!\\)&", r"\\&", content)
-        content = re.sub(r"(?<!\\)%", r"\\%", content)
-        content = re.sub(r"(?<!\\)\$", r"\\$", content)
-        return content
+    @classmethod
+    def __has_latex_unpaired_quote__(cls, spans) -> bool:
+        # Quotes inside the engine's spans cannot pair up beyond them.
+        return any(
+            (
+                '"' in span.text
+                if span.style is None
+                else span.style not in cls.LATEX_RULE_ENGINE.span_rules
+                and cls.__has_latex_unpaired_quote__(span.children)
+            )
+            for span in spans
+        )
 
-    @staticmethod
-    def __convert_rules_and_paragraphs__(content: str) -> str:
-        content = re.sub(
-            r"^---+$", r"\\sectionbreak{}", content, flags=re.MULTILINE
+    @classmethod
+    def __render_latex_block__(cls, block: Block, prepared_source: str) -> str:
+        # Lines the IR reads otherwise than the engine, as an indented
+        # line, or "## [[note]]", a heading only before its note is
+        # stripped, are converted from source.
+        engine = cls.LATEX_RULE_ENGINE
+        spans = ChapterIR.without_notes(block.spans)
+        if block.source != block.text or not cls.__has_latex_rules__(spans):
+            return engine.convert(block.source)
+
+        line_match = engine.regex.match(prepared_source)
+        rule = (
+            None
+            if line_match is None
+            else (engine.rules_by_group[line_match.lastgroup])
+        )
+        if rule is None or not rule.at_line_start:
+            if block.kind == ChapterIR.PARAGRAPH:
+                return engine.render_spans(spans)
+            return engine.convert(block.source)
+
+        if rule.name not in line_match.re.groupindex:
+            if line_match.end() == len(prepared_source):
+                return rule.replace(line_match.group())
+        elif block.kind == ChapterIR.HEADING and line_match.group(
+            rule.name
+        ) == engine.prepare(block.text):
+            return rule.replace(engine.render_spans(spans))
+        return engine.convert(block.source)
+
+    @classmethod
+    def __has_latex_rules__(cls, spans) -> bool:
+        return all(
+            span.style is None
+            or (
+                span.style in cls.LATEX_RULE_ENGINE.span_rules
+                and cls.__has_latex_rules__(span.children)
+            )
+            for span in spans
         )
-        return content
@@ -1,15 +1,19 @@
+import itertools
 import os
 import shutil
 
-from utils import File, Log
+from utils_base import File, Log
 
 from private import data
+from writing_utils.ChapterIR import ChapterIR
+from writing_utils.Instrumentation import instrumented
 
 log = Log("BookDirMarkdownMixin")
 
 
 class BookDirMarkdownMixin:
-    def build_md(self) -> str:
+    @instrumented()
+    def build_md(self, workers: int | None = None) -> str:
         compiled_dir = self.path + ".compiled"
         os.makedirs(compiled_dir, exist_ok=True)
         md_path = os.path.join(compiled_dir, "book.md")
@@ -24,64 +28,87 @@ class BookDirMarkdownMixin:
         lines.append("---")
         lines.append("")
 
-        for chapter_doc in self.gen_chapter_docs():
-            chapter_lines = chapter_doc.lines
-            for line in chapter_lines:
-                if line.startswith("# "):
-                    line = "#" + line
-                lines.append(line)
+        for chapter_ir in self.gen_chapter_irs(
+            self.gen_chapter_docs(), workers
+        ):
+            lines.extend(self.__render_md_chapter_lines__(chapter_ir))
             lines.append("")
 
         File(md_path).write_lines(lines)
         log.info(f"📝 Wrote {File(md_path)}")
         return md_path
 
+    @staticmethod
+    def __render_md_chapter_lines__(chapter_ir) -> list[str]:
+        # Chapter titles become level 2 headings in the book, and so do
+        # level 1 headings within chapters.
+        title_line = chapter_ir.title_line
+        if title_line.startswith("# "):
+            title_line = "#" + title_line
+        lines = [title_line]
+        for block in chapter_ir.blocks:
+            if block.kind == ChapterIR.BLANK:
+                lines.append("")
+            elif block.kind == ChapterIR.SECTION_BREAK:
+                lines.append(block.text)
+            elif block.kind == ChapterIR.HEADING:
+                lines.append(
+                    "#" * max(block.level, 2)
+                    + " "
+                    + ChapterIR.to_markdown(block.spans)
+                )
+            else:
+                lines.append(ChapterIR.to_markdown(block.spans))
+        return lines
+
     @classmethod
+    @instrumented()
     def from_md(cls, md_path: str, output_dir: str):
         shutil.rmtree(output_dir, ignore_errors=True)
         os.makedirs(output_dir, exist_ok=True)
 
-        lines = File(md_path).read_lines()
-
-        chapters = []
+        # Stream the file; only the current chapter is held in memory and
+        # it is written out as soon as the next "## " line is seen.
         current_chapter_lines = []
-
-        for line in lines[8:]:
-            if line.startswith("## "):
-                if current_chapter_lines:
-                    chapters.append(current_chapter_lines)
-                current_chapter_lines = [line]
-            else:
-                if current_chapter_lines or line.strip():
-                    current_chapter_lines.append(line)
-
-        if current_chapter_lines:
-            chapters.append(current_chapter_lines)
-
-        for i, chapter_lines in enumerate(chapters, start=1):
-            new_chapter_lines = []
-            title_line = None
-            for line in chapter_lines:
+        with open(md_path, "r", encoding="utf-8") as fin:
+            for line in itertools.islice(fin, 8, None):
+                line = line.rstrip("\n")
                 if line.startswith("## "):
-                    line = "# " + line[3:].strip()
-                    if title_line is None:
-                        title_line = line
-                    else:
-                        raise ValueError(
-                            "Multiple title lines found in chapter"
+                    if current_chapter_lines:
+                        cls.__write_md_chapter__(
+                            current_chapter_lines, output_dir
                         )
-                new_chapter_lines.append(line)
-
-            chapter_content = "\n".join(new_chapter_lines).strip()
-
-            title_only = title_line[2:].strip()
-            num_only = int(title_only.split(".", 1)[0].strip())
-            name_only = title_only.split(".", 1)[1].strip()
-            name_id = name_only.replace(" ", "_").replace("/", "-")
-            chapter_filename = f"{num_only:02d}-{name_id}.md"
-            chapter_path = os.path.join(output_dir, chapter_filename)
+                    current_chapter_lines = [line]
+                else:
+                    if current_chapter_lines or line.strip():
+                        current_chapter_lines.append(line)
 
-            File(chapter_path).write(chapter_content)
+        if current_chapter_lines:
+            cls.__write_md_chapter__(current_chapter_lines, output_dir)
 
         log.info(f"📚 Created BookDir from {File(md_path)} at {output_dir}")
         return cls(output_dir)
+
+    @staticmethod
+    def __write_md_chapter__(chapter_lines: list[str], output_dir: str):
+        new_chapter_lines = []
+        title_line = None
+        for line in chapter_lines:
+            if line.startswith("## "):
+                line = "# " + line[3:].strip()
+                if title_line is None:
+                    title_line = line
+                else:
+                    raise ValueError("Multiple title lines found in chapter")
+            new_chapter_lines.append(line)
+
+        chapter_content = "\n".join(new_chapter_lines).strip()
+
+        title_only = title_line[2:].strip()
+        num_only = int(title_only.split(".", 1)[0].strip())
+        name_only = title_only.split(".", 1)[1].strip()
+        name_id = name_only.replace(" ", "_").replace("/", "-")
+        chapter_filename = f"{num_only:02d}-{name_id}.md"
+        chapter_path = os.path.join(output_dir, chapter_filename)
+
+        File(chapter_path).write(chapter_content)
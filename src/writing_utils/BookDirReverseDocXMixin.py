@@ -3,10 +3,11 @@ import os
 import re
 import shutil
 
-from docx import Document
-from utils import File, Log
+from utils_base import File, Log
 
 from writing_utils.ChapterFile import ChapterFile
+from writing_utils.DocXStreamReader import DocXStreamReader
+from writing_utils.Instrumentation import instrumented
 
 log = Log("BookDirReverseDocXMixin")
 
@@ -25,25 +26,50 @@ class BookDirReverseDocXMixin:
         return formatted_text.strip()
 
     @classmethod
-    def from_docx(cls, docx_path: str):
-        """Load BookDir from a single DOCX file or directory of multiple DOCX files."""
+    @instrumented()
+    def from_docx(
+        cls,
+        docx_path: str,
+        streaming: bool = False,
+        workers: int | None = None,
+    ):
+        """Load BookDir from a single DOCX file or directory of multiple DOCX files.
+
+        With streaming=True, word/document.xml is read directly with
+        DocXStreamReader instead of through python-docx. The result is
+        the same, but it is faster and uses far less memory. For a
+        directory, parts are parsed in parallel when workers > 1.
+        """
         # Determine if it's a directory or single file
         if os.path.isdir(docx_path):
             # Load from directory of multiple DOCX files
-            return cls._load_from_docx_directory(docx_path)
+            return cls._load_from_docx_directory(docx_path, streaming, workers)
         else:
             # Load from single DOCX file (legacy support)
-            return cls._load_from_single_docx(docx_path)
+            return cls._load_from_single_docx(docx_path, streaming)
 
     @classmethod
-    def _load_from_single_docx(cls, docx_path: str):
-        """Load BookDir from a single DOCX file."""
+    def _gen_docx_paragraphs(cls, docx_path: str, streaming: bool = False):
+        """Yield (style_name, formatted_text) for each body paragraph."""
+        if streaming:
+            yield from DocXStreamReader(docx_path).gen_paragraphs()
+            return
+        from docx import Document
+
         doc = Document(docx_path)
+        for para in doc.paragraphs:
+            yield para.style.name, cls.extract_formatted_text(para)
+
+    @classmethod
+    def _load_from_single_docx(cls, docx_path: str, streaming: bool = False):
+        """Load BookDir from a single DOCX file."""
         temp_dir = docx_path + ".bookdir"
         shutil.rmtree(temp_dir, ignore_errors=True)
         os.makedirs(temp_dir, exist_ok=True)
 
-        chapters = cls._parse_chapters_from_doc(doc)
+        chapters = cls._parse_chapters_from_paragraphs(
+            cls._gen_docx_paragraphs(docx_path, streaming)
+        )
         cls._save_chapters_to_files(chapters, temp_dir)
 
         book_dir = cls(temp_dir)
@@ -51,8 +77,18 @@ class BookDirReverseDocXMixin:
         return book_dir
 
     @classmethod
-    def _load_from_docx_directory(cls, docx_dir: str):
-        """Load BookDir from a directory containing multiple DOCX files."""
+    def _load_from_docx_directory(
+        cls,
+        docx_dir: str,
+        streaming: bool = False,
+        workers: int | None = None,
+    ):
+        """Load BookDir from a directory containing multiple DOCX files.
+
+        Chapter files are written as each part is parsed. A chapter
+        number found in more than one part raises a ValueError, after
+        all parts have been read.
+        """
         # Find all part_*.docx files in the directory, sorted by part number
         docx_files = sorted(glob.glob(os.path.join(docx_dir, "part_*.docx")))
 
@@ -63,14 +99,34 @@ class BookDirReverseDocXMixin:
         shutil.rmtree(temp_dir, ignore_errors=True)
         os.makedirs(temp_dir, exist_ok=True)
 
-        all_chapters = {}
-
-        for docx_path in docx_files:
-            doc = Document(docx_path)
-            chapters = cls._parse_chapters_from_doc(doc, skip_title_page=True)
-            all_chapters.update(chapters)
-
-        cls._save_chapters_to_files(all_chapters, temp_dir)
+        chapter_num_to_part = {}
+        duplicates = []
+        for docx_path, chapters in zip(
+            docx_files,
+            cls.__gen_in_pool__(
+                cls._parse_docx_part,
+                [(docx_path, streaming) for docx_path in docx_files],
+                workers,
+            ),
+        ):
+            part_name = os.path.basename(docx_path)
+            new_chapters = {}
+            for chapter_num, chapter in chapters.items():
+                if chapter_num in chapter_num_to_part:
+                    duplicates.append(
+                        f"{chapter_num} ({chapter_num_to_part[chapter_num]}"
+                        + f", {part_name})"
+                    )
+                    continue
+                chapter_num_to_part[chapter_num] = part_name
+                new_chapters[chapter_num] = chapter
+            cls._save_chapters_to_files(new_chapters, temp_dir)
+
+        if duplicates:
+            raise ValueError(
+                f"Duplicate chapter numbers in {docx_dir}: "
+                + ", ".join(duplicates)
+            )
 
         book_dir = cls(temp_dir)
         log.info(
@@ -79,14 +135,32 @@ class BookDirReverseDocXMixin:
         return book_dir
 
     @classmethod
-    def _parse_chapters_from_doc(cls, doc, skip_title_page=False):
-        """Extract chapters from Document, preserving formatting.
+    def _parse_docx_part(cls, docx_path: str, streaming: bool = False):
+        return cls._parse_chapters_from_paragraphs(
+            cls._gen_docx_paragraphs(docx_path, streaming),
+            skip_title_page=True,
+        )
+
+    @classmethod
+    def _parse_chapters_from_paragraphs(
+        cls, paragraphs, skip_title_page=False
+    ):
+        """Collect the chapters from _gen_chapters_from_paragraphs by number."""
+        chapters = {}
+        for chapter_num, title, content in cls._gen_chapters_from_paragraphs(
+            paragraphs, skip_title_page
+        ):
+            chapters[chapter_num] = (title, content)
+        return chapters
+
+    @staticmethod
+    def _gen_chapters_from_paragraphs(paragraphs, skip_title_page=False):
+        """Yield (number, title, content) as each chapter is completed.
 
         Args:
-            doc: The Document to parse
+            paragraphs: (style_name, formatted_text) pairs, in order
             skip_title_page: If True, skip paragraphs before the first chapter heading
         """
-        chapters = {}
         current_chapter_num = None
         current_chapter_title = None
         current_chapter_lines = []
@@ -94,16 +168,14 @@ class BookDirReverseDocXMixin:
             not skip_title_page
         )  # If skipping, start in "found" state
 
-        for para in doc.paragraphs:
-            style_name = para.style.name
-            text = cls.extract_formatted_text(para)
-
+        for style_name, text in paragraphs:
             if style_name.startswith("Heading 1"):
                 heading_match = re.match(r"(\d+)\.\s+(.+)", text)
                 if heading_match:
                     found_first_chapter = True
                     if current_chapter_num is not None:
-                        chapters[current_chapter_num] = (
+                        yield (
+                            current_chapter_num,
                             current_chapter_title,
                             "\n".join(current_chapter_lines),
                         )
@@ -120,13 +192,12 @@ class BookDirReverseDocXMixin:
                 current_chapter_lines.append(text)
 
         if current_chapter_num is not None:
-            chapters[current_chapter_num] = (
+            yield (
+                current_chapter_num,
                 current_chapter_title,
                 "\n".join(current_chapter_lines),
             )
 
-        return chapters
-
     @staticmethod
     def _save_chapters_to_files(chapters, temp_dir):
         """Write chapters to individual markdown files."""
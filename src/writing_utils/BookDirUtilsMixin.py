@@ -1,13 +1,18 @@
 import os
 import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Generator
 
-from utils import Log
+from utils_base import Log
+
+from writing_utils.Instrumentation import instrumented
 
 log = Log("BookDir")
 
 
 class BookDirUtilsMixin:
 
+    @instrumented()
     def clean_and_write_all(self):
         n_cleaned = 0
         for chapter_doc in self.gen_chapter_docs():
@@ -15,6 +20,7 @@ class BookDirUtilsMixin:
                 n_cleaned += 1
         log.info(f"🧹 Cleaned {n_cleaned} chapters.")
 
+    @instrumented()
     def rename_files(self, name_map: dict[str, str]):
         n_renamed = 0
         for old_file_name, new_file_name in name_map.items():
@@ -42,6 +48,52 @@ class BookDirUtilsMixin:
     def print_statistics(self):
         log.info(f"n_chars={self.n_chars:,}")
         log.info(f"n_words={self.n_words:,}")
+        log.info(f"n_paragraphs={self.n_paragraphs:,}")
+        log.info(f"n_sentences={self.n_sentences:,}")
+
+    @staticmethod
+    def __partition_chapters__(
+        chapters: list, max_words_per_part: int
+    ) -> list[list]:
+        # Consecutive chapters, each part kept under max_words_per_part
+        # unless a single chapter is longer.
+        parts = []
+        current_part = None
+        current_word_count = 0
+        for chapter_doc in chapters:
+            chapter_word_count = chapter_doc.n_words
+            if (
+                current_part is not None
+                and current_word_count + chapter_word_count
+                > max_words_per_part
+            ):
+                current_part = None
+                current_word_count = 0
+
+            if current_part is None:
+                current_part = []
+                parts.append(current_part)
+
+            current_part.append(chapter_doc)
+            current_word_count += chapter_word_count
+        return parts
+
+    @staticmethod
+    def __gen_in_pool__(
+        func: Callable, args_list: list[tuple], workers: int | None = None
+    ) -> Generator:
+        """Yield func(*args) for each args, in order.
+
+        With workers > 1 the calls run in a process pool, so func and its
+        arguments must be picklable (e.g. a staticmethod taking strings).
+        """
+        if not workers or workers <= 1 or len(args_list) <= 1:
+            for args in args_list:
+                yield func(*args)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(func, *zip(*args_list))
 
     def open(self):
         os.system(f'open -a Obsidian "{self.path}"')
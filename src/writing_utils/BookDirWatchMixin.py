@@ -0,0 +1,130 @@
+import os
+import time
+
+from utils_base import Log
+
+log = Log("BookDirWatchMixin")
+
+
+class BookDirWatchMixin:
+    WATCH_FORMATS = ("md", "docx", "latex")
+
+    def watch(
+        self,
+        formats: tuple[str, ...] = WATCH_FORMATS,
+        say_color: str = "Maroon",
+        max_words_per_docx: int = 50000,
+        poll_interval: float = 0.2,
+        debounce: float = 0.5,
+        workers: int | None = None,
+        max_builds: int | None = None,
+    ):
+        """Rebuild formats whenever chapters change, until interrupted.
+
+        The directory is polled every poll_interval seconds. A build
+        starts once no file has changed for debounce seconds, so a burst
+        of saves gives one build. Builds reuse the cached chapter IRs,
+        LaTeX fragments and DOCX parts, so only changed chapters are
+        converted again. Saves that leave every chapter's content as it
+        was (e.g. a touch) do not trigger a build. A failed build (e.g.
+        of a half-saved chapter) is logged, and retried on the next
+        change.
+        """
+        for output_format in formats:
+            assert (
+                output_format in self.WATCH_FORMATS
+            ), f"Unknown format: {output_format}"
+
+        state = self.__get_watch_state__()
+        content_hashes = self.__try_build_watched_formats__(
+            {}, formats, say_color, max_words_per_docx, workers
+        )
+        n_builds = 1
+        log.info(f"👀 Watching {self.path}")
+        try:
+            while max_builds is None or n_builds < max_builds:
+                time.sleep(poll_interval)
+                new_state = self.__get_watch_state__()
+                if new_state == state:
+                    continue
+
+                # Debounce: wait for the directory to settle.
+                while True:
+                    state = new_state
+                    time.sleep(debounce)
+                    new_state = self.__get_watch_state__()
+                    if new_state == state:
+                        break
+
+                new_content_hashes = self.__get_content_hashes__()
+                changed = sorted(
+                    file_name
+                    for file_name in (
+                        set(content_hashes) | set(new_content_hashes)
+                    )
+                    if content_hashes.get(file_name)
+                    != new_content_hashes.get(file_name)
+                )
+                if not changed:
+                    continue
+                log.info(f"✏️ Changed: {', '.join(changed)}")
+                content_hashes = self.__try_build_watched_formats__(
+                    content_hashes,
+                    formats,
+                    say_color,
+                    max_words_per_docx,
+                    workers,
+                )
+                n_builds += 1
+        except KeyboardInterrupt:
+            log.info("Stopped watching.")
+
+    def __get_watch_state__(self) -> dict[str, tuple[int, int]]:
+        state = {}
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".md"):
+                    continue
+                stat = entry.stat()
+                state[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def __get_content_hashes__(self) -> dict[str, str]:
+        return {
+            os.path.basename(chapter_doc.path): chapter_doc.content_hash
+            for chapter_doc in self.gen_chapter_docs()
+        }
+
+    def __try_build_watched_formats__(
+        self, content_hashes: dict[str, str], *args
+    ) -> dict[str, str]:
+        # On failure the last built hashes are kept, so the chapters
+        # changed since then are still changed on the next poll.
+        try:
+            return self.__build_watched_formats__(*args)
+        except Exception as e:
+            log.error(f"Build failed: {e!r}")
+            return content_hashes
+
+    def __build_watched_formats__(
+        self,
+        formats: tuple[str, ...],
+        say_color: str,
+        max_words_per_docx: int,
+        workers: int | None,
+    ) -> dict[str, str]:
+        t_start = time.perf_counter()
+        content_hashes = self.__get_content_hashes__()
+        # Drop the IRs of revisions that are no longer on disk.
+        for content_hash in set(self.chapter_ir_cache) - set(
+            content_hashes.values()
+        ):
+            del self.chapter_ir_cache[content_hash]
+        if "md" in formats:
+            self.build_md(workers=workers)
+        if "docx" in formats:
+            self.build_docx(max_words_per_docx, workers=workers)
+        if "latex" in formats:
+            self.build_latex(say_color, workers=workers)
+        log.info(f"🔁 Rebuilt in {time.perf_counter() - t_start:.2f}s")
+        return content_hashes
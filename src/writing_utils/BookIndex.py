@@ -0,0 +1,221 @@
+import os
+import re
+import sqlite3
+from array import array
+from functools import cached_property
+from typing import Generator
+
+from utils_base import Log
+
+from writing_utils.Instrumentation import instrumented
+
+log = Log("BookIndex")
+
+
+class BookIndex:
+    """Inverted word index over a book, kept in <book>.compiled/.
+
+    Each token maps to, per chapter file, the positions it occurs at,
+    encoded as i_line * LINE_STRIDE + i_token. The postings are rows of
+    an SQLite table, keyed by token, with the positions packed into a
+    blob, so a query reads the postings of its own tokens only. Line
+    text is not stored: matched lines are read from the chapters.
+    Chapters are re-indexed only when their content hash changes.
+    """
+
+    VERSION = 2
+    LINE_STRIDE = 1 << 20
+    TOKEN_PATTERN = re.compile(r"\w+")
+    POSITIONS_TYPECODE = "q"
+    LEGACY_FILE_NAME = "index.json"
+
+    def __init__(self, dir_book: str):
+        self.dir_book = dir_book
+        self.dir_compiled = dir_book + ".compiled"
+        self.path = os.path.join(self.dir_compiled, "index.sqlite")
+        # The chapters of the last update, by file name, which queries
+        # read matched lines from.
+        self.chapter_docs = {}
+        self.postings_cache = {}
+        self.position_set_cache = {}
+
+    @cached_property
+    def connection(self) -> sqlite3.Connection:
+        os.makedirs(self.dir_compiled, exist_ok=True)
+        legacy_path = os.path.join(self.dir_compiled, self.LEGACY_FILE_NAME)
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+        try:
+            return self.__connect__()
+        except sqlite3.DatabaseError:
+            log.warning(f"Ignoring unreadable index: {self.path}")
+            os.remove(self.path)
+            return self.__connect__()
+
+    def __connect__(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path)
+        (version,) = connection.execute("PRAGMA user_version").fetchone()
+        if version == self.VERSION:
+            return connection
+        with connection:
+            connection.executescript("""
+                DROP TABLE IF EXISTS chapters;
+                DROP TABLE IF EXISTS postings;
+                CREATE TABLE chapters (
+                    file_name TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL
+                );
+                CREATE TABLE postings (
+                    token TEXT NOT NULL,
+                    file_name TEXT NOT NULL,
+                    positions BLOB NOT NULL,
+                    PRIMARY KEY (token, file_name)
+                ) WITHOUT ROWID;
+                CREATE INDEX postings_file_name ON postings (file_name);
+                """)
+            connection.execute(f"PRAGMA user_version = {self.VERSION}")
+        return connection
+
+    # Updates
+    @instrumented()
+    def update(self, chapter_docs):
+        self.chapter_docs = {
+            os.path.basename(chapter_doc.path): chapter_doc
+            for chapter_doc in chapter_docs
+        }
+        content_hashes = dict(
+            self.connection.execute(
+                "SELECT file_name, content_hash FROM chapters"
+            )
+        )
+        stale_file_names = [
+            file_name
+            for file_name in content_hashes
+            if file_name not in self.chapter_docs
+        ]
+        changed_docs = [
+            (file_name, chapter_doc)
+            for file_name, chapter_doc in self.chapter_docs.items()
+            if content_hashes.get(file_name) != chapter_doc.content_hash
+        ]
+        if not stale_file_names and not changed_docs:
+            return
+
+        with self.connection:
+            for file_name in stale_file_names:
+                self.__remove_chapter__(file_name)
+            for file_name, chapter_doc in changed_docs:
+                if file_name in content_hashes:
+                    self.__remove_chapter__(file_name)
+                self.__add_chapter__(file_name, chapter_doc)
+        self.postings_cache = {}
+        self.position_set_cache = {}
+        log.debug(
+            f"Indexed {len(changed_docs)} chapters,"
+            + f" removed {len(stale_file_names)}"
+        )
+
+    @classmethod
+    def get_token_positions(cls, lines: list[str]) -> dict[str, list[int]]:
+        token_positions = {}
+        for i_line, line in enumerate(lines):
+            line_offset = i_line * cls.LINE_STRIDE
+            for i_token, token in enumerate(cls.TOKEN_PATTERN.findall(line)):
+                token_positions.setdefault(token, []).append(
+                    line_offset + i_token
+                )
+        return token_positions
+
+    def __add_chapter__(self, file_name: str, chapter_doc):
+        self.connection.execute(
+            "INSERT INTO chapters VALUES (?, ?)",
+            (file_name, chapter_doc.content_hash),
+        )
+        self.connection.executemany(
+            "INSERT INTO postings VALUES (?, ?, ?)",
+            (
+                (
+                    token,
+                    file_name,
+                    array(self.POSITIONS_TYPECODE, positions).tobytes(),
+                )
+                for token, positions in self.get_token_positions(
+                    chapter_doc.lines
+                ).items()
+            ),
+        )
+
+    def __remove_chapter__(self, file_name: str):
+        for table in ["chapters", "postings"]:
+            self.connection.execute(
+                f"DELETE FROM {table} WHERE file_name = ?", (file_name,)
+            )
+
+    # Queries
+    def __get_postings__(self, token: str) -> dict[str, array]:
+        if token not in self.postings_cache:
+            postings = {}
+            for file_name, blob in self.connection.execute(
+                "SELECT file_name, positions FROM postings WHERE token = ?",
+                (token,),
+            ):
+                positions = array(self.POSITIONS_TYPECODE)
+                positions.frombytes(blob)
+                postings[file_name] = positions
+            self.postings_cache[token] = postings
+        return self.postings_cache[token]
+
+    def __get_position_set__(self, token: str, file_name: str) -> set[int]:
+        key = (token, file_name)
+        if key not in self.position_set_cache:
+            self.position_set_cache[key] = set(
+                self.__get_postings__(token)[file_name]
+            )
+        return self.position_set_cache[key]
+
+    def find(self, query: str) -> Generator[dict, None, None]:
+        """Yield lines containing the words of query, in order.
+
+        Matches whole tokens, case-sensitively; punctuation between the
+        words is ignored. Only the chapters of the last update are
+        searched. Results have the same shape as ChapterFile.find.
+        """
+        tokens = self.TOKEN_PATTERN.findall(query)
+        if not tokens:
+            return
+        token_postings = [self.__get_postings__(token) for token in tokens]
+
+        # Anchor on the token present in the fewest chapters.
+        i_anchor = min(
+            range(len(tokens)), key=lambda i: len(token_postings[i])
+        )
+        for file_name in sorted(token_postings[i_anchor].keys()):
+            if file_name not in self.chapter_docs or not all(
+                file_name in postings for postings in token_postings
+            ):
+                continue
+
+            others = [
+                (i - i_anchor, self.__get_position_set__(token, file_name))
+                for i, token in enumerate(tokens)
+                if i != i_anchor
+            ]
+            chapter_doc = self.chapter_docs[file_name]
+            prev_i_line = None
+            for position in token_postings[i_anchor][file_name]:
+                if position % self.LINE_STRIDE < i_anchor:
+                    continue
+                if not all(
+                    position + offset in position_set
+                    for offset, position_set in others
+                ):
+                    continue
+                i_line = position // self.LINE_STRIDE
+                if i_line == prev_i_line:
+                    continue
+                prev_i_line = i_line
+                yield dict(
+                    number_and_title=chapter_doc.number_and_title,
+                    i_line=i_line,
+                    line=chapter_doc.lines[i_line],
+                )
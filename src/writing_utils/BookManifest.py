@@ -0,0 +1,137 @@
+import os
+import time
+
+from utils_base import JSONFile, Log
+
+from writing_utils.ChapterCounter import ChapterCounts
+from writing_utils.ChapterFile import ChapterFile
+from writing_utils.ChapterText import ChapterText
+
+log = Log("BookManifest")
+
+
+class BookManifest:
+    """On-disk cache of chapter metadata, kept in <book>.compiled/.
+
+    Entries are keyed by file name and validated against mtime and size.
+    When those differ, the file is re-read and its content hash decides
+    whether the cached metadata still holds.
+    """
+
+    VERSION = 3
+    # Files modified this close to when their entry was recorded could be
+    # rewritten within the same filesystem timestamp tick, so their stat
+    # alone is not trusted.
+    RACY_WINDOW_NS = 2_000_000_000
+
+    def __init__(self, dir_book: str):
+        self.dir_book = dir_book
+        self.path = os.path.join(dir_book + ".compiled", "manifest.json")
+        self.entries = self.__load__()
+        self.is_dirty = False
+
+    def __load__(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            data = JSONFile(self.path).read()
+        except ValueError:
+            log.warning(f"Ignoring unreadable manifest: {self.path}")
+            return {}
+        if data.get("version") != self.VERSION:
+            return {}
+        return data.get("entries", {})
+
+    def save(self):
+        if not self.is_dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        JSONFile(self.path).write(
+            dict(version=self.VERSION, entries=self.entries)
+        )
+        self.is_dirty = False
+        log.debug(f"Wrote {self.path} ({len(self.entries)} entries)")
+
+    def retain(self, file_names: list[str]):
+        file_name_set = set(file_names)
+        for file_name in list(self.entries.keys()):
+            if file_name not in file_name_set:
+                del self.entries[file_name]
+                self.is_dirty = True
+
+    def is_trusted(self, entry: dict | None, stat: os.stat_result) -> bool:
+        return (
+            entry is not None
+            and entry["mtime_ns"] == stat.st_mtime_ns
+            and entry["size"] == stat.st_size
+            and entry["mtime_ns"] < entry["recorded_ns"] - self.RACY_WINDOW_NS
+        )
+
+    def get_chapter_doc(self, chapter_path: str) -> ChapterFile:
+        file_name = os.path.basename(chapter_path)
+        chapter_doc = ChapterFile(chapter_path)
+        stat = os.stat(chapter_path)
+        entry = self.entries.get(file_name)
+
+        if not self.is_trusted(entry, stat):
+            entry = self.__build_entry__(chapter_doc, stat, entry)
+            self.entries[file_name] = entry
+            self.is_dirty = True
+
+        self.__prime__(chapter_doc, entry)
+        return chapter_doc
+
+    def __build_entry__(
+        self, chapter_doc: ChapterFile, stat: os.stat_result, entry
+    ) -> dict:
+        with open(chapter_doc.path, "rb") as fin:
+            raw = fin.read()
+        content_hash = ChapterFile.get_content_hash(raw)
+
+        # Same text decoding as File.read (utf-8, universal newlines)
+        content = raw.decode("utf-8")
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+        chapter_doc.__dict__["chapter_text"] = ChapterText(content)
+        # So the metadata below is counted from, and cached under, this
+        # same read of the file.
+        chapter_doc.__dict__["content_hash"] = content_hash
+
+        if entry is not None and entry["content_hash"] == content_hash:
+            metadata = entry["metadata"]
+        else:
+            metadata = self.__build_metadata__(chapter_doc)
+
+        return dict(
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            recorded_ns=time.time_ns(),
+            content_hash=content_hash,
+            metadata=metadata,
+        )
+
+    @staticmethod
+    def __build_metadata__(chapter_doc: ChapterFile) -> dict:
+        try:
+            number_and_title = chapter_doc.number_and_title
+        except (AssertionError, IndexError):
+            number_and_title = None
+        return dict(
+            number_and_title=number_and_title,
+            normalized_digest=chapter_doc.normalized_digest,
+            **chapter_doc.counts._asdict(),
+        )
+
+    @staticmethod
+    def __prime__(chapter_doc: ChapterFile, entry: dict):
+        metadata = entry["metadata"]
+        chapter_doc.__dict__["content_hash"] = entry["content_hash"]
+        chapter_doc.__dict__["normalized_digest"] = metadata[
+            "normalized_digest"
+        ]
+        chapter_doc.__dict__["counts"] = ChapterCounts(
+            *[metadata[field] for field in ChapterCounts._fields]
+        )
+        if metadata["number_and_title"] is not None:
+            chapter_doc.__dict__["number_and_title"] = metadata[
+                "number_and_title"
+            ]
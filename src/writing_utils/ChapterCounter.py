@@ -0,0 +1,95 @@
+import re
+from typing import NamedTuple
+
+
+class ChapterCounts(NamedTuple):
+    n_words: int
+    n_chars: int
+    n_paragraphs: int
+    n_sentences: int
+
+
+class ChapterCounter:
+    """Counts words, characters, paragraphs and sentences in one pass.
+
+    Words are runs of non-whitespace, as in str.split(), and include
+    the heading. Paragraphs are runs of non-blank lines, not counting
+    headings and section breaks. A sentence ends at a word ending in
+    ".", "!", "?" or "…" (before any closing quotes, brackets or
+    emphasis), or at the end of its paragraph. Tokens are matched and
+    counted, never collected.
+
+    Counts are cached by content hash, for the CACHE_SIZE most
+    recently used hashes.
+    """
+
+    TOKEN_PATTERN = re.compile(r"\n[^\S\n]*\n|\S+")
+    NON_PROSE_PATTERN = re.compile(r"#{1,6}|-{3,}|\*{3,}")
+    ORDINAL_PATTERN = re.compile(r"\d+\.")
+    SENTENCE_END_CHARS = frozenset(".!?…")
+    CLOSING_CHARS = frozenset("\"')]*_”’")
+
+    CACHE_SIZE = 4096
+    cache = {}
+
+    @classmethod
+    def get(cls, content_hash: str, text: str) -> ChapterCounts:
+        # Dicts keep insertion order: re-inserting on every use keeps
+        # the least recently used hash first.
+        counts = cls.cache.pop(content_hash, None)
+        if counts is None:
+            counts = cls.count(text)
+        cls.cache[content_hash] = counts
+        if len(cls.cache) > cls.CACHE_SIZE:
+            del cls.cache[next(iter(cls.cache))]
+        return counts
+
+    @classmethod
+    def count(cls, text: str) -> ChapterCounts:
+        n_words = 0
+        n_paragraphs = 0
+        n_sentences = 0
+        in_paragraph = False
+        is_prose = False
+        in_sentence = False
+
+        for m in cls.TOKEN_PATTERN.finditer(text):
+            start, end = m.span()
+            if text[start] == "\n":
+                if in_sentence:
+                    n_sentences += 1
+                in_paragraph = in_sentence = False
+                continue
+
+            n_words += 1
+            if not in_paragraph:
+                in_paragraph = True
+                is_prose = not cls.NON_PROSE_PATTERN.fullmatch(
+                    text, start, end
+                )
+                if is_prose:
+                    n_paragraphs += 1
+            if not is_prose:
+                continue
+
+            in_sentence = True
+            i_last = end - 1
+            while i_last > start and text[i_last] in cls.CLOSING_CHARS:
+                i_last -= 1
+            if text[i_last] not in cls.SENTENCE_END_CHARS:
+                continue
+            # "1." numbers a list item; it does not end a sentence.
+            if cls.ORDINAL_PATTERN.fullmatch(text, start, i_last + 1):
+                continue
+            n_sentences += 1
+            in_sentence = False
+
+        if in_sentence:
+            n_sentences += 1
+
+        return ChapterCounts(
+            n_words=n_words,
+            n_chars=len(text),
+            n_paragraphs=n_paragraphs,
+            n_sentences=n_sentences,
+        )
@@ -1,8 +1,14 @@
+import difflib
+import hashlib
 import os
 import re
 from functools import cached_property
 
-from utils import File, Log
+from utils_base import File, Log
+
+from writing_utils.ChapterCounter import ChapterCounter, ChapterCounts
+from writing_utils.ChapterText import ChapterText
+from writing_utils.Instrumentation import instrumented
 
 log = Log("ChapterFile")
 
@@ -10,8 +16,13 @@ log = Log("ChapterFile")
 class ChapterFile(File):
 
     @cached_property
-    def lines(self):
-        return self.read_lines()
+    def chapter_text(self) -> ChapterText:
+        # The text is held once; lines and content are views of it.
+        return ChapterText(self.read())
+
+    @property
+    def lines(self) -> ChapterText:
+        return self.chapter_text
 
     def __str__(self):
         return (
@@ -21,8 +32,11 @@ class ChapterFile(File):
 
     @cached_property
     def first_line(self):
-        first_line = self.lines[0]
-        return first_line
+        if "chapter_text" in self.__dict__:
+            return self.chapter_text[0]
+        # Only the first line is needed for the number and title.
+        with open(self.path, "r", encoding="utf-8") as fin:
+            return fin.readline().rstrip("\n")
 
     @cached_property
     def number_and_title(self) -> str | None:
@@ -51,7 +65,14 @@ class ChapterFile(File):
         lines[0] = f"# {new_number}. {title}"
         self.write_lines(lines)
 
-        for k in ["lines", "first_line", "number_and_title"]:
+        for k in [
+            "chapter_text",
+            "first_line",
+            "number_and_title",
+            "content_hash",
+            "normalized_digest",
+            "counts",
+        ]:
             if k in self.__dict__:
                 del self.__dict__[k]
 
@@ -70,17 +91,49 @@ class ChapterFile(File):
         title_cleaned = title.replace(" ", "-").replace("/", "-")
         return title_cleaned.lower()
 
-    @cached_property
+    @property
     def content(self) -> str:
-        return "\n".join(self.lines)
+        return self.chapter_text.text
+
+    @staticmethod
+    def get_content_hash(raw: bytes) -> str:
+        return hashlib.sha256(raw).hexdigest()
 
     @cached_property
-    def n_chars(self) -> int:
-        return len(self.content)
+    def content_hash(self) -> str:
+        with open(self.path, "rb") as fin:
+            return self.get_content_hash(fin.read())
+
+    @staticmethod
+    def get_normalized_digest(lines: list[str]) -> str:
+        # Lines never contain "\n", so two digests match exactly when the
+        # files have the same lines, ignoring leading/trailing whitespace.
+        normalized = "\n".join(line.strip() for line in lines)
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    @cached_property
+    def normalized_digest(self) -> str:
+        return self.get_normalized_digest(self.lines)
 
     @cached_property
+    def counts(self) -> ChapterCounts:
+        return ChapterCounter.get(self.content_hash, self.content)
+
+    @property
+    def n_chars(self) -> int:
+        return self.counts.n_chars
+
+    @property
     def n_words(self) -> int:
-        return len(self.content.split())
+        return self.counts.n_words
+
+    @property
+    def n_paragraphs(self) -> int:
+        return self.counts.n_paragraphs
+
+    @property
+    def n_sentences(self) -> int:
+        return self.counts.n_sentences
 
     @staticmethod
     def __clean_line__(line: str) -> str:
@@ -104,6 +157,7 @@ class ChapterFile(File):
 
         return content
 
+    @instrumented()
     def clean_and_write(self):
         original_content = self.read()
         content = self.get_cleaned(original_content)
@@ -134,26 +188,65 @@ class ChapterFile(File):
         log.info(f'Replaced "{find_text}" with "{replace_text}" in {self}')
         return True
 
+    @staticmethod
+    def get_replace_pattern(replace_map: dict[str, str]) -> re.Pattern:
+        for find_text, replace_text in replace_map.items():
+            assert find_text, "Find text must not be empty"
+            assert replace_text, "Replace text must not be empty"
+        if not replace_map:
+            # "" would match everywhere; this matches nowhere.
+            return re.compile("(?!)")
+        # One alternation for all find texts. Longer texts come first, so
+        # where matches overlap the leftmost wins, then the longest.
+        find_texts = sorted(replace_map.keys(), key=lambda k: (-len(k), k))
+        return re.compile("|".join(re.escape(k) for k in find_texts))
+
+    def replace_many(
+        self,
+        replace_pattern: re.Pattern,
+        replace_map: dict[str, str],
+        dry_run: bool = False,
+    ) -> int:
+        original_content = self.read()
+        content, n_hits = replace_pattern.subn(
+            lambda match: replace_map[match.group(0)], original_content
+        )
+        if dry_run or content == original_content:
+            return n_hits
+        self.write(content)
+        log.info(f"Replaced {n_hits} matches in {self}")
+        return n_hits
+
+    def diff(self, other: "ChapterFile") -> list[dict]:
+        """Line ranges that differ from other, ignoring outer whitespace.
+
+        Ranges are 0-based and end-exclusive, as from
+        difflib.SequenceMatcher; op is "replace", "delete" or "insert".
+        """
+        if self.normalized_digest == other.normalized_digest:
+            return []
+        matcher = difflib.SequenceMatcher(
+            None,
+            [line.strip() for line in self.read_lines()],
+            [line.strip() for line in other.read_lines()],
+            autojunk=False,
+        )
+        return [
+            dict(
+                op=op,
+                start=i1,
+                end=i2,
+                other_start=j1,
+                other_end=j2,
+            )
+            for op, i1, i2, j1, j2 in matcher.get_opcodes()
+            if op != "equal"
+        ]
+
     def __eq__(self, other):
         if not isinstance(other, ChapterFile):
             return False
-
-        lines_self = self.read_lines()
-        lines_other = other.read_lines()
-        if len(lines_self) != len(lines_other):
-            log.debug(
-                f"line count mismatch: {len(lines_self)} vs {len(lines_other)}"
-            )
-            return False
-
-        for i, (line_self, line_other) in enumerate(
-            zip(lines_self, lines_other), start=1
-        ):
-            if line_self.strip() != line_other.strip():
-                log.debug(f'{i}: "{line_self}" != "{line_other}"')
-                return False
-
-        return True
+        return self.normalized_digest == other.normalized_digest
 
     def open(self):
         os.system(f'open -a "Visual Studio Code" "{self.path}"')
@@ -0,0 +1,237 @@
+import re
+from collections import deque
+from functools import cached_property
+from typing import NamedTuple
+
+from utils_base import File
+
+
+class Span(NamedTuple):
+    # None for plain text, else one of ChapterIR.SPAN_DELIMITERS. text is
+    # the span's source without its delimiters, and children the parse
+    # of that text; notes have no children.
+    style: str | None
+    text: str
+    children: tuple["Span", ...] = ()
+
+
+class Block(NamedTuple):
+    kind: str
+    source: str
+    text: str = ""
+    level: int = 0
+    spans: tuple[Span, ...] = ()
+
+
+class ChapterIR:
+    """A chapter parsed once into blocks and inline spans.
+
+    There is one block per body line, so the source can be rebuilt
+    exactly; blank lines are kept as BLANK blocks. Paragraphs and
+    headings are parsed into a tree of spans: quotes, Obsidian notes,
+    \\say{} and (nested) emphasis. The exporters render from this
+    instead of re-parsing the markdown.
+
+    The inline markup pairs up exactly as in the LaTeX rule engine,
+    whose rules share SPAN_PATTERNS, except that a span never runs on
+    past its line. Notes are taken out before the rest is parsed, as the
+    engine strips them, and are then put back where they were.
+    """
+
+    BLANK = "blank"
+    SECTION_BREAK = "section_break"
+    HEADING = "heading"
+    PARAGRAPH = "paragraph"
+
+    NOTE = "note"
+
+    SECTION_BREAK_PATTERN = re.compile(r"^-{3,}$")
+    HEADING_PATTERN = re.compile(r"^(#{1,3})\s+(.+)$")
+    NOTE_PATTERN = re.compile(r"\[\[(?P<note>.+?)\]\]")
+
+    # Bold and italics with no stars inside, for nesting in the italic
+    # and bold patterns below.
+    BOLD_PATTERN = r"\*\*[^*\n]+?\*\*"
+    ITALIC_PATTERN = r"\*[^*\n]+?\*"
+    # By style, each with a group of that name for the span's text, in
+    # priority order: where several match at the same position, the
+    # earlier one wins.
+    SPAN_PATTERNS = {
+        "quote": r'"(?P<quote>[^"]*?)"',
+        "bold_italic": r"\*\*\*(?P<bold_italic>[^*\n]+?)\*\*\*",
+        # Italics around bold, which may come first ("***a** b*"), and
+        # bold around italics, which may come last ("**a *b***").
+        "italic": r"\*(?:(?=\*\*)|(?!\*))"
+        + rf"(?P<italic>(?:{BOLD_PATTERN}|[^*\n])+?)"
+        + rf"(?!{BOLD_PATTERN})\*",
+        "bold": rf"\*\*(?P<bold>(?:{ITALIC_PATTERN}|[^*\n])+?)\*\*",
+        # Any other stars pair up as the shortest bold, then italic,
+        # spans; a "**...**" inside such italics is still bold.
+        "loose_bold": r"\*\*(?P<loose_bold>[^\n]+?)\*\*",
+        "loose_italic": r"\*(?P<loose_italic>"
+        + r"(?:\*\*[^\n]+?\*\*|(?!\*\*[^\n]+?\*\*)[^\n])+?)"
+        + r"(?!\*\*[^\n]+?\*\*)\*",
+        "say": r"\\say\{(?P<say>.+?)\}",
+    }
+    SPAN_REGEX = re.compile("|".join(SPAN_PATTERNS.values()))
+    SPAN_DELIMITERS = {
+        "quote": ('"', '"'),
+        "bold_italic": ("***", "***"),
+        "italic": ("*", "*"),
+        "bold": ("**", "**"),
+        "loose_bold": ("**", "**"),
+        "loose_italic": ("*", "*"),
+        "say": ("\\say{", "}"),
+        NOTE: ("[[", "]]"),
+    }
+
+    def __init__(self, title_line: str, blocks: list[Block]):
+        self.title_line = title_line
+        self.blocks = blocks
+
+    @classmethod
+    def from_lines(cls, lines: list[str]) -> "ChapterIR":
+        return cls(lines[0], cls.parse_blocks(lines[1:]))
+
+    @classmethod
+    def from_path(cls, chapter_path: str) -> "ChapterIR":
+        return cls.from_lines(File(chapter_path).read_lines())
+
+    @cached_property
+    def body(self) -> str:
+        return "\n".join(block.source for block in self.blocks).strip()
+
+    @cached_property
+    def body_blocks(self) -> list[Block]:
+        """The blocks of body: without the blank blocks at either end,
+        and with the first and last sources stripped, as body is."""
+        i_blocks = [
+            i_block
+            for i_block, block in enumerate(self.blocks)
+            if block.kind != self.BLANK
+        ]
+        if not i_blocks:
+            return []
+        blocks = self.blocks[i_blocks[0] : i_blocks[-1] + 1]
+        blocks[0] = blocks[0]._replace(source=blocks[0].source.lstrip())
+        blocks[-1] = blocks[-1]._replace(source=blocks[-1].source.rstrip())
+        return blocks
+
+    @classmethod
+    def parse_blocks(cls, lines: list[str]) -> list[Block]:
+        return [cls.parse_block(line) for line in lines]
+
+    @classmethod
+    def parse_block(cls, line: str) -> Block:
+        text = line.strip()
+        if not text:
+            return Block(cls.BLANK, line)
+
+        if cls.SECTION_BREAK_PATTERN.match(text):
+            return Block(cls.SECTION_BREAK, line, text)
+
+        header_match = cls.HEADING_PATTERN.match(text)
+        if header_match:
+            heading_text = header_match.group(2)
+            return Block(
+                cls.HEADING,
+                line,
+                heading_text,
+                len(header_match.group(1)),
+                cls.parse_spans(heading_text),
+            )
+
+        return Block(cls.PARAGRAPH, line, text, spans=cls.parse_spans(text))
+
+    @classmethod
+    def parse_spans(cls, text: str) -> tuple[Span, ...]:
+        # Notes, by their offset in the text without them.
+        notes = deque()
+        pieces = []
+        pos = 0
+        n_stripped = 0
+        for note_match in cls.NOTE_PATTERN.finditer(text):
+            pieces.append(text[pos : note_match.start()])
+            n_stripped += note_match.start() - pos
+            notes.append((n_stripped, Span(cls.NOTE, note_match.group(1))))
+            pos = note_match.end()
+        pieces.append(text[pos:])
+
+        stripped_text = "".join(pieces)
+        return tuple(
+            cls.__parse_span_range__(
+                stripped_text, 0, len(stripped_text), len(stripped_text), notes
+            )
+        )
+
+    @classmethod
+    def __parse_span_range__(
+        cls, text: str, start: int, end: int, last_offset: int, notes: deque
+    ) -> list[Span]:
+        # Puts back the notes at offsets up to last_offset; a note within
+        # a span's delimiters goes at the start or end of its text.
+        spans = []
+        pos = start
+        while True:
+            m = cls.SPAN_REGEX.search(text, pos, end)
+            if m is None:
+                spans.extend(
+                    cls.__gen_text_spans__(text, pos, end, last_offset, notes)
+                )
+                return spans
+
+            spans.extend(
+                cls.__gen_text_spans__(text, pos, m.start(), m.start(), notes)
+            )
+            style = m.lastgroup
+            children = cls.__parse_span_range__(
+                text, m.start(style), m.end(style), m.end() - 1, notes
+            )
+            spans.append(Span(style, m.group(style), tuple(children)))
+            pos = m.end()
+
+    @classmethod
+    def __gen_text_spans__(
+        cls, text: str, start: int, end: int, last_offset: int, notes: deque
+    ):
+        pos = start
+        while notes and notes[0][0] <= last_offset:
+            offset, note = notes.popleft()
+            offset = min(max(offset, pos), end)
+            if offset > pos:
+                yield Span(None, text[pos:offset])
+                pos = offset
+            yield note
+        if end > pos:
+            yield Span(None, text[pos:end])
+
+    @classmethod
+    def without_notes(cls, spans: tuple[Span, ...]) -> tuple[Span, ...]:
+        """spans with the notes taken out, and the text around each note
+        joined up."""
+        result = []
+        for span in spans:
+            if span.style == cls.NOTE:
+                continue
+            if span.style is not None:
+                span = span._replace(children=cls.without_notes(span.children))
+            elif result and result[-1].style is None:
+                span = Span(None, result.pop().text + span.text)
+            result.append(span)
+        return tuple(result)
+
+    @classmethod
+    def to_markdown(cls, spans: tuple[Span, ...]) -> str:
+        pieces = []
+        for span in spans:
+            if span.style is None:
+                pieces.append(span.text)
+                continue
+            opening, closing = cls.SPAN_DELIMITERS[span.style]
+            pieces.append(opening)
+            if span.children:
+                pieces.append(cls.to_markdown(span.children))
+            else:
+                pieces.append(span.text)
+            pieces.append(closing)
+        return "".join(pieces)
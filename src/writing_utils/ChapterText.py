@@ -0,0 +1,52 @@
+from array import array
+from collections.abc import Sequence
+
+
+class ChapterText(Sequence):
+    """A chapter's text, stored once, viewed as a sequence of lines.
+
+    Line i is text[line_starts[i]:line_starts[i + 1] - 1]; the offsets
+    are kept in an array of machine integers, so no per-line strings
+    exist until a line is asked for. Behaves like text.split("\\n").
+    """
+
+    __slots__ = ("text", "line_starts")
+
+    def __init__(self, text: str):
+        self.text = text
+        line_starts = array("q", [0])
+        i = text.find("\n")
+        while i != -1:
+            line_starts.append(i + 1)
+            i = text.find("\n", i + 1)
+        self.line_starts = line_starts
+
+    def __len__(self) -> int:
+        return len(self.line_starts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        n_lines = len(self.line_starts)
+        if i < 0:
+            i += n_lines
+        if not 0 <= i < n_lines:
+            raise IndexError("line index out of range")
+        end = (
+            self.line_starts[i + 1] - 1 if i + 1 < n_lines else len(self.text)
+        )
+        return self.text[self.line_starts[i] : end]
+
+    def __iter__(self):
+        for i in range(len(self.line_starts)):
+            yield self[i]
+
+    def __eq__(self, other):
+        if isinstance(other, ChapterText):
+            return self.text == other.text
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"ChapterText({len(self)} lines, {len(self.text)} chars)"
@@ -0,0 +1,138 @@
+import xml.etree.ElementTree as ET
+import zipfile
+from typing import Generator
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+class DocXStreamReader:
+    """Reads paragraphs straight out of a .docx, without python-docx.
+
+    word/document.xml is parsed incrementally and each body paragraph
+    is yielded, then discarded, as soon as it has been read. The
+    (style name, text) pairs match what BookDirReverseDocXMixin gets
+    from para.style.name and extract_formatted_text.
+    """
+
+    DOCUMENT_PATH = "word/document.xml"
+    STYLES_PATH = "word/styles.xml"
+    # python-docx reports these built-in styles by their UI names.
+    STYLE_UI_NAMES = {
+        "caption": "Caption",
+        "footer": "Footer",
+        "header": "Header",
+    } | {f"heading {i}": f"Heading {i}" for i in range(1, 10)}
+    TRUE_VALUES = ("1", "true", "on")
+
+    def __init__(self, docx_path: str):
+        self.docx_path = docx_path
+
+    def gen_paragraphs(self) -> Generator[tuple[str, str], None, None]:
+        with zipfile.ZipFile(self.docx_path) as zip_file:
+            style_names, default_style_name = self.__load_style_names__(
+                zip_file
+            )
+            with zip_file.open(self.DOCUMENT_PATH) as fin:
+                depth = 0
+                body = None
+                for event, elem in ET.iterparse(fin, events=("start", "end")):
+                    if event == "start":
+                        depth += 1
+                        if depth == 2 and elem.tag == W + "body":
+                            body = elem
+                        continue
+
+                    depth -= 1
+                    if depth != 2 or body is None:
+                        continue
+                    if elem.tag == W + "p":
+                        style_id = self.__get_style_id__(elem)
+                        yield (
+                            style_names.get(style_id, default_style_name),
+                            self.__get_formatted_text__(elem),
+                        )
+                    # Drop finished body children to keep memory flat.
+                    body.clear()
+
+    @classmethod
+    def __load_style_names__(
+        cls, zip_file: zipfile.ZipFile
+    ) -> tuple[dict[str, str], str]:
+        style_names = {}
+        default_style_name = ""
+        if cls.STYLES_PATH not in zip_file.namelist():
+            return style_names, default_style_name
+
+        with zip_file.open(cls.STYLES_PATH) as fin:
+            root = ET.parse(fin).getroot()
+        for style in root.iter(W + "style"):
+            if style.get(W + "type") != "paragraph":
+                continue
+            name_elem = style.find(W + "name")
+            name = "" if name_elem is None else name_elem.get(W + "val", "")
+            name = cls.STYLE_UI_NAMES.get(name, name)
+            style_names[style.get(W + "styleId")] = name
+            # As in python-docx, the last default style in the file wins.
+            if style.get(W + "default") in cls.TRUE_VALUES:
+                default_style_name = name
+        return style_names, default_style_name
+
+    @staticmethod
+    def __get_style_id__(p) -> str | None:
+        p_style = p.find(f"{W}pPr/{W}pStyle")
+        return None if p_style is None else p_style.get(W + "val")
+
+    @classmethod
+    def __is_on__(cls, r_pr, tag: str) -> bool:
+        if r_pr is None:
+            return False
+        elem = r_pr.find(W + tag)
+        if elem is None:
+            return False
+        val = elem.get(W + "val")
+        return val is None or val in cls.TRUE_VALUES
+
+    @staticmethod
+    def __get_item_text__(elem) -> str:
+        tag = elem.tag
+        if tag == W + "t":
+            return elem.text or ""
+        if tag in (W + "tab", W + "ptab"):
+            return "\t"
+        if tag == W + "br":
+            # Page and column breaks carry no text.
+            is_line_break = elem.get(W + "type") in (None, "textWrapping")
+            return "\n" if is_line_break else ""
+        if tag == W + "cr":
+            return "\n"
+        if tag == W + "noBreakHyphen":
+            return "-"
+        return ""
+
+    @classmethod
+    def __get_formatted_text__(cls, p) -> str:
+        # Consecutive plain runs are merged before joining; formatted runs
+        # are wrapped one by one, exactly as extract_formatted_text does.
+        pieces = []
+        plain_text = ""
+        for r in p.findall(W + "r"):
+            text = "".join(cls.__get_item_text__(elem) for elem in r)
+            r_pr = r.find(W + "rPr")
+            is_bold = cls.__is_on__(r_pr, "b")
+            is_italic = cls.__is_on__(r_pr, "i")
+            if not is_bold and not is_italic:
+                plain_text += text
+                continue
+
+            if plain_text:
+                pieces.append(plain_text)
+                plain_text = ""
+            if is_bold:
+                text = f"**{text}**"
+            if is_italic:
+                text = f"*{text}*"
+            pieces.append(text)
+
+        if plain_text:
+            pieces.append(plain_text)
+        return "".join(pieces).strip()
@@ -0,0 +1,136 @@
+import io
+import re
+import zipfile
+from typing import Iterable, NamedTuple
+from xml.sax.saxutils import escape
+
+
+class DocXRun(NamedTuple):
+    text: str
+    bold: bool = False
+    italic: bool = False
+    font_size: int | None = None  # in points
+
+
+class DocXStreamWriter:
+    """Writes a .docx straight into a zip file, without python-docx.
+
+    Every part of the template package is copied as is, except that the
+    body of word/document.xml is written paragraph by paragraph, and
+    never held in memory. The paragraphs are serialized exactly as
+    python-docx would write them, so the template's styles, page layout
+    and section properties apply unchanged.
+
+        with DocXStreamWriter(template_path, docx_path) as writer:
+            writer.write_heading("1. First", level=1)
+            writer.write_paragraph([DocXRun("Hello", bold=True)])
+    """
+
+    DOCUMENT_PATH = "word/document.xml"
+    BODY_START = "<w:body>"
+    SECTION_PROPERTIES_START = "<w:sectPr"
+    # As in python-docx's run.text, tabs and line breaks are elements,
+    # not text.
+    RUN_TEXT_PATTERN = re.compile(r"[^\t\n\r]+|[\t\n\r]")
+    RUN_SPECIAL_CHARS = {"\t": "<w:tab/>", "\n": "<w:br/>", "\r": "<w:br/>"}
+
+    def __init__(self, template_path: str, docx_path: str):
+        self.template_path = template_path
+        self.docx_path = docx_path
+        self.template_zip = None
+        self.output_zip = None
+        self.fout = None
+        self.document_tail = None
+        self.remaining_infos = []
+
+    def __enter__(self) -> "DocXStreamWriter":
+        self.template_zip = zipfile.ZipFile(self.template_path)
+        self.output_zip = zipfile.ZipFile(
+            self.docx_path, "w", zipfile.ZIP_DEFLATED
+        )
+        infos = self.template_zip.infolist()
+        i_document = [info.filename for info in infos].index(
+            self.DOCUMENT_PATH
+        )
+        self.__copy_template_parts__(infos[:i_document])
+
+        document_xml = self.template_zip.read(self.DOCUMENT_PATH).decode(
+            "utf-8"
+        )
+        # The template's own paragraphs, if any, are dropped; its final
+        # section properties end the new body.
+        i_body = document_xml.index(self.BODY_START) + len(self.BODY_START)
+        i_tail = document_xml.rindex(self.SECTION_PROPERTIES_START)
+        self.document_tail = document_xml[i_tail:]
+
+        document_info = infos[i_document]
+        document_info.compress_type = zipfile.ZIP_DEFLATED
+        self.fout = io.TextIOWrapper(
+            self.output_zip.open(document_info, "w"), encoding="utf-8"
+        )
+        self.fout.write(document_xml[:i_body])
+        self.remaining_infos = infos[i_document + 1 :]
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.fout.write(self.document_tail)
+            self.fout.close()
+            if exc_type is None:
+                self.__copy_template_parts__(self.remaining_infos)
+        finally:
+            self.output_zip.close()
+            self.template_zip.close()
+
+    def __copy_template_parts__(self, infos: list[zipfile.ZipInfo]):
+        for info in infos:
+            self.output_zip.writestr(info, self.template_zip.read(info))
+
+    def write_paragraph(
+        self,
+        runs: Iterable[DocXRun] = (),
+        style_id: str | None = None,
+        alignment: str | None = None,
+    ):
+        p_pr = ""
+        if style_id is not None:
+            p_pr += f'<w:pStyle w:val="{style_id}"/>'
+        if alignment is not None:
+            p_pr += f'<w:jc w:val="{alignment}"/>'
+        content = "".join(self.__get_run_xml__(run) for run in runs)
+        if p_pr:
+            content = f"<w:pPr>{p_pr}</w:pPr>" + content
+        self.fout.write(f"<w:p>{content}</w:p>" if content else "<w:p/>")
+
+    def write_heading(self, text: str, level: int):
+        # The style ids of python-docx's "Heading 1", "Heading 2", ...
+        self.write_paragraph([DocXRun(text)], style_id=f"Heading{level}")
+
+    def write_page_break(self):
+        self.fout.write('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+
+    @classmethod
+    def __get_run_xml__(cls, run: DocXRun) -> str:
+        r_pr = ""
+        if run.bold:
+            r_pr += "<w:b/>"
+        if run.italic:
+            r_pr += "<w:i/>"
+        if run.font_size is not None:
+            r_pr += f'<w:sz w:val="{run.font_size * 2}"/>'
+        content = "".join(
+            cls.__get_run_item_xml__(item)
+            for item in cls.RUN_TEXT_PATTERN.findall(run.text)
+        )
+        if r_pr:
+            content = f"<w:rPr>{r_pr}</w:rPr>" + content
+        return f"<w:r>{content}</w:r>" if content else "<w:r/>"
+
+    @classmethod
+    def __get_run_item_xml__(cls, item: str) -> str:
+        if item in cls.RUN_SPECIAL_CHARS:
+            return cls.RUN_SPECIAL_CHARS[item]
+        if len(item.strip()) < len(item):
+            return f'<w:t xml:space="preserve">{escape(item)}</w:t>'
+        return f"<w:t>{escape(item)}</w:t>"
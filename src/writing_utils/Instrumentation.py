@@ -0,0 +1,265 @@
+import atexit
+import functools
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from utils_base import JSONFile, Log
+
+log = Log("Instrumentation")
+
+
+class StageRecord(NamedTuple):
+    name: str
+    label: str | None  # chapter file name, for per-chapter stages
+    depth: int
+    wall_s: float
+    cpu_s: float
+    peak_bytes: int
+    read_bytes: int | None
+    write_bytes: int | None
+    n_chapters: int | None
+    n_words: int | None
+
+    def to_dict(self) -> dict:
+        d = self._asdict()
+        d["chapters_per_s"] = (
+            self.n_chapters / self.wall_s
+            if self.n_chapters and self.wall_s
+            else None
+        )
+        d["words_per_s"] = (
+            self.n_words / self.wall_s
+            if self.n_words and self.wall_s
+            else None
+        )
+        return d
+
+
+class InstrumentationReport:
+    def __init__(self, records: list[StageRecord]):
+        self.records = records
+
+    def get_totals(self) -> dict[str, dict]:
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(
+                record.name, dict(n_calls=0, wall_s=0.0, cpu_s=0.0)
+            )
+            total["n_calls"] += 1
+            total["wall_s"] += record.wall_s
+            total["cpu_s"] += record.cpu_s
+        return totals
+
+    def to_dict(self) -> dict:
+        return dict(
+            stages=[record.to_dict() for record in self.records],
+            totals=self.get_totals(),
+        )
+
+    def write(self, json_path: str):
+        JSONFile(json_path).write(self.to_dict())
+        log.info(f"Wrote {json_path} ({len(self.records)} stages)")
+
+
+class Instrumentation:
+    """Opt-in timing and memory records for BookDir operations.
+
+    Methods wrapped with @instrumented record wall and CPU time, peak
+    tracemalloc memory above the level at entry, bytes read/written by
+    this process (from /proc/self/io, where available) and chapter and
+    word counts. When off, a wrapped call costs one attribute check.
+
+    Set WRITING_UTILS_INSTRUMENT to a path to enable it at import and
+    dump the report there as JSON at exit. Work done in pool workers
+    (workers > 1) is not recorded.
+
+    Each stage resets tracemalloc's peak, so code that measures its own
+    peak around instrumented calls should use reset_peak() and
+    get_peak_bytes() here, rather than tracemalloc's.
+    """
+
+    ENV_VAR = "WRITING_UTILS_INSTRUMENT"
+    PROC_IO_PATH = "/proc/self/io"
+
+    is_enabled = False
+    is_tracing_owner = False  # whether enable() started tracemalloc
+    records = []
+    stack = []
+    # The highest peak seen before the last per-stage reset.
+    peak_bytes = 0
+
+    @classmethod
+    def enable(cls):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            cls.is_tracing_owner = True
+        cls.is_enabled = True
+
+    @classmethod
+    def disable(cls):
+        cls.is_enabled = False
+        if cls.is_tracing_owner:
+            tracemalloc.stop()
+            cls.is_tracing_owner = False
+
+    @classmethod
+    def reset_peak(cls):
+        tracemalloc.reset_peak()
+        cls.peak_bytes = 0
+
+    @classmethod
+    def get_peak_bytes(cls) -> int:
+        """tracemalloc's peak since the last reset_peak(), including the
+        peaks of stages that have reset it since."""
+        return max(cls.peak_bytes, tracemalloc.get_traced_memory()[1])
+
+    @classmethod
+    def reset(cls):
+        cls.records = []
+        cls.stack = []
+
+    @classmethod
+    def report(cls) -> InstrumentationReport:
+        return InstrumentationReport(list(cls.records))
+
+    @classmethod
+    def get_io_bytes(cls) -> tuple[int | None, int | None]:
+        try:
+            with open(cls.PROC_IO_PATH) as fin:
+                fields = dict(line.split(": ") for line in fin)
+        except OSError:
+            return None, None
+        return int(fields["rchar"]), int(fields["wchar"])
+
+    @classmethod
+    @contextmanager
+    def stage(cls, name: str, label: str | None = None):
+        """Record the enclosed block. Yields a dict into which the block
+        may put n_chapters and n_words."""
+        counts = {}
+        if not cls.is_enabled:
+            yield counts
+            return
+
+        # tracemalloc has one peak, so it is reset per stage and the
+        # enclosing stage's peak so far is kept on the stack.
+        current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        if cls.stack:
+            cls.stack[-1]["peak_bytes"] = max(
+                cls.stack[-1]["peak_bytes"], peak_bytes
+            )
+        cls.peak_bytes = max(cls.peak_bytes, peak_bytes)
+        tracemalloc.reset_peak()
+        frame = dict(peak_bytes=0)
+        cls.stack.append(frame)
+        read_start, write_start = cls.get_io_bytes()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield counts
+        finally:
+            wall_s = time.perf_counter() - wall_start
+            cpu_s = time.process_time() - cpu_start
+            read_end, write_end = cls.get_io_bytes()
+            peak_bytes = max(
+                frame["peak_bytes"], tracemalloc.get_traced_memory()[1]
+            )
+            cls.stack.pop()
+            if cls.stack:
+                cls.stack[-1]["peak_bytes"] = max(
+                    cls.stack[-1]["peak_bytes"], peak_bytes
+                )
+            cls.records.append(
+                StageRecord(
+                    name=name,
+                    label=label,
+                    depth=len(cls.stack),
+                    wall_s=wall_s,
+                    cpu_s=cpu_s,
+                    peak_bytes=max(0, peak_bytes - current_bytes),
+                    read_bytes=(
+                        read_end - read_start
+                        if read_start is not None
+                        else None
+                    ),
+                    write_bytes=(
+                        write_end - write_start
+                        if write_start is not None
+                        else None
+                    ),
+                    n_chapters=counts.get("n_chapters"),
+                    n_words=counts.get("n_words"),
+                )
+            )
+
+    @staticmethod
+    def get_counts(obj) -> dict:
+        # A ChapterFile counts as one chapter; a BookDir is counted from
+        # its manifest, which the operation has just brought up to date.
+        # Attributes are looked up on the class, so nothing is computed.
+        obj_type = type(obj)
+        if hasattr(obj_type, "content_hash"):
+            return dict(n_chapters=1, n_words=obj.n_words)
+        if hasattr(obj_type, "manifest"):
+            if not obj.manifest.entries:
+                list(obj.gen_chapter_docs())
+            entries = obj.manifest.entries.values()
+            return dict(
+                n_chapters=len(entries),
+                n_words=sum(entry["metadata"]["n_words"] for entry in entries),
+            )
+        return {}
+
+
+def instrumented(name: str | None = None):
+    """Record calls to the decorated function as stages of name.
+
+    Chapter and word counts come from the first ChapterFile argument, or
+    else from the BookDir returned or operated on.
+    """
+
+    def decorator(func):
+        stage_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not Instrumentation.is_enabled:
+                return func(*args, **kwargs)
+
+            chapter_doc = next(
+                (arg for arg in args if hasattr(type(arg), "content_hash")),
+                None,
+            )
+            label = (
+                os.path.basename(chapter_doc.path)
+                if chapter_doc is not None
+                else None
+            )
+            with Instrumentation.stage(stage_name, label):
+                result = func(*args, **kwargs)
+
+            # Counted after the stage has been timed.
+            for obj in [chapter_doc, result, args[0] if args else None]:
+                counts = Instrumentation.get_counts(obj)
+                if counts:
+                    Instrumentation.records[-1] = Instrumentation.records[
+                        -1
+                    ]._replace(**counts)
+                    break
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+if os.environ.get(Instrumentation.ENV_VAR):
+    Instrumentation.enable()
+    atexit.register(
+        lambda: Instrumentation.report().write(
+            os.environ[Instrumentation.ENV_VAR]
+        )
+    )
@@ -0,0 +1,208 @@
+import hashlib
+import re
+from functools import cached_property
+from typing import Callable, Iterable, NamedTuple
+
+
+class LaTeXRule(NamedTuple):
+    """A rewrite rule: text matching pattern is replaced by replace(s).
+
+    If pattern has a group named name, s is that group's text, itself
+    converted by all the rules; otherwise s is the matched text as is.
+    Rules with at_line_start only apply where the converted text so far
+    ends a line (their patterns should start with "^"). first_chars, if
+    given, are all the characters a match can start with. replace is
+    not part of the engine's signature, so bump version whenever its
+    output changes.
+    """
+
+    name: str
+    pattern: str
+    replace: Callable[[str], str]
+    at_line_start: bool = False
+    first_chars: str = ""
+    version: int = 1
+
+
+class LaTeXRuleEngine:
+    """Applies a list of rules to a text in one left-to-right scan.
+
+    The text is first stripped of strip_pattern's matches and mapped
+    through a str.translate table; then all the rule patterns are tried
+    as one alternation, earlier rules winning where several match at
+    the same position. Stripping before the scan lets the text around a
+    removed match join up, as if it had never been there. A new rule adds
+    an alternative, not another pass over the text; give it first_chars,
+    as without them every position of the text is tried.
+
+    Text already parsed into spans (see ChapterIR) is rendered with
+    render_spans instead: span_rules names the rules whose matches come
+    as spans of that style, and the other rules are applied within the
+    spans' text.
+    """
+
+    def __init__(
+        self,
+        rules: list[LaTeXRule],
+        translate_table: dict[int, str],
+        strip_pattern: str | None = None,
+        span_rules: Iterable[str] = (),
+    ):
+        self.rules = list(rules)
+        self.span_rules = set(span_rules)
+        self.translate_table = translate_table
+        # Lets ASCII text skip the translation, as it mostly is.
+        self.translates_ascii = any(c < 128 for c in translate_table)
+        self.strip_regex = (
+            re.compile(strip_pattern) if strip_pattern is not None else None
+        )
+
+    def add_rule(self, rule: LaTeXRule, before: str | None = None):
+        """Add rule, by default with the lowest priority, else just
+        before the rule named before."""
+        i_rule = len(self.rules)
+        if before is not None:
+            i_rule = [r.name for r in self.rules].index(before)
+        self.rules.insert(i_rule, rule)
+        for k in [
+            "regex",
+            "inline_regex",
+            "text_regex",
+            "rules_by_group",
+            "rules_by_name",
+            "signature",
+        ]:
+            if k in self.__dict__:
+                del self.__dict__[k]
+
+    @staticmethod
+    def __compile__(rules: list[LaTeXRule]) -> re.Pattern:
+        if not rules:
+            return re.compile("(?!)")
+        pattern = "|".join(
+            f"(?P<_{rule.name}>{rule.pattern})" for rule in rules
+        )
+        if all(rule.first_chars for rule in rules):
+            # Lets the scan skip, without trying every alternative, the
+            # positions where no rule can match.
+            first_chars = "".join(
+                sorted(set("".join(rule.first_chars for rule in rules)))
+            )
+            pattern = f"(?=[{re.escape(first_chars)}])(?:{pattern})"
+        return re.compile(pattern, re.MULTILINE)
+
+    @cached_property
+    def regex(self) -> re.Pattern:
+        return self.__compile__(self.rules)
+
+    @cached_property
+    def inline_regex(self) -> re.Pattern:
+        return self.__compile__(
+            [rule for rule in self.rules if not rule.at_line_start]
+        )
+
+    @cached_property
+    def text_regex(self) -> re.Pattern:
+        return self.__compile__(
+            [
+                rule
+                for rule in self.rules
+                if not rule.at_line_start and rule.name not in self.span_rules
+            ]
+        )
+
+    @cached_property
+    def rules_by_group(self) -> dict[str, LaTeXRule]:
+        return {"_" + rule.name: rule for rule in self.rules}
+
+    @cached_property
+    def rules_by_name(self) -> dict[str, LaTeXRule]:
+        return {rule.name: rule for rule in self.rules}
+
+    @cached_property
+    def signature(self) -> str:
+        key = "\n".join(
+            f"{rule.name}:{rule.pattern}:{rule.at_line_start}"
+            + f":{rule.first_chars}:{rule.version}"
+            for rule in self.rules
+        ) + repr(sorted(self.translate_table.items()))
+        if self.strip_regex is not None:
+            key += "\n" + self.strip_regex.pattern
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+    def prepare(self, text: str) -> str:
+        """text as the scan sees it: stripped and translated."""
+        if self.strip_regex is not None:
+            text = self.strip_regex.sub("", text)
+        return self.__translate__(text)
+
+    def __translate__(self, text: str) -> str:
+        if text.isascii() and not self.translates_ascii:
+            return text
+        return text.translate(self.translate_table)
+
+    def convert(self, text: str) -> str:
+        text = self.prepare(text)
+        return self.__convert_span__(text, 0, len(text), self.regex)
+
+    def render_spans(self, spans) -> str:
+        """Render spans with no strip_pattern matches left in them.
+
+        A span is rendered as its rule's replace of its rendered
+        children, and plain text is translated and converted by the
+        rules other than span_rules. Rules with at_line_start do not
+        apply: the caller handles the line the spans make up.
+        """
+        pieces = []
+        for span in spans:
+            if span.style is None:
+                text = self.__translate__(span.text)
+                pieces.append(
+                    self.__convert_span__(text, 0, len(text), self.text_regex)
+                )
+            else:
+                pieces.append(
+                    self.rules_by_name[span.style].replace(
+                        self.render_spans(span.children)
+                    )
+                )
+        return "".join(pieces)
+
+    def __convert_span__(
+        self, text: str, start: int, end: int, regex: re.Pattern
+    ) -> str:
+        pieces = []
+        pos = start
+        last_char = text[start - 1] if start > 0 else "\n"
+        while True:
+            m = regex.search(text, pos, end)
+            if m is None:
+                break
+            if m.start() > pos:
+                pieces.append(text[pos : m.start()])
+                last_char = text[m.start() - 1]
+
+            rule = self.rules_by_group[m.lastgroup]
+            if rule.at_line_start and last_char != "\n":
+                # An earlier rule swallowed the line break before this
+                # line (as a "Dr. " abbreviation may), so the line is
+                # no longer a line of its own.
+                replacement = self.__convert_span__(
+                    text, m.start(), m.end(), self.inline_regex
+                )
+            elif rule.name in m.re.groupindex:
+                replacement = rule.replace(
+                    self.__convert_span__(
+                        text, m.start(rule.name), m.end(rule.name), self.regex
+                    )
+                )
+            else:
+                replacement = rule.replace(m.group())
+
+            if replacement:
+                pieces.append(replacement)
+                last_char = replacement[-1]
+            pos = m.end()
+
+        pieces.append(text[pos:end])
+        return "".join(pieces)
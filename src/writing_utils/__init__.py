@@ -1,10 +1,21 @@
 # writing_utils (auto generate by build_inits.py)
 # flake8: noqa: F408
 
+from writing_utils.BookBackupStore import BookBackupStore
 from writing_utils.BookDir import BookDir
 from writing_utils.BookDirDocXMixin import BookDirDocXMixin
 from writing_utils.BookDirLaTeXMixin import BookDirLaTeXMixin
 from writing_utils.BookDirMarkdownMixin import BookDirMarkdownMixin
 from writing_utils.BookDirReverseDocXMixin import BookDirReverseDocXMixin
 from writing_utils.BookDirUtilsMixin import BookDirUtilsMixin
+from writing_utils.BookDirWatchMixin import BookDirWatchMixin
+from writing_utils.BookIndex import BookIndex
+from writing_utils.BookManifest import BookManifest
+from writing_utils.ChapterCounter import ChapterCounter
 from writing_utils.ChapterFile import ChapterFile
+from writing_utils.ChapterIR import ChapterIR
+from writing_utils.ChapterText import ChapterText
+from writing_utils.DocXStreamReader import DocXStreamReader
+from writing_utils.DocXStreamWriter import DocXStreamWriter
+from writing_utils.Instrumentation import Instrumentation
+from writing_utils.LaTeXRuleEngine import LaTeXRuleEngine
@@ -0,0 +1,177 @@
+"""writing-utils: one entry point for the workflows.
+
+    python -m writing_utils <command> [--book DIR] ...
+
+pylatex and python-docx are only imported by the commands that build
+or read those formats, so find and replace start quickly.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from private.data import DIR_WRITING_DEFAULT_PROJECT_DIR
+from writing_utils.BookDir import BookDir
+
+
+def get_book_dir(args) -> BookDir:
+    return BookDir(args.book or DIR_WRITING_DEFAULT_PROJECT_DIR)
+
+
+def run_find(args):
+    prev_number_and_title = None
+    book_dir = get_book_dir(args)
+    find = book_dir.search if args.words else book_dir.find
+    for find_info in find(args.query):
+        number_and_title = find_info["number_and_title"]
+        if prev_number_and_title != number_and_title:
+            print("")
+            print(number_and_title)
+        print(" " * 4, find_info["i_line"], find_info["line"])
+        prev_number_and_title = number_and_title
+
+
+def run_replace(args):
+    if len(args.pairs) % 2 != 0:
+        sys.exit("replace takes pairs: find1 replace1 [find2 replace2 ...]")
+    book_dir = get_book_dir(args)
+    replace_map = dict(zip(args.pairs[0::2], args.pairs[1::2]))
+    if not args.dry_run:
+        book_dir.backup()
+    n_hits_by_chapter = book_dir.replace_many(
+        replace_map, dry_run=args.dry_run
+    )
+    for file_name, n_hits in n_hits_by_chapter.items():
+        print(" " * 4, n_hits, file_name)
+
+
+def run_stats(args):
+    get_book_dir(args).print_statistics()
+
+
+def run_compile(args):
+    book_dir = get_book_dir(args)
+    book_dir.clean_and_write_all()
+    book_dir.rename_files(name_map=book_dir.get_name_map_from_titles())
+    book_dir.print_statistics()
+    book_dir.backup()
+
+    docx_path = book_dir.build_docx(
+        max_words_per_docx=args.max_words_per_docx,
+        workers=args.workers,
+        streaming=args.streaming_docx,
+    )
+    assert book_dir == BookDir.from_docx(
+        docx_path, streaming=True, workers=args.workers
+    )
+
+    md_path = book_dir.build_md(workers=args.workers)
+    assert book_dir == BookDir.from_md(
+        md_path, output_dir=md_path + ".dir_from_md"
+    )
+
+    book_dir.build_latex(
+        say_color=args.say_color,
+        workers=args.workers,
+        pdf=not args.no_pdf,
+        max_words_per_pdf=args.max_words_per_pdf,
+    )
+
+
+def run_docx_to_bookdir(args):
+    book_dir = get_book_dir(args)
+    diff = book_dir.diff(
+        BookDir.from_docx(book_dir.path + ".docx", streaming=True)
+    )
+    print(json.dumps(diff, indent=2))
+
+
+def run_watch(args):
+    get_book_dir(args).watch(
+        say_color=args.say_color,
+        max_words_per_docx=args.max_words_per_docx,
+        workers=args.workers,
+    )
+
+
+def run_backup(args):
+    book_dir = get_book_dir(args)
+    book_dir.backup()
+    if args.keep_last:
+        book_dir.backup_store.prune(args.keep_last)
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="writing-utils")
+    parser.add_argument("--book", help="book directory (default: private)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    find_parser = subparsers.add_parser("find", help="find words or phrases")
+    find_parser.add_argument("query")
+    find_parser.add_argument(
+        "--words",
+        action="store_true",
+        help="match whole words only, through the search index",
+    )
+    find_parser.set_defaults(func=run_find)
+
+    replace_parser = subparsers.add_parser(
+        "replace", help="replace text in every chapter"
+    )
+    replace_parser.add_argument("pairs", nargs="+", metavar="find replace")
+    replace_parser.add_argument("--dry-run", action="store_true")
+    replace_parser.set_defaults(func=run_replace)
+
+    stats_parser = subparsers.add_parser("stats", help="count words")
+    stats_parser.set_defaults(func=run_stats)
+
+    backup_parser = subparsers.add_parser("backup", help="snapshot the book")
+    backup_parser.add_argument(
+        "--keep-last", type=int, help="then prune to this many snapshots"
+    )
+    backup_parser.set_defaults(func=run_backup)
+
+    docx_parser = subparsers.add_parser(
+        "docx-to-bookdir", help="diff the book against <book>.docx"
+    )
+    docx_parser.set_defaults(func=run_docx_to_bookdir)
+
+    for name, func, description in [
+        ("compile", run_compile, "build DOCX, markdown and LaTeX"),
+        ("watch", run_watch, "rebuild whenever chapters change"),
+    ]:
+        build_parser = subparsers.add_parser(name, help=description)
+        build_parser.add_argument(
+            "--workers", type=int, default=os.cpu_count()
+        )
+        build_parser.add_argument("--say-color", default="Maroon")
+        build_parser.add_argument(
+            "--max-words-per-docx", type=int, default=10_000
+        )
+        if name == "compile":
+            build_parser.add_argument(
+                "--no-pdf", action="store_true", help="stop at the .tex"
+            )
+            build_parser.add_argument(
+                "--streaming-docx",
+                action="store_true",
+                help="write the DOCX parts without python-docx",
+            )
+            build_parser.add_argument(
+                "--max-words-per-pdf",
+                type=int,
+                help="compile the PDF as parts of this size, in parallel",
+            )
+        build_parser.set_defaults(func=func)
+
+    return parser
+
+
+def main(argv: list[str] | None = None):
+    args = get_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
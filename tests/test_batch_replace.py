@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils import File
+
+from writing_utils import BookDir
+
+
+class TestBatchReplace(unittest.TestCase):
+    def setUp(self):
+        dir_test_output = tempfile.mkdtemp(prefix="test_batch_replace_")
+        self.addCleanup(shutil.rmtree, dir_test_output)
+        self.dir_book = os.path.join(dir_test_output, "book")
+        os.makedirs(self.dir_book, exist_ok=True)
+        self.chapter1_path = os.path.join(self.dir_book, "01-First.md")
+        self.chapter2_path = os.path.join(self.dir_book, "02-Second.md")
+        File(self.chapter1_path).write("# 1. First\n\nAnn met Anna and Bob.")
+        File(self.chapter2_path).write("# 2. Second\n\nNobody here.")
+
+    REPLACE_MAP = {"Ann": "Jo", "Anna": "Mia", "Bob": "Ann"}
+
+    def test_replace_many(self):
+        n_hits_by_chapter = BookDir(self.dir_book).replace_many(
+            self.REPLACE_MAP
+        )
+        self.assertEqual(n_hits_by_chapter, {"01-First.md": 3})
+        # Longest match wins at a position, and replacements do not chain.
+        self.assertEqual(
+            File(self.chapter1_path).read(),
+            "# 1. First\n\nJo met Mia and Ann.",
+        )
+        self.assertEqual(
+            File(self.chapter2_path).read(), "# 2. Second\n\nNobody here."
+        )
+
+    def test_empty_map(self):
+        self.assertEqual(BookDir(self.dir_book).replace_many({}), {})
+        self.assertEqual(
+            File(self.chapter1_path).read(),
+            "# 1. First\n\nAnn met Anna and Bob.",
+        )
+
+    def test_dry_run(self):
+        n_hits_by_chapter = BookDir(self.dir_book).replace_many(
+            self.REPLACE_MAP, dry_run=True
+        )
+        self.assertEqual(n_hits_by_chapter, {"01-First.md": 3})
+        self.assertEqual(
+            File(self.chapter1_path).read(),
+            "# 1. First\n\nAnn met Anna and Bob.",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
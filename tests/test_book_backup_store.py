@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils import File
+
+from writing_utils import BookDir
+
+
+class TestBookBackupStore(unittest.TestCase):
+    def setUp(self):
+        self.dir_test_output = tempfile.mkdtemp(
+            prefix="test_book_backup_store_"
+        )
+        self.addCleanup(shutil.rmtree, self.dir_test_output)
+        self.dir_book = os.path.join(self.dir_test_output, "book")
+        os.makedirs(self.dir_book, exist_ok=True)
+        File(os.path.join(self.dir_book, "01-First.md")).write(
+            "# 1. First\n\nOne."
+        )
+        File(os.path.join(self.dir_book, "02-Second.md")).write(
+            "# 2. Second\n\nTwo."
+        )
+
+    def test_backup_restore_prune(self):
+        book_dir = BookDir(self.dir_book)
+        store = book_dir.backup_store
+        snapshot1 = book_dir.backup()
+        self.assertEqual(len(os.listdir(store.dir_blobs)), 2)
+
+        # Unchanged book: no new snapshot.
+        self.assertEqual(book_dir.backup(), snapshot1)
+
+        File(os.path.join(self.dir_book, "02-Second.md")).write(
+            "# 2. Second\n\nTwo, edited."
+        )
+        snapshot2 = BookDir(self.dir_book).backup()
+        self.assertNotEqual(snapshot1, snapshot2)
+        self.assertEqual(store.list_snapshots(), [snapshot1, snapshot2])
+        self.assertEqual(len(os.listdir(store.dir_blobs)), 3)
+
+        dir_restored = os.path.join(self.dir_test_output, "restored")
+        store.restore(dir_restored, snapshot1)
+        self.assertEqual(
+            File(os.path.join(dir_restored, "02-Second.md")).read(),
+            "# 2. Second\n\nTwo.",
+        )
+        with self.assertRaises(ValueError):
+            store.restore(dir_restored)
+
+        self.assertEqual(store.prune(keep_last=1), 1)
+        self.assertEqual(store.list_snapshots(), [snapshot2])
+        self.assertEqual(len(os.listdir(store.dir_blobs)), 2)
+
+        dir_restored2 = os.path.join(self.dir_test_output, "restored2")
+        store.restore(dir_restored2)
+        self.assertEqual(BookDir(dir_restored2), BookDir(self.dir_book))
+
+    def test_list_snapshots_by_name(self):
+        store = BookDir(self.dir_book).backup_store
+        os.makedirs(store.dir_snapshots)
+        snapshot_names = [
+            "book.backup.20250101.120000",
+            "book.backup.20250101.120000.2",
+            "book.backup.20250101.120000.10",
+            "book.backup.20250102.090000",
+        ]
+        for snapshot_name in reversed(snapshot_names):
+            # Not read: the order comes from the names alone.
+            File(store.get_snapshot_path(snapshot_name)).write("")
+        self.assertEqual(store.list_snapshots(), snapshot_names)
+
+
+if __name__ == "__main__":
+    unittest.main()
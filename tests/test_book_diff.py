@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils import File
+
+from writing_utils import BookDir
+
+
+class TestBookDiff(unittest.TestCase):
+    def setUp(self):
+        self.dir_test_output = tempfile.mkdtemp(prefix="test_book_diff_")
+        self.addCleanup(shutil.rmtree, self.dir_test_output)
+        self.dir_book1 = os.path.join(self.dir_test_output, "book1")
+        self.dir_book2 = os.path.join(self.dir_test_output, "book2")
+        for dir_book in [self.dir_book1, self.dir_book2]:
+            os.makedirs(dir_book, exist_ok=True)
+            File(os.path.join(dir_book, "01-First.md")).write(
+                "# 1. First\n\nOne two.\n\nThree."
+            )
+
+    def test_equal_ignores_outer_whitespace(self):
+        File(os.path.join(self.dir_book2, "01-First.md")).write(
+            "# 1. First  \n\n  One two.\n\nThree."
+        )
+        book_dir1, book_dir2 = BookDir(self.dir_book1), BookDir(self.dir_book2)
+        self.assertEqual(book_dir1, book_dir2)
+        self.assertEqual(book_dir1.diff(book_dir2), [])
+
+    def test_diff(self):
+        File(os.path.join(self.dir_book2, "01-First.md")).write(
+            "# 1. First\n\nOne two.\n\nThree!\n\nFour."
+        )
+        File(os.path.join(self.dir_book2, "02-Second.md")).write("# 2. Second")
+        book_dir1, book_dir2 = BookDir(self.dir_book1), BookDir(self.dir_book2)
+        self.assertNotEqual(book_dir1, book_dir2)
+        self.assertEqual(
+            book_dir1.diff(book_dir2),
+            [
+                dict(
+                    chapter="01-First.md",
+                    other_chapter="01-First.md",
+                    changes=[
+                        dict(
+                            op="replace",
+                            start=4,
+                            end=5,
+                            other_start=4,
+                            other_end=7,
+                        )
+                    ],
+                ),
+                dict(
+                    chapter=None,
+                    other_chapter="02-Second.md",
+                    changes=None,
+                ),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils import File
+
+from writing_utils import BookDir
+
+
+class TestBookIndex(unittest.TestCase):
+    def setUp(self):
+        dir_test_output = tempfile.mkdtemp(prefix="test_book_index_")
+        self.addCleanup(shutil.rmtree, dir_test_output)
+        self.dir_book = os.path.join(dir_test_output, "book")
+        os.makedirs(self.dir_book, exist_ok=True)
+        self.chapter1_path = os.path.join(self.dir_book, "01-First.md")
+        File(self.chapter1_path).write(
+            "# 1. First\n\nNeth walked home.\n\nThe rain, Neth said, again."
+        )
+        File(os.path.join(self.dir_book, "02-Second.md")).write(
+            "# 2. Second\n\nNeth said nothing."
+        )
+
+    def __search__(self, query):
+        return [
+            (info["number_and_title"], info["i_line"], info["line"])
+            for info in BookDir(self.dir_book).search(query)
+        ]
+
+    def test_word(self):
+        self.assertEqual(
+            self.__search__("Neth"),
+            [
+                ("1. First", 2, "Neth walked home."),
+                ("1. First", 4, "The rain, Neth said, again."),
+                ("2. Second", 2, "Neth said nothing."),
+            ],
+        )
+        self.assertEqual(self.__search__("neth"), [])
+
+    def test_phrase(self):
+        self.assertEqual(
+            self.__search__("Neth said"),
+            [
+                ("1. First", 4, "The rain, Neth said, again."),
+                ("2. Second", 2, "Neth said nothing."),
+            ],
+        )
+        self.assertEqual(self.__search__("said Neth"), [])
+        self.assertEqual(self.__search__("home The"), [])
+
+    def test_incremental_update(self):
+        self.assertEqual(len(self.__search__("rain")), 1)
+        File(self.chapter1_path).write("# 1. First\n\nSunshine.")
+        self.assertEqual(self.__search__("rain"), [])
+        self.assertEqual(
+            self.__search__("Sunshine"), [("1. First", 2, "Sunshine.")]
+        )
+
+        os.remove(self.chapter1_path)
+        self.assertEqual(self.__search__("Sunshine"), [])
+
+    def test_unreadable_index(self):
+        book_dir = BookDir(self.dir_book)
+        os.makedirs(os.path.dirname(book_dir.index.path), exist_ok=True)
+        File(book_dir.index.path).write("not a database")
+        self.assertEqual(
+            self.__search__("nothing"),
+            [("2. Second", 2, "Neth said nothing.")],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
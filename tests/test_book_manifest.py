@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils import File
+
+from writing_utils import BookDir, BookManifest
+
+
+class TestBookManifest(unittest.TestCase):
+    def setUp(self):
+        dir_test_output = tempfile.mkdtemp(prefix="test_book_manifest_")
+        self.addCleanup(shutil.rmtree, dir_test_output)
+        self.dir_book = os.path.join(dir_test_output, "book")
+        os.makedirs(self.dir_book, exist_ok=True)
+        self.chapter_path = os.path.join(self.dir_book, "01-First.md")
+        File(self.chapter_path).write("# 1. First\n\nOne two three.")
+        File(os.path.join(self.dir_book, "02-Second.md")).write(
+            "# 2. Second\n\nFour five."
+        )
+
+    @staticmethod
+    def __age__(path: str):
+        # Push mtime outside the racy window, as if edited long ago.
+        stat = os.stat(path)
+        old_ns = stat.st_mtime_ns - 10 * BookManifest.RACY_WINDOW_NS
+        os.utime(path, ns=(old_ns, old_ns))
+
+    def test_metadata(self):
+        book_dir = BookDir(self.dir_book)
+        chapter_docs = list(book_dir.gen_chapter_docs())
+        self.assertEqual([cd.number for cd in chapter_docs], [1, 2])
+        self.assertEqual(
+            [cd.title for cd in chapter_docs], ["First", "Second"]
+        )
+        self.assertEqual(book_dir.n_words, 11)
+        self.assertTrue(os.path.exists(book_dir.manifest.path))
+
+    def test_trusted_entries_skip_reading(self):
+        for file_name in os.listdir(self.dir_book):
+            self.__age__(os.path.join(self.dir_book, file_name))
+        list(BookDir(self.dir_book).gen_chapter_docs())
+
+        chapter_docs = list(BookDir(self.dir_book).gen_chapter_docs())
+        for chapter_doc in chapter_docs:
+            self.assertNotIn("chapter_text", chapter_doc.__dict__)
+        self.assertEqual(chapter_docs[0].n_words, 6)
+
+    def test_changed_file_is_refreshed(self):
+        self.__age__(self.chapter_path)
+        list(BookDir(self.dir_book).gen_chapter_docs())
+
+        File(self.chapter_path).write("# 1. Renamed\n\nOne two three four.")
+        chapter_doc = next(BookDir(self.dir_book).gen_chapter_docs())
+        self.assertEqual(chapter_doc.title, "Renamed")
+        self.assertEqual(chapter_doc.n_words, 7)
+
+    def test_removed_file_is_dropped(self):
+        book_dir = BookDir(self.dir_book)
+        list(book_dir.gen_chapter_docs())
+        os.remove(self.chapter_path)
+        list(book_dir.gen_chapter_docs())
+        self.assertEqual(list(book_dir.manifest.entries), ["02-Second.md"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from writing_utils import ChapterCounter
+
+
+class TestChapterCounter(unittest.TestCase):
+    def test_count(self):
+        text = "\n".join(
+            [
+                "# 1. The Start",
+                "",
+                'She said, "Go." He went! Did he stay?',
+                "",
+                "---",
+                "",
+                "1. A list item",
+                "and its *second line.*",
+                "",
+                "No full stop here",
+            ]
+        )
+        counts = ChapterCounter.count(text)
+        self.assertEqual(counts.n_words, len(text.split()))
+        self.assertEqual(counts.n_chars, len(text))
+        self.assertEqual(counts.n_paragraphs, 3)
+        self.assertEqual(counts.n_sentences, 5)
+
+    def test_empty(self):
+        counts = ChapterCounter.count("")
+        self.assertEqual(tuple(counts), (0, 0, 0, 0))
+
+    def test_get_is_cached_by_hash(self):
+        counts = ChapterCounter.get("test-hash", "One two.")
+        self.assertEqual(counts.n_words, 2)
+        self.assertIs(ChapterCounter.get("test-hash", "ignored"), counts)
+
+    def test_cache_is_bounded(self):
+        for i in range(ChapterCounter.CACHE_SIZE + 10):
+            ChapterCounter.get(f"bounded-{i}", "One.")
+        self.assertEqual(len(ChapterCounter.cache), ChapterCounter.CACHE_SIZE)
+        self.assertNotIn("bounded-0", ChapterCounter.cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+from writing_utils import ChapterIR
+from writing_utils.ChapterIR import Span
+
+
+class TestChapterIR(unittest.TestCase):
+    LINES = [
+        "# 3. Title",
+        "",
+        "Some *italic* text.",
+        "",
+        "---",
+        "## Later",
+        "  **Bold** ending  ",
+        "",
+    ]
+
+    def test_blocks(self):
+        chapter_ir = ChapterIR.from_lines(self.LINES)
+        self.assertEqual(chapter_ir.title_line, "# 3. Title")
+        self.assertEqual(
+            [block.kind for block in chapter_ir.blocks],
+            [
+                ChapterIR.BLANK,
+                ChapterIR.PARAGRAPH,
+                ChapterIR.BLANK,
+                ChapterIR.SECTION_BREAK,
+                ChapterIR.HEADING,
+                ChapterIR.PARAGRAPH,
+                ChapterIR.BLANK,
+            ],
+        )
+        heading = chapter_ir.blocks[4]
+        self.assertEqual((heading.text, heading.level), ("Later", 2))
+        self.assertEqual(
+            chapter_ir.blocks[5].spans,
+            (
+                Span("bold", "Bold", (Span(None, "Bold"),)),
+                Span(None, " ending"),
+            ),
+        )
+
+    def test_quotes_and_notes(self):
+        spans = ChapterIR.parse_spans('"Go *now*," [[aside]]she said.')
+        self.assertEqual(
+            spans,
+            (
+                Span(
+                    "quote",
+                    "Go *now*,",
+                    (
+                        Span(None, "Go "),
+                        Span("italic", "now", (Span(None, "now"),)),
+                        Span(None, ","),
+                    ),
+                ),
+                Span(None, " "),
+                Span(ChapterIR.NOTE, "aside"),
+                Span(None, "she said."),
+            ),
+        )
+        self.assertEqual(
+            ChapterIR.without_notes(spans)[1:],
+            (Span(None, " she said."),),
+        )
+
+    def test_markup_pairs_up_across_notes(self):
+        text = "*a [[b*]] c* and **d**[[e]]"
+        spans = ChapterIR.parse_spans(text)
+        self.assertEqual(
+            [span.style for span in spans],
+            ["italic", None, "bold", ChapterIR.NOTE],
+        )
+        self.assertEqual(spans[0].children[1], Span(ChapterIR.NOTE, "b*"))
+        self.assertEqual(ChapterIR.to_markdown(spans), text)
+
+    def test_body_matches_source(self):
+        chapter_ir = ChapterIR.from_lines(self.LINES)
+        self.assertEqual(chapter_ir.body, "\n".join(self.LINES[1:]).strip())
+        self.assertEqual(
+            [block.source for block in chapter_ir.blocks], self.LINES[1:]
+        )
+        self.assertEqual(
+            "\n".join(block.source for block in chapter_ir.body_blocks),
+            chapter_ir.body,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
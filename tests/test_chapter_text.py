@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+from utils import File
+
+from writing_utils import ChapterFile, ChapterText
+
+
+class TestChapterText(unittest.TestCase):
+    def test_matches_split(self):
+        for text in [
+            "",
+            "\n",
+            "# 1. Title",
+            "# 1. Title\n\nBody one.\n\nBody two.\n",
+            "\n\nA\n\n",
+        ]:
+            chapter_text = ChapterText(text)
+            lines = text.split("\n")
+            self.assertEqual(list(chapter_text), lines)
+            self.assertEqual(len(chapter_text), len(lines))
+            self.assertEqual(chapter_text[-1], lines[-1])
+            self.assertEqual(chapter_text[1:], lines[1:])
+            self.assertEqual(chapter_text, lines)
+
+    def test_index_out_of_range(self):
+        with self.assertRaises(IndexError):
+            ChapterText("a\nb")[2]
+
+    def test_first_line_reads_one_line(self):
+        with tempfile.TemporaryDirectory() as dir_book:
+            chapter_path = os.path.join(dir_book, "01-first.md")
+            File(chapter_path).write("# 1. First\n\nOne two three.")
+            chapter_doc = ChapterFile(chapter_path)
+
+            self.assertEqual(chapter_doc.number_and_title, "1. First")
+            self.assertEqual(chapter_doc.title, "First")
+            self.assertNotIn("chapter_text", chapter_doc.__dict__)
+            self.assertEqual(chapter_doc.content, File(chapter_path).read())
+            self.assertIs(chapter_doc.lines, chapter_doc.chapter_text)
+
+
+if __name__ == "__main__":
+    unittest.main()
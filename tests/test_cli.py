@@ -0,0 +1,66 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from utils import File
+
+
+class TestCLI(unittest.TestCase):
+    def setUp(self):
+        self.dir_test_output = tempfile.mkdtemp(prefix="test_cli_")
+        self.addCleanup(shutil.rmtree, self.dir_test_output)
+        self.dir_book = os.path.join(self.dir_test_output, "book")
+        os.makedirs(self.dir_book, exist_ok=True)
+        File(os.path.join(self.dir_book, "01-First.md")).write(
+            "# 1. First\n\nThe rain fell.\n\nIt stopped."
+        )
+
+    def run_python(self, *args) -> str:
+        return subprocess.run(
+            [sys.executable, *args],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+
+    def test_import_skips_format_backends(self):
+        stdout = self.run_python(
+            "-c",
+            "import sys, writing_utils;"
+            + "print('docx' in sys.modules, 'pylatex' in sys.modules)",
+        )
+        self.assertEqual(stdout.strip(), "False False")
+
+    def test_find_and_replace(self):
+        stdout = self.run_python(
+            "-m", "writing_utils", "--book", self.dir_book, "find", "rain fell"
+        )
+        self.assertIn("The rain fell.", stdout)
+
+        # find matches substrings; find --words only whole words.
+        find_args = ["-m", "writing_utils", "--book", self.dir_book, "find"]
+        self.assertIn("The rain fell.", self.run_python(*find_args, "rai"))
+        self.assertNotIn(
+            "The rain fell.", self.run_python(*find_args, "rai", "--words")
+        )
+
+        self.run_python(
+            "-m",
+            "writing_utils",
+            "--book",
+            self.dir_book,
+            "replace",
+            "rain",
+            "snow",
+        )
+        self.assertEqual(
+            File(os.path.join(self.dir_book, "01-First.md")).read(),
+            "# 1. First\n\nThe snow fell.\n\nIt stopped.",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
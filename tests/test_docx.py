@@ -1,6 +1,9 @@
 import os
+import shutil
 import sys
+import tempfile
 import unittest
+import zipfile
 
 from utils import File
 
@@ -118,11 +121,8 @@ And the whole mob join in a rowdy chorus---loud as ever, and completely off key:
 %"""
 
     def setUp(self):
-        self.dir_test_output = os.path.join(
-            "tests", "output", "test_roundtrip"
-        )
-        # shutil.rmtree(self.dir_test_output, ignore_errors=True)
-        os.makedirs(self.dir_test_output, exist_ok=True)
+        self.dir_test_output = tempfile.mkdtemp(prefix="test_roundtrip_")
+        self.addCleanup(shutil.rmtree, self.dir_test_output)
         self._setup_chapters()
 
     def _setup_chapters(self):
@@ -145,10 +145,9 @@ And the whole mob join in a rowdy chorus---loud as ever, and completely off key:
             os.path.exists(latex_file_path), "LaTeX file was not created"
         )
 
-        all_lines = File(latex_file_path).read_lines()
-        i_start = all_lines.index(r"\chapter{First Chapter}%")
-        i_end = all_lines.index(r"\chapter{Second Chapter}%")
-        actual_lines = all_lines[i_start:i_end]
+        fragment_paths = self._get_latex_fragment_paths(latex_file_path)
+        self.assertEqual(len(fragment_paths), 2)
+        actual_lines = File(fragment_paths[0]).read_lines()
         expected_lines = self.CHAPTER1_TEX.splitlines()
         assert len(expected_lines) == len(
             actual_lines
@@ -162,6 +161,64 @@ And the whole mob join in a rowdy chorus---loud as ever, and completely off key:
                 f'{i}: "{expected_line}" != "{actual_line}"',
             )
 
+    @staticmethod
+    def _get_latex_fragment_paths(latex_file_path):
+        latex_dir = os.path.dirname(latex_file_path)
+        fragment_paths = []
+        for line in File(latex_file_path).read_lines():
+            if line.startswith(r"\input{"):
+                fragment_name = line[len(r"\input{") : -len("}%")]
+                fragment_paths.append(
+                    os.path.join(latex_dir, fragment_name + ".tex")
+                )
+        return fragment_paths
+
+    def test_latex_document_matches_pylatex(self):
+        from pylatex import Document
+        from pylatex.utils import escape_latex
+
+        book_dir1 = BookDir(self.dir_book)
+        book_dir1.clean_and_write_all()
+        latex_file_path = book_dir1.build_latex(say_color="Red", pdf=False)
+        content = File(latex_file_path).read()
+
+        doc = Document(
+            documentclass="book", document_options=["a4paper", "12pt"]
+        )
+        self.assertTrue(
+            content.startswith(
+                doc.documentclass.dumps()
+                + "%\n"
+                + doc.dumps_packages()
+                + "%\n%\n"
+            )
+        )
+        self.assertIn("%\n%\n\\begin{document}%\n\\normalsize%\n", content)
+        self.assertTrue(content.endswith("}%\n\\end{document}"))
+
+        text = "A & B_1 {50%} ~x^2 [a-b] \\ $\n\xa0#"
+        self.assertEqual(BookDir.__escape_latex__(text), escape_latex(text))
+
+    def test_latex_fragment_cache(self):
+        book_dir1 = BookDir(self.dir_book)
+        book_dir1.clean_and_write_all()
+        latex_file_path = book_dir1.build_latex(say_color="Red", pdf=False)
+        fragment_paths1 = self._get_latex_fragment_paths(latex_file_path)
+
+        chapter2_path = os.path.join(self.dir_book, "02-Second_Chapter.md")
+        File(chapter2_path).write(
+            self.CHAPTER2_CONTENT.replace("Another", "One more")
+        )
+        latex_file_path = book_dir1.build_latex(say_color="Red", pdf=False)
+        fragment_paths2 = self._get_latex_fragment_paths(latex_file_path)
+
+        self.assertEqual(fragment_paths1[0], fragment_paths2[0])
+        self.assertNotEqual(fragment_paths1[1], fragment_paths2[1])
+        self.assertFalse(os.path.exists(fragment_paths1[1]))
+        self.assertIn(
+            "One more paragraph here.", File(fragment_paths2[1]).read()
+        )
+
     def test_docx_roundtrip(self):
         book_dir1 = BookDir(self.dir_book)
         book_dir1.clean_and_write_all()
@@ -174,6 +231,94 @@ And the whole mob join in a rowdy chorus---loud as ever, and completely off key:
         book_dir2 = BookDir.from_docx(docx_file_path)
         self.assertEqual(book_dir1, book_dir2)
 
+        book_dir3 = BookDir.from_docx(docx_file_path, streaming=True)
+        self.assertEqual(book_dir1, book_dir3)
+
+    def test_docx_streaming(self):
+        book_dir1 = BookDir(self.dir_book)
+        book_dir1.clean_and_write_all()
+        docx_dir = book_dir1.build_docx(10)
+        part_paths = [
+            os.path.join(docx_dir, f"part_{i:02d}.docx") for i in range(2)
+        ]
+        expected = [self._read_docx_parts(path) for path in part_paths]
+
+        shutil.rmtree(docx_dir)
+        book_dir1.build_docx(10, workers=2, streaming=True)
+        actual = [self._read_docx_parts(path) for path in part_paths]
+        self.assertEqual(expected, actual)
+        self.assertEqual(book_dir1, BookDir.from_docx(docx_dir))
+        self.assertEqual(
+            book_dir1, BookDir.from_docx(docx_dir, streaming=True)
+        )
+
+    @staticmethod
+    def _read_docx_parts(docx_path):
+        with zipfile.ZipFile(docx_path) as zip_file:
+            return {name: zip_file.read(name) for name in zip_file.namelist()}
+
+    def test_docx_incremental_parts(self):
+        book_dir1 = BookDir(self.dir_book)
+        book_dir1.clean_and_write_all()
+        docx_dir = book_dir1.build_docx(10)
+        part_paths = [
+            os.path.join(docx_dir, f"part_{i:02d}.docx") for i in range(2)
+        ]
+        mtimes1 = [os.stat(path).st_mtime_ns for path in part_paths]
+
+        chapter2_path = os.path.join(self.dir_book, "02-Second_Chapter.md")
+        File(chapter2_path).write(
+            self.CHAPTER2_CONTENT.replace("Another", "One more")
+        )
+        book_dir1.clean_and_write_all()
+        book_dir1.build_docx(10)
+        mtimes2 = [os.stat(path).st_mtime_ns for path in part_paths]
+
+        self.assertEqual(mtimes1[0], mtimes2[0])
+        self.assertNotEqual(mtimes1[1], mtimes2[1])
+        self.assertEqual(book_dir1, BookDir.from_docx(docx_dir))
+
+    def test_docx_duplicate_chapters(self):
+        book_dir1 = BookDir(self.dir_book)
+        book_dir1.clean_and_write_all()
+        docx_dir = book_dir1.build_docx(10)
+
+        docx_dir_dup = os.path.join(self.dir_test_output, "docx_dup")
+        shutil.rmtree(docx_dir_dup, ignore_errors=True)
+        shutil.copytree(docx_dir, docx_dir_dup)
+        shutil.copy(
+            os.path.join(docx_dir, "part_00.docx"),
+            os.path.join(docx_dir_dup, "part_02.docx"),
+        )
+        with self.assertRaisesRegex(ValueError, "part_00.docx, part_02.docx"):
+            BookDir.from_docx(docx_dir_dup, streaming=True, workers=2)
+
+    def test_parallel_builds_match_serial(self):
+        book_dir1 = BookDir(self.dir_book)
+        book_dir1.clean_and_write_all()
+
+        md_serial = File(book_dir1.build_md()).read()
+        md_parallel = File(book_dir1.build_md(workers=2)).read()
+        self.assertEqual(md_serial, md_parallel)
+
+        latex_file_path = book_dir1.build_latex(say_color="Red", pdf=False)
+        fragment_paths = self._get_latex_fragment_paths(latex_file_path)
+        fragments_serial = [File(path).read() for path in fragment_paths]
+        for path in fragment_paths:
+            os.remove(path)
+        book_dir1.build_latex(say_color="Red", pdf=False, workers=2)
+        fragments_parallel = [File(path).read() for path in fragment_paths]
+        self.assertEqual(fragments_serial, fragments_parallel)
+
+        docx_dir = book_dir1.build_docx(10)
+        shutil.rmtree(docx_dir)
+        book_dir1.build_docx(10, workers=2)
+        self.assertEqual(book_dir1, BookDir.from_docx(docx_dir))
+        self.assertEqual(
+            book_dir1,
+            BookDir.from_docx(docx_dir, streaming=True, workers=2),
+        )
+
     def test_md_roundtrip(self):
         book_dir1 = BookDir(self.dir_book)
         book_dir1.clean_and_write_all()
@@ -0,0 +1,60 @@
+import unittest
+
+from writing_utils import BookDirDocXMixin
+
+
+class RunRecorder:
+    class Run:
+        def __init__(self, text):
+            self.text = text
+            self.bold = None
+            self.italic = None
+
+    def __init__(self):
+        self.runs = []
+
+    def add_run(self, text):
+        run = RunRecorder.Run(text)
+        self.runs.append(run)
+        return run
+
+
+class TestDocXInlineFormatter(unittest.TestCase):
+    CASES = [
+        ("plain text", [("plain text", None, None)]),
+        (
+            "a *b* c",
+            [("a ", None, None), ("b", None, True), (" c", None, None)],
+        ),
+        ("**bold**", [("bold", True, None)]),
+        (
+            "*\\say{x}* **y**",
+            [("x", None, True), (" ", None, None), ("y", True, None)],
+        ),
+        (
+            "*a **b** c*",
+            [("a ", None, True), ("b", True, True), (" c", None, True)],
+        ),
+        ("** not closed", [("** not closed", None, None)]),
+        ("***x***", [("x", True, True)]),
+        (
+            'a "b *c*" [[d]]',
+            [
+                ('a "b ', None, None),
+                ("c", None, True),
+                ('" [[d]]', None, None),
+            ],
+        ),
+    ]
+
+    def test_runs(self):
+        mixin = BookDirDocXMixin()
+        for text, expected_runs in self.CASES:
+            para = RunRecorder()
+            mixin.__add_formatted_text_to_docx_paragraph__(para, text)
+            actual_runs = [(r.text, r.bold, r.italic) for r in para.runs]
+            self.assertEqual(expected_runs, actual_runs, text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+
+from docx import Document
+from docx.enum.text import WD_BREAK
+
+from writing_utils import BookDirReverseDocXMixin, DocXStreamReader
+
+
+class TestDocXStreamReader(unittest.TestCase):
+    def build_docx(self, docx_path):
+        doc = Document()
+        doc.add_paragraph("Title page")
+        doc.add_heading("1. First", level=1)
+        para = doc.add_paragraph("  Plain ")
+        para.add_run("and more ")
+        para.add_run("bold").bold = True
+        para.add_run(" ")
+        run = para.add_run("both")
+        run.bold = True
+        run.italic = True
+        para.add_run("\tafter a tab").italic = False
+        para = doc.add_paragraph("Line")
+        para.add_run().add_break()
+        para.add_run("break")
+        para.add_run().add_break(WD_BREAK.PAGE)
+        doc.add_heading("Sub heading", level=2)
+        doc.add_paragraph("")
+        doc.add_paragraph("Quote", style="Quote")
+        doc.add_heading("2. Second", level=1)
+        doc.add_paragraph("x", style="List Bullet")
+        doc.save(docx_path)
+
+    def test_matches_python_docx(self):
+        with tempfile.TemporaryDirectory() as dir_temp:
+            docx_path = os.path.join(dir_temp, "test.docx")
+            self.build_docx(docx_path)
+
+            expected = list(
+                BookDirReverseDocXMixin._gen_docx_paragraphs(docx_path)
+            )
+            actual = list(DocXStreamReader(docx_path).gen_paragraphs())
+            self.assertEqual(expected, actual)
+            self.assertEqual(
+                actual[2],
+                ("Normal", "Plain and more **bold** ***both***\tafter a tab"),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
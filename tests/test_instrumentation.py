@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+import unittest
+
+from utils import File
+
+from writing_utils import BookDir, Instrumentation
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.dir_test_output = tempfile.mkdtemp(prefix="test_instrumentation_")
+        self.addCleanup(shutil.rmtree, self.dir_test_output)
+        self.dir_book = os.path.join(self.dir_test_output, "book")
+        os.makedirs(self.dir_book, exist_ok=True)
+        File(os.path.join(self.dir_book, "01-First.md")).write(
+            "# 1. First\n\nOne two three."
+        )
+        File(os.path.join(self.dir_book, "02-Second.md")).write(
+            "# 2. Second\n\nFour five."
+        )
+
+    def tearDown(self):
+        Instrumentation.disable()
+        Instrumentation.reset()
+
+    def test_disabled_records_nothing(self):
+        Instrumentation.reset()
+        BookDir(self.dir_book).clean_and_write_all()
+        self.assertEqual(Instrumentation.report().records, [])
+
+    def test_records(self):
+        Instrumentation.reset()
+        Instrumentation.enable()
+        book_dir = BookDir(self.dir_book)
+        book_dir.clean_and_write_all()
+        book_dir.build_md()
+
+        records = Instrumentation.report().records
+        self.assertEqual(
+            [(record.name, record.label, record.depth) for record in records],
+            [
+                ("ChapterFile.clean_and_write", "01-First.md", 1),
+                ("ChapterFile.clean_and_write", "02-Second.md", 1),
+                ("BookDirUtilsMixin.clean_and_write_all", None, 0),
+                ("BookDirMarkdownMixin.build_md", None, 0),
+            ],
+        )
+        self.assertEqual(records[0].n_words, 6)
+        self.assertEqual(
+            (records[-1].n_chapters, records[-1].n_words), (2, 11)
+        )
+        self.assertGreater(records[-1].wall_s, 0)
+        self.assertGreater(records[-1].peak_bytes, 0)
+
+        totals = Instrumentation.report().to_dict()["totals"]
+        self.assertEqual(totals["ChapterFile.clean_and_write"]["n_calls"], 2)
+
+    def test_keeps_outer_tracing(self):
+        tracemalloc.start()
+        try:
+            Instrumentation.enable()
+            Instrumentation.reset_peak()
+            data = bytearray(1_000_000)
+            del data
+            BookDir(self.dir_book).build_md()
+            Instrumentation.disable()
+
+            self.assertTrue(tracemalloc.is_tracing())
+            self.assertGreaterEqual(
+                Instrumentation.get_peak_bytes(), 1_000_000
+            )
+        finally:
+            tracemalloc.stop()
+
+    def test_env_var_dump(self):
+        json_path = os.path.join(self.dir_test_output, "report.json")
+        subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "from writing_utils import BookDir;"
+                + f"BookDir({self.dir_book!r}).build_md()",
+            ],
+            env=os.environ | {Instrumentation.ENV_VAR: json_path},
+            check=True,
+            capture_output=True,
+        )
+        with open(json_path) as fin:
+            report = json.load(fin)
+        self.assertEqual(
+            [stage["name"] for stage in report["stages"]],
+            ["BookDirMarkdownMixin.build_md"],
+        )
+        self.assertGreater(report["stages"][0]["words_per_s"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from utils import File, JSONFile
+
+from writing_utils import BookDir
+
+# Stands in for pdflatex: writes the .pdf and a .aux/.toc that only
+# depend on the chapter titles, as a real engine's would, and logs the
+# options of each run. With -ini it just writes the format file.
+FAKE_PDFLATEX = f"#!{sys.executable}\n" + r"""
+import os, re, sys
+with open(os.path.join(os.path.dirname(__file__), "calls"), "a") as fout:
+    fout.write(" ".join(sys.argv[1:]) + "\n")
+if "-ini" in sys.argv:
+    jobname = [a for a in sys.argv if a.startswith("-jobname=")][0]
+    sys.exit(open(jobname[len("-jobname="):] + ".fmt", "w").write("fmt"))
+tex_path = sys.argv[-1]
+base = tex_path[: -len(".tex")]
+with open(base + ".runs", "a") as fout:
+    fout.write(" ".join(sys.argv[1:-1]) + "\n")
+titles = []
+latex_dir = os.path.dirname(tex_path)
+for name in re.findall(r"\\input{(.+?)}", open(tex_path).read()):
+    if os.path.exists(base + ".aux"):
+        fragment = open(os.path.join(latex_dir, name + ".tex")).read()
+        titles.append(fragment.split("}")[0])
+open(base + ".aux", "w").write("relax")
+open(base + ".toc", "w").write("\n".join(titles))
+open(base + ".pdf", "w").write("pdf")
+"""
+# Finds only files put next to it.
+FAKE_KPSEWHICH = f"#!{sys.executable}\n" + r"""
+import os, sys
+path = os.path.join(os.path.dirname(__file__), sys.argv[-1])
+sys.exit(print(path) if os.path.exists(path) else 1)
+"""
+
+
+class TestLaTeXBuildCache(unittest.TestCase):
+    def setUp(self):
+        self.dir_test_output = tempfile.mkdtemp(
+            prefix="test_latex_build_cache_"
+        )
+        self.addCleanup(shutil.rmtree, self.dir_test_output)
+        self.dir_book = os.path.join(self.dir_test_output, "book")
+        os.makedirs(self.dir_book)
+        self.chapter_path = os.path.join(self.dir_book, "01-first.md")
+        File(self.chapter_path).write("# 1. First\n\nOne two three.")
+
+        self.dir_bin = os.path.join(self.dir_test_output, "bin")
+        os.makedirs(self.dir_bin)
+        for name, content in [
+            ("pdflatex", FAKE_PDFLATEX),
+            ("kpsewhich", FAKE_KPSEWHICH),
+        ]:
+            File(os.path.join(self.dir_bin, name)).write(content)
+            os.chmod(os.path.join(self.dir_bin, name), 0o755)
+        File(os.path.join(self.dir_bin, "mylatexformat.ltx")).write("")
+        self.original_path = os.environ["PATH"]
+        os.environ["PATH"] = (
+            os.path.abspath(self.dir_bin) + os.pathsep + self.original_path
+        )
+
+    def tearDown(self):
+        os.environ["PATH"] = self.original_path
+
+    def __get_n_runs__(self, tex_path: str) -> int:
+        runs_path = tex_path[: -len(".tex")] + ".runs"
+        if not os.path.exists(runs_path):
+            return 0
+        return len(File(runs_path).read_lines()) - 1
+
+    def __get_n_calls__(self) -> int:
+        return len(File(os.path.join(self.dir_bin, "calls")).read_lines())
+
+    @staticmethod
+    def __get_format_files__(latex_dir: str, ext: str) -> list[str]:
+        return [
+            file_name
+            for file_name in os.listdir(latex_dir)
+            if file_name.endswith(ext)
+        ]
+
+    def test_preamble_format(self):
+        tex_path = BookDir(self.dir_book).build_latex(say_color="Red")
+        latex_dir = os.path.dirname(tex_path)
+        fmt_names = self.__get_format_files__(latex_dir, ".fmt")
+        self.assertEqual(len(fmt_names), 1)
+        format_name = fmt_names[0][: -len(".fmt")]
+        self.assertIn(
+            BookDir.LATEX_FORMAT_DUMP_MARKER + "%" + format_name,
+            File(tex_path).read(),
+        )
+        runs_path = tex_path[: -len(".tex")] + ".runs"
+        self.assertTrue(
+            File(runs_path).read().startswith("-fmt=" + format_name)
+        )
+
+        # A new say_color is a new preamble, so a new format, which
+        # supersedes the old one.
+        BookDir(self.dir_book).build_latex(say_color="Blue")
+        fmt_names2 = self.__get_format_files__(latex_dir, ".fmt")
+        self.assertEqual(len(fmt_names2), 1)
+        self.assertNotEqual(fmt_names2, fmt_names)
+
+    def test_engine_upgrade(self):
+        tex_path = BookDir(self.dir_book).build_latex(say_color="Red")
+        latex_dir = os.path.dirname(tex_path)
+        fmt_names = self.__get_format_files__(latex_dir, ".fmt")
+
+        pdflatex_path = os.path.join(self.dir_bin, "pdflatex")
+        stat = os.stat(pdflatex_path)
+        os.utime(pdflatex_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        BookDir(self.dir_book).build_latex(say_color="Red")
+        fmt_names2 = self.__get_format_files__(latex_dir, ".fmt")
+        self.assertEqual(len(fmt_names2), 1)
+        self.assertNotEqual(fmt_names2, fmt_names)
+        self.assertEqual(self.__get_n_runs__(tex_path), 4)
+
+    def test_format_without_mylatexformat(self):
+        os.remove(os.path.join(self.dir_bin, "mylatexformat.ltx"))
+        tex_path = BookDir(self.dir_book).build_latex(say_color="Red")
+        latex_dir = os.path.dirname(tex_path)
+        self.assertEqual(self.__get_format_files__(latex_dir, ".fmt"), [])
+        self.assertEqual(self.__get_format_files__(latex_dir, ".failed"), [])
+        runs_path = tex_path[: -len(".tex")] + ".runs"
+        self.assertFalse(File(runs_path).read().startswith("-fmt="))
+
+        File(os.path.join(self.dir_bin, "mylatexformat.ltx")).write("")
+        File(self.chapter_path).write("# 1. First\n\nOne two three four.")
+        BookDir(self.dir_book).build_latex(say_color="Red")
+        self.assertEqual(len(self.__get_format_files__(latex_dir, ".fmt")), 1)
+
+    def test_plain_preamble(self):
+        tex_path = BookDir(self.dir_book).build_latex(
+            say_color="Red", preamble_format=False
+        )
+        self.assertNotIn(
+            BookDir.LATEX_FORMAT_DUMP_MARKER, File(tex_path).read()
+        )
+
+    def test_skip_and_passes(self):
+        book_dir = BookDir(self.dir_book)
+        tex_path = book_dir.build_latex(say_color="Red")
+        build_cache_path = tex_path[: -len(".tex")] + ".build.json"
+        # Writes .aux, then .toc, then nothing new.
+        self.assertEqual(JSONFile(build_cache_path).read()["n_passes"], 3)
+        self.assertEqual(self.__get_n_runs__(tex_path), 3)
+
+        # A no-op build does not run the engine at all.
+        n_calls = self.__get_n_calls__()
+        BookDir(self.dir_book).build_latex(say_color="Red")
+        self.assertEqual(self.__get_n_runs__(tex_path), 3)
+        self.assertEqual(self.__get_n_calls__(), n_calls)
+
+        File(self.chapter_path).write("# 1. First\n\nOne two three four.")
+        BookDir(self.dir_book).build_latex(say_color="Red")
+        self.assertEqual(JSONFile(build_cache_path).read()["n_passes"], 1)
+        self.assertEqual(self.__get_n_runs__(tex_path), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from pypdf import PdfReader
+from utils import File, JSONFile
+
+from writing_utils import BookDir
+from writing_utils.BookDirLaTeXMixin import log
+
+# Stands in for pdflatex: one page per chapter (plus three for the
+# front matter), numbered from \setcounter{page}, with the chapter
+# entries written to the .aux as \addcontentsline would.
+FAKE_PDFLATEX = f"#!{sys.executable}\n" + r"""
+import re, sys
+from pypdf import PdfWriter
+tex_path = sys.argv[-1]
+base = tex_path[: -len(".tex")]
+tex = open(tex_path).read()
+page = int((re.findall(r"setcounter{page}{(\d+)}", tex) or [1])[0])
+chapter = int((re.findall(r"setcounter{chapter}{(\d+)}", tex) or [0])[0])
+n_pages = 3 if r"\maketitle" in tex else 0
+aux_lines = []
+for _ in re.findall(r"\\input{chapters/", tex):
+    chapter += 1
+    aux_lines.append(
+        r"\@writefile{toc}{\contentsline {chapter}"
+        + r"{\numberline {%d}}{%d}}" % (chapter, page + n_pages)
+        + "\n"
+    )
+    n_pages += 1
+open(base + ".aux", "w").write("".join(aux_lines))
+writer = PdfWriter()
+for _ in range(n_pages):
+    writer.add_blank_page(100, 100)
+writer.write(base + ".pdf")
+"""
+
+
+class TestLaTeXParts(unittest.TestCase):
+    def setUp(self):
+        self.dir_test_output = tempfile.mkdtemp(prefix="test_latex_parts_")
+        self.addCleanup(shutil.rmtree, self.dir_test_output)
+        self.dir_book = os.path.join(self.dir_test_output, "book")
+        os.makedirs(self.dir_book)
+        for i in range(1, 4):
+            File(os.path.join(self.dir_book, f"0{i}-chapter.md")).write(
+                f"# {i}. Chapter {i}\n\nOne two three four five."
+            )
+
+        dir_bin = os.path.join(self.dir_test_output, "bin")
+        os.makedirs(dir_bin)
+        pdflatex_path = os.path.join(dir_bin, "pdflatex")
+        File(pdflatex_path).write(FAKE_PDFLATEX)
+        os.chmod(pdflatex_path, 0o755)
+        self.original_path = os.environ["PATH"]
+        os.environ["PATH"] = (
+            os.path.abspath(dir_bin) + os.pathsep + self.original_path
+        )
+
+    def tearDown(self):
+        os.environ["PATH"] = self.original_path
+
+    def test_parts(self):
+        tex_path = BookDir(self.dir_book).build_latex(
+            say_color="Red", workers=2, max_words_per_pdf=10
+        )
+        output_path = tex_path[: -len(".tex")]
+
+        build_cache = JSONFile(output_path + ".build.json").read()
+        self.assertEqual(build_cache["part_sizes"], [1, 1, 1])
+        self.assertEqual(build_cache["first_pages"], [1, 5, 6])
+        self.assertIn(
+            r"\setcounter{chapter}{2}",
+            File(output_path + "_part_02.tex").read(),
+        )
+        self.assertEqual(
+            File(output_path + "_contents.toc").read_lines()[:-1],
+            [
+                r"\contentsline {chapter}{\numberline {1}}{4}",
+                r"\contentsline {chapter}{\numberline {2}}{5}",
+                r"\contentsline {chapter}{\numberline {3}}{6}",
+            ],
+        )
+        self.assertEqual(len(PdfReader(output_path + ".pdf").pages), 6)
+
+    def test_unsettled_parts_are_rebuilt(self):
+        book_dir = BookDir(self.dir_book)
+        max_passes = BookDir.LATEX_MAX_PASSES
+        BookDir.LATEX_MAX_PASSES = 1
+        try:
+            tex_path = book_dir.build_latex(
+                say_color="Red", max_words_per_pdf=10
+            )
+        finally:
+            BookDir.LATEX_MAX_PASSES = max_passes
+        build_cache_path = tex_path[: -len(".tex")] + ".build.json"
+        self.assertIsNone(JSONFile(build_cache_path).read()["digest"])
+
+        book_dir.build_latex(say_color="Red", max_words_per_pdf=10)
+        build_cache = JSONFile(build_cache_path).read()
+        self.assertIsNotNone(build_cache["digest"])
+        self.assertEqual(build_cache["first_pages"], [1, 5, 6])
+
+    def test_failed_command_is_logged(self):
+        command = [
+            sys.executable,
+            "-c",
+            "print('! Undefined control sequence.'); raise SystemExit(1)",
+        ]
+        with self.assertLogs(log, "ERROR") as logs:
+            with self.assertRaises(subprocess.CalledProcessError):
+                BookDir.__run_latex_command__(command, self.dir_test_output)
+        self.assertIn("! Undefined control sequence.", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import glob
+import os
+import unittest
+
+from utils import File
+
+from writing_utils import BookDir, ChapterIR, LaTeXRuleEngine
+from writing_utils.ChapterIR import Span
+from writing_utils.LaTeXRuleEngine import LaTeXRule
+
+# Markdown files and the LaTeX the converter wrote for them before it
+# became a single-pass rule engine; nested_emphasis.tex, where the old
+# converter could mis-nest bold and italics, was checked by hand. Both the
+# engine and the rendering from ChapterIR must reproduce them.
+DIR_GOLDEN = os.path.join("tests", "golden", "markdown_to_latex")
+
+
+class TestLaTeXRuleEngine(unittest.TestCase):
+    def test_golden(self):
+        md_paths = sorted(glob.glob(os.path.join(DIR_GOLDEN, "*.md")))
+        self.assertGreater(len(md_paths), 0)
+        for md_path in md_paths:
+            expected = File(md_path[: -len(".md")] + ".tex").read()
+            content = File(md_path).read()
+            self.assertEqual(
+                expected,
+                BookDir.__convert_markdown_to_latex__(content),
+                md_path,
+            )
+            self.assertEqual(
+                expected, BookDir.LATEX_RULE_ENGINE.convert(content), md_path
+            )
+
+    def test_render_from_ir_across_lines(self):
+        # Lines whose quote or abbreviation runs on into the next.
+        for content in [
+            'He said "wait.\n\nThen *go*," and left. "Fine."',
+            "## Talk with Dr.\n\nNext - para.",
+            "Ask Dr.\n\n---\n\n### Mr. [[x]]\n**Done** & dusted.",
+            "  - \n[[n]]---\n## [[n]]\n*a [[n]]- b*",
+        ]:
+            self.assertEqual(
+                BookDir.LATEX_RULE_ENGINE.convert(content),
+                BookDir.__convert_markdown_to_latex__(content),
+                content,
+            )
+
+    def test_nested_and_line_start(self):
+        engine = LaTeXRuleEngine(
+            [
+                LaTeXRule(
+                    "heading",
+                    r"^# (?P<heading>.+)$",
+                    lambda s: "<h>" + s + "</h>",
+                    at_line_start=True,
+                ),
+                LaTeXRule("join", r"\+\n", lambda s: "+"),
+                LaTeXRule("bold", r"_(?P<bold>[^_]+)_", lambda s: s.upper()),
+            ],
+            str.maketrans({"—": "-"}),
+        )
+        self.assertEqual(
+            engine.convert("# A _b_—c\nD +\n# E"),
+            "<h>A B-c</h>\nD +# E",
+        )
+
+    def test_add_rule(self):
+        engine = LaTeXRuleEngine(
+            [LaTeXRule("bold", r"\*(?P<bold>[^*]+)\*", lambda s: s.upper())],
+            {},
+        )
+        signature = engine.signature
+        self.assertEqual(engine.convert("*a* ~b~"), "A ~b~")
+
+        engine.add_rule(
+            LaTeXRule("strike", r"~(?P<strike>[^~]+)~", lambda s: "-" + s),
+            before="bold",
+        )
+        self.assertEqual(engine.rules[0].name, "strike")
+        self.assertEqual(engine.convert("*a* ~b~"), "A -b")
+        self.assertNotEqual(engine.signature, signature)
+
+    def test_signature_has_rule_versions(self):
+        rule = LaTeXRule("bold", r"\*(?P<bold>[^*]+)\*", str.upper)
+        self.assertNotEqual(
+            LaTeXRuleEngine([rule], {}).signature,
+            LaTeXRuleEngine(
+                [rule._replace(replace=str.lower, version=2)], {}
+            ).signature,
+        )
+
+    def test_render_spans(self):
+        engine = LaTeXRuleEngine(
+            [
+                LaTeXRule("dash", r" - ", lambda s: "---"),
+                LaTeXRule("bold", r"\*(?P<bold>[^*]+)\*", lambda s: s.upper()),
+            ],
+            str.maketrans({"—": "-"}),
+            span_rules=["bold"],
+        )
+        # The text of spans is translated and converted by the other
+        # rules; their markup is not parsed again.
+        spans = (
+            Span(None, "a — *b*"),
+            Span("bold", "c - d", ChapterIR.parse_spans("c - d")),
+        )
+        self.assertEqual(engine.render_spans(spans), "a---*b*C---D")
+
+    def test_strip_pattern(self):
+        rules = [LaTeXRule("dash", r" - ", lambda s: "---")]
+        engine = LaTeXRuleEngine(rules, {}, strip_pattern=r"\[\[.+?\]\]")
+        # The text around a stripped note joins up before the scan.
+        self.assertEqual(engine.convert("a [[n]]- b"), "a---b")
+        self.assertNotEqual(
+            engine.signature, LaTeXRuleEngine(rules, {}).signature
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
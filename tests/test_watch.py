@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from utils import File
+
+from writing_utils import BookDir, ChapterFile
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.dir_test_output = tempfile.mkdtemp(prefix="test_watch_")
+        self.addCleanup(shutil.rmtree, self.dir_test_output)
+        self.dir_book = os.path.join(self.dir_test_output, "book")
+        os.makedirs(self.dir_book, exist_ok=True)
+        self.chapter_path = os.path.join(self.dir_book, "01-First.md")
+        File(self.chapter_path).write("# 1. First\n\nOne.")
+
+    def test_rebuilds_on_change(self):
+        book_dir = BookDir(self.dir_book)
+        thread = threading.Thread(
+            target=book_dir.watch,
+            kwargs=dict(
+                formats=("md",),
+                poll_interval=0.05,
+                debounce=0.1,
+                max_builds=2,
+            ),
+        )
+        thread.start()
+        md_path = os.path.join(self.dir_book + ".compiled", "book.md")
+        while not os.path.exists(md_path):
+            time.sleep(0.05)
+        self.assertIn("One.", File(md_path).read())
+
+        File(self.chapter_path).write("# 1. First\n\nOne, edited.")
+        thread.join(timeout=10)
+        self.assertFalse(thread.is_alive())
+        self.assertIn("One, edited.", File(md_path).read())
+        self.assertEqual(
+            set(book_dir.chapter_ir_cache),
+            {ChapterFile(self.chapter_path).content_hash},
+        )
+
+    def test_survives_failed_build(self):
+        book_dir = BookDir(self.dir_book)
+        thread = threading.Thread(
+            target=book_dir.watch,
+            kwargs=dict(
+                formats=("md", "docx"),
+                poll_interval=0.05,
+                debounce=0.1,
+                max_builds=3,
+            ),
+        )
+        thread.start()
+        md_path = os.path.join(self.dir_book + ".compiled", "book.md")
+        while not os.path.exists(md_path):
+            time.sleep(0.05)
+
+        # Half saved: no "# 2. ..." heading yet, so the build fails.
+        chapter2_path = os.path.join(self.dir_book, "02-Second.md")
+        File(chapter2_path).write("Two.")
+        time.sleep(1)
+        self.assertTrue(thread.is_alive())
+
+        File(chapter2_path).write("# 2. Second\n\nTwo.")
+        thread.join(timeout=20)
+        self.assertFalse(thread.is_alive())
+        self.assertIn("Two.", File(md_path).read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,8 @@ import os
 
 from writing_utils import BookDir
 
+WORKERS = os.cpu_count()
+
 if __name__ == "__main__":
     # doc
     book_dir = BookDir.from_args_or_environs()
@@ -11,12 +13,12 @@ if __name__ == "__main__":
     book_dir.backup()
 
     # docx
-    docx_path = book_dir.build_docx(max_words_per_docx=10_000)
-    book_dir2 = BookDir.from_docx(docx_path)
+    docx_path = book_dir.build_docx(max_words_per_docx=10_000, workers=WORKERS)
+    book_dir2 = BookDir.from_docx(docx_path, streaming=True, workers=WORKERS)
     assert book_dir == book_dir2
 
     # md
-    md_path = book_dir.build_md()
+    md_path = book_dir.build_md(workers=WORKERS)
     book_dir3 = BookDir.from_md(
         md_path,
         output_dir=md_path + ".dir_from_md",
@@ -24,6 +26,6 @@ if __name__ == "__main__":
     assert book_dir == book_dir3
 
     # latex
-    latex_path = book_dir.build_latex(say_color="Maroon")
+    latex_path = book_dir.build_latex(say_color="Maroon", workers=WORKERS)
     pdf_path = latex_path[:-4] + ".pdf"
     os.system(f'open -a Preview "{pdf_path}"')
@@ -1,4 +1,6 @@
-from utils import Log
+import json
+
+from utils_base import Log
 
 from writing_utils import BookDir
 
@@ -7,8 +9,11 @@ log = Log("docx_to_bookdir")
 if __name__ == "__main__":
     book_dir = BookDir.from_args_or_environs()
     docx_path = book_dir.path + ".docx"
-    book_dir2 = BookDir.from_docx(docx_path)
-    if book_dir == book_dir2:
+    book_dir2 = BookDir.from_docx(docx_path, streaming=True)
+    diff = book_dir.diff(book_dir2)
+    if not diff:
         log.debug("0️⃣ Has not been changed")
     else:
-        log.info("✍️ Has been changed")
+        log.info(f"✍️ Has been changed ({len(diff)} chapters)")
+        for chapter_diff in diff:
+            log.info(json.dumps(chapter_diff))
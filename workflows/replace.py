@@ -4,8 +4,13 @@ from writing_utils import BookDir
 
 if __name__ == "__main__":
     book_dir = BookDir.from_args_or_environs()
-    book_dir.backup()
-    find_text = sys.argv[1]
-    replace_text = sys.argv[2]
-    prev_number_and_title = None
-    book_dir.replace(find_text, replace_text)
+    dry_run = "--dry-run" in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != "--dry-run"]
+    if not args or len(args) % 2 != 0:
+        sys.exit("replace takes pairs: find1 replace1 [find2 replace2 ...]")
+    replace_map = dict(zip(args[0::2], args[1::2]))
+    if not dry_run:
+        book_dir.backup()
+    n_hits_by_chapter = book_dir.replace_many(replace_map, dry_run=dry_run)
+    for file_name, n_hits in n_hits_by_chapter.items():
+        print(" " * 4, n_hits, file_name)
@@ -0,0 +1,11 @@
+import os
+
+from writing_utils import BookDir
+
+WORKERS = os.cpu_count()
+
+if __name__ == "__main__":
+    book_dir = BookDir.from_args_or_environs()
+    book_dir.watch(
+        say_color="Maroon", max_words_per_docx=10_000, workers=WORKERS
+    )